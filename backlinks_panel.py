@@ -0,0 +1,59 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QListWidget, QListWidgetItem, QLabel
+from PyQt5.QtCore import Qt, pyqtSignal
+
+import database
+
+
+class BacklinksPanel(QWidget):
+    """Notes qui pointent vers la note courante ([[titre]] ou [[#id]]).
+
+    La liste vient de l'index des liens (database.get_backlinks) et n'est
+    relue que lorsque le panneau est visible.
+    """
+
+    # Id de la note à ouvrir
+    nodeActivated = pyqtSignal(int)
+
+    def __init__(self, translator, parent=None):
+        super().__init__(parent)
+        self.translator = translator
+        self.node_id = None
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.empty_label = QLabel()
+        self.empty_label.setWordWrap(True)
+        layout.addWidget(self.empty_label)
+
+        self.link_list = QListWidget()
+        self.link_list.itemClicked.connect(self.on_item_clicked)
+        self.link_list.itemActivated.connect(self.on_item_clicked)
+        layout.addWidget(self.link_list)
+        self.update_texts()
+
+    def set_node(self, node_id):
+        self.node_id = node_id
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        self.link_list.clear()
+        backlinks = database.get_backlinks(self.node_id) if self.node_id is not None else []
+        for node_id, title in backlinks:
+            item = QListWidgetItem(title)
+            item.setData(Qt.UserRole, node_id)
+            self.link_list.addItem(item)
+        self.empty_label.setVisible(not backlinks)
+
+    def on_item_clicked(self, item):
+        self.nodeActivated.emit(item.data(Qt.UserRole))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def update_texts(self):
+        self.empty_label.setText(self.translator.get_text('no_backlinks'))
+        self.refresh()
@@ -0,0 +1,126 @@
+"""Micro-benchmark : une connexion par appel vs connexions longue durée.
+
+Usage : python -m benchmarks.bench_connections [--ops 2000]
+
+Les fonctions "legacy" reproduisent l'ancien database.py (sqlite3.connect
+puis close à chaque appel) ; les fonctions "pooled" sont celles du module
+database actuel.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import blobs
+import database
+
+
+class LegacyDatabase:
+    """Ancienne implémentation : ouverture/fermeture d'une connexion par appel."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        # Requise par les triggers de l'index plein texte
+        conn.create_function("nn_inflate", 2, blobs.decompress)
+        return conn
+
+    def create_node(self, title, parent_id=None, collapsed=0):
+        # Sans contenu : le texte vit désormais dans la table blobs
+        conn = self._connect()
+        cursor = conn.execute(
+            "INSERT INTO nodes (title, parent_id, collapsed) VALUES (?, ?, ?)",
+            (title, parent_id, collapsed),
+        )
+        conn.commit()
+        node_id = cursor.lastrowid
+        conn.close()
+        return node_id
+
+    def get_node(self, node_id):
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        conn.close()
+        return row
+
+    def get_children(self, parent_id):
+        conn = self._connect()
+        rows = conn.execute("SELECT * FROM nodes WHERE parent_id = ?", (parent_id,)).fetchall()
+        conn.close()
+        return rows
+
+    def update_node(self, node_id, collapsed):
+        conn = self._connect()
+        conn.execute("UPDATE nodes SET collapsed = ? WHERE id = ?", (collapsed, node_id))
+        conn.commit()
+        conn.close()
+
+    def get_setting(self, key, default=None):
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        conn.close()
+        return row[0] if row else default
+
+
+def _measure(func, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        func(i)
+    elapsed = time.perf_counter() - start
+    return ops / elapsed if elapsed else float("inf")
+
+
+def run(ops):
+    tmp_dir = tempfile.mkdtemp(prefix="notenodes-bench-")
+    database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    database.set_setting("language", "en")
+    root_id = database.create_node("root")
+    ids = [database.create_node(f"node {i}", parent_id=root_id) for i in range(200)]
+
+    legacy = LegacyDatabase(database.DB_PATH)
+    cases = [
+        ("create_node",
+         lambda i: legacy.create_node(f"legacy {i}", parent_id=ids[i % len(ids)]),
+         lambda i: database.create_node(f"pooled {i}", parent_id=ids[i % len(ids)])),
+        ("get_node",
+         lambda i: legacy.get_node(ids[i % len(ids)]),
+         # Cache de nœuds vidé : on mesure l'accès à la base
+         lambda i: (database.get_manager().nodes.clear(),
+                    database.get_node(ids[i % len(ids)]))),
+        ("get_children",
+         lambda i: legacy.get_children(ids[i % len(ids)]),
+         lambda i: database.get_children(ids[i % len(ids)])),
+        ("update_node",
+         lambda i: legacy.update_node(ids[i % len(ids)], i % 2),
+         lambda i: database.update_node(ids[i % len(ids)], collapsed=i % 2)),
+        ("get_setting",
+         lambda i: legacy.get_setting("language"),
+         lambda i: database.get_setting("language")),
+    ]
+
+    results = []
+    for name, legacy_func, pooled_func in cases:
+        before = _measure(legacy_func, ops)
+        after = _measure(pooled_func, ops)
+        results.append((name, before, after))
+
+    database.close_connections()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000, help="opérations par cas")
+    args = parser.parse_args()
+
+    print(f"{'operation':<14}{'before ops/s':>14}{'after ops/s':>14}{'speedup':>10}")
+    for name, before, after in run(args.ops):
+        print(f"{name:<14}{before:>14.0f}{after:>14.0f}{after / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark : rendu complet vs rendu incrémental par blocs.
+
+Usage : python -m benchmarks.bench_markdown [--sizes 10000,100000,1000000]
+
+Pour chaque taille, mesure le rendu complet (utils.markdown_to_html), le
+premier rendu incrémental, puis le temps moyen par frappe : un caractère
+est inséré dans un bloc au milieu du document avant chaque rendu.
+"""
+import argparse
+import random
+import time
+
+from utils import markdown_to_html, IncrementalRenderer
+
+
+def synthetic_note(size, seed=0):
+    """Génère une note Markdown d'environ `size` caractères."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    i = 0
+    while length < size:
+        i += 1
+        r = rng.random()
+        if r < 0.45:
+            block = (f"Paragraph {i} with **bold**, `code` and a [link](https://example.com/{i}).\n"
+                     f"It continues on a second line with more words {i}.")
+        elif r < 0.55:
+            block = f"## Section {i}"
+        elif r < 0.70:
+            block = f"```python\ndef handler_{i}(value):\n\n    return value * {i}\n```"
+        elif r < 0.80:
+            block = f"| key | value |\n|-----|-------|\n| {i} | {i * 2} |\n| {i + 1} | {i * 3} |"
+        elif r < 0.90:
+            block = f"- item {i}\n- item {i + 1}\n- item {i + 2}"
+        else:
+            block = f"> quoted line {i}"
+        parts.append(block)
+        length += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def _keystroke_positions(text, count):
+    """Positions d'insertion au milieu de lignes de paragraphes."""
+    middle = len(text) // 2
+    start = text.index("Paragraph", middle)
+    return [start + 10] * count
+
+
+def run(sizes, keystrokes):
+    results = []
+    for size in sizes:
+        text = synthetic_note(size)
+
+        start = time.perf_counter()
+        markdown_to_html(text)
+        full = time.perf_counter() - start
+
+        renderer = IncrementalRenderer()
+        start = time.perf_counter()
+        renderer.render(text)
+        first = time.perf_counter() - start
+
+        total = 0.0
+        for position in _keystroke_positions(text, keystrokes):
+            text = text[:position] + "x" + text[position:]
+            start = time.perf_counter()
+            renderer.render(text)
+            total += time.perf_counter() - start
+        results.append((len(text), full, first, total / keystrokes, renderer.blocks_rendered))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="tailles de note en caractères, séparées par des virgules")
+    parser.add_argument("--keystrokes", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    print(f"{'size':>10}{'full ms':>12}{'first ms':>12}{'keystroke ms':>14}{'blocks':>8}")
+    for size, full, first, keystroke, blocks in run(sizes, args.keystrokes):
+        print(f"{size:>10}{full * 1000:>12.1f}{first * 1000:>12.1f}"
+              f"{keystroke * 1000:>14.2f}{blocks:>8}")
+
+
+if __name__ == "__main__":
+    main()
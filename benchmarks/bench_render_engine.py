@@ -0,0 +1,67 @@
+"""Benchmark : markdown.markdown() à chaque appel vs MarkdownRenderer réutilisé.
+
+Usage : python -m benchmarks.bench_render_engine [--calls 500]
+
+Le chemin "before" reproduit l'ancien utils.markdown_to_html : conversion
+par markdown.markdown() (toute la chaîne d'extensions reconstruite) et
+feuille de style Pygments recalculée à chaque appel, lexers non mis en
+cache. Le chemin "after" est MarkdownRenderer.render().
+"""
+import argparse
+import time
+
+import markdown
+from markdown.extensions import codehilite
+from pygments.formatters import HtmlFormatter
+
+from utils import MARKDOWN_EXTENSIONS, MarkdownRenderer, wrap_html
+
+NOTES = {
+    "short": "A short note with **bold** text.",
+    "list": "# Todo\n\n- first item\n- second item\n- [link](https://example.com)",
+    "code": "Example:\n\n```python\ndef add(a, b):\n    return a + b\n```\n\n```js\nlet x = 1;\n```",
+    "table": "| a | b |\n|---|---|\n| 1 | 2 |\n| 3 | 4 |",
+}
+
+
+def legacy_markdown_to_html(text):
+    html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    css = HtmlFormatter().get_style_defs('.codehilite')
+    return wrap_html(html, css)
+
+
+def _measure(func, text, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func(text)
+    return (time.perf_counter() - start) / calls
+
+
+def run(calls):
+    renderer = MarkdownRenderer()
+    cached_lookup = codehilite.get_lexer_by_name
+    results = []
+    for name, text in NOTES.items():
+        # Ancien chemin : sans le cache de lexers installé par utils
+        codehilite.get_lexer_by_name = cached_lookup.uncached
+        try:
+            before = _measure(legacy_markdown_to_html, text, calls)
+        finally:
+            codehilite.get_lexer_by_name = cached_lookup
+        after = _measure(renderer.render, text, calls)
+        results.append((name, before, after))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500, help="rendus par note")
+    args = parser.parse_args()
+
+    print(f"{'note':<8}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    for name, before, after in run(args.calls):
+        print(f"{name:<8}{before * 1e6:>12.0f}{after * 1e6:>12.0f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
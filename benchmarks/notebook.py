@@ -0,0 +1,81 @@
+"""Génération de carnets synthétiques pour les benchmarks.
+
+Les nœuds sont créés avec l'API publique de database, dans un seul
+database.batch() pour que la génération reste rapide même sur de gros
+arbres.
+"""
+import os
+import random
+import tempfile
+
+import database
+from benchmarks.bench_markdown import synthetic_note
+
+
+def use_temp_database(prefix="notenodes-bench-"):
+    """Redirige database vers une base neuve dans un dossier temporaire."""
+    tmp_dir = tempfile.mkdtemp(prefix=prefix)
+    database.DB_PATH = os.path.join(tmp_dir, "bench.db")
+    database.init_db()
+    return database.DB_PATH
+
+
+class Notebook:
+    """Ids d'un carnet généré, groupés par profondeur."""
+
+    def __init__(self):
+        # levels[0] : racines, levels[-1] : feuilles
+        self.levels = []
+
+    @property
+    def node_ids(self):
+        return [node_id for level in self.levels for node_id in level]
+
+    @property
+    def parents(self):
+        """Ids des nœuds qui ont des enfants."""
+        return [node_id for level in self.levels[:-1] for node_id in level]
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+
+def generate_notebook(depth=4, fanout=6, note_size=2000, seed=0):
+    """Crée un arbre complet de `depth` niveaux et `fanout` enfants par nœud.
+
+    La taille des notes varie entre la moitié et une fois et demie
+    `note_size` caractères.
+    """
+    rng = random.Random(seed)
+    # Quelques contenus distincts suffisent : la génération Markdown est lente
+    contents = [synthetic_note(int(note_size * (0.5 + i / 8)), seed=i) for i in range(9)]
+    notebook = Notebook()
+    parents = [None]
+    with database.batch():
+        for level in range(depth):
+            created = []
+            for parent_id in parents:
+                for i in range(fanout):
+                    created.append(database.create_node(
+                        f"Note {level}.{len(created)}",
+                        parent_id=parent_id,
+                        content=rng.choice(contents),
+                    ))
+            notebook.levels.append(created)
+            parents = created
+    return notebook
+
+
+def generate_chain(length, parent_id=None, leaves=2, content=""):
+    """Crée une chaîne de `length` nœuds, chacun avec `leaves` feuilles.
+
+    Retourne la liste des ids de la chaîne, du haut vers le bas.
+    """
+    chain = []
+    with database.batch():
+        for i in range(length):
+            parent_id = database.create_node(f"Chain {i}", parent_id=parent_id, content=content)
+            chain.append(parent_id)
+            for j in range(leaves):
+                database.create_node(f"Leaf {i}.{j}", parent_id=parent_id, content=content)
+    return chain
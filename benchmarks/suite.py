@@ -0,0 +1,336 @@
+"""Suite de benchmarks headless : base de données et rendu Markdown.
+
+Usage : python -m benchmarks.suite [--depth 4] [--fanout 6] [--note-size 2000]
+                                   [--output results.json] [--compare before.json]
+
+Génère un carnet synthétique dans une base temporaire, mesure les chemins
+critiques (création, lecture des enfants, chargement complet de l'arbre,
+suppression de sous-arbres profonds, détection de cycle, rendu Markdown)
+et écrit les résultats en JSON. Avec --compare, chaque mesure est comparée
+à celle d'un fichier de résultats précédent.
+
+Qt tourne avec la plateforme "offscreen" : aucun affichage n'est requis.
+"""
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+from PyQt5.QtCore import QModelIndex
+from PyQt5.QtWidgets import QApplication
+
+import database
+from benchmarks.bench_markdown import synthetic_note
+from benchmarks.notebook import use_temp_database, generate_notebook, generate_chain
+from tree_model import NodeTreeModel
+from utils import markdown_to_html, IncrementalRenderer
+
+# Version du format JSON produit
+FORMAT_VERSION = 1
+
+
+def _timeit(func, repeat, setup=None):
+    """Durées (en secondes) de `repeat` appels ; `setup` n'est pas chronométré."""
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _summary(timings, ops=1):
+    """Statistiques en millisecondes par opération."""
+    per_op = [t * 1000 / ops for t in timings]
+    return {
+        "runs": len(per_op),
+        "ops_per_run": ops,
+        "min_ms": min(per_op),
+        "median_ms": statistics.median(per_op),
+        "mean_ms": statistics.mean(per_op),
+        "max_ms": max(per_op),
+    }
+
+
+# -- Cas mesurés --
+
+def bench_create_node(notebook, repeat, ops=500):
+    parents = notebook.parents
+    counter = iter(range(10 ** 9))
+
+    def run():
+        for _ in range(ops):
+            i = next(counter)
+            database.create_node(f"bench {i}", parent_id=parents[i % len(parents)])
+
+    return _summary(_timeit(run, repeat), ops)
+
+
+def bench_get_children(notebook, repeat, ops=2000):
+    rng = random.Random(1)
+    parents = notebook.parents
+
+    def run():
+        for _ in range(ops):
+            database.get_children(rng.choice(parents))
+
+    return _summary(_timeit(run, repeat), ops)
+
+
+def bench_get_node(notebook, repeat, warm, ops=2000):
+    """Lecture de notes au hasard, cache de nœuds vidé (froid) ou rempli (chaud)."""
+    rng = random.Random(2)
+    node_ids = notebook.node_ids
+    cache = database.get_manager().nodes
+
+    def setup():
+        cache.clear()
+        if warm:
+            for node_id in node_ids:
+                database.get_node(node_id)
+        return ()
+
+    def run():
+        for _ in range(ops):
+            if not warm:
+                cache.clear()
+            database.get_node(rng.choice(node_ids))
+
+    return _summary(_timeit(run, repeat, setup), ops)
+
+
+def bench_large_note(size, repeat, full):
+    """Ouverture d'une grande note : premier morceau seulement, ou texte entier."""
+    node_id = database.create_node("large", None, synthetic_note(size))
+
+    def run():
+        chunks = database.iter_content(node_id)
+        if full:
+            for _ in chunks:
+                pass
+        else:
+            next(chunks)
+            chunks.close()
+
+    return _summary(_timeit(run, repeat))
+
+
+def bench_load_skeleton(notebook, repeat):
+    return _summary(_timeit(database.load_tree_skeleton, repeat))
+
+
+def bench_load_model(notebook, repeat):
+    """Chargement complet de l'arbre dans NodeTreeModel (tous les niveaux)."""
+    model = NodeTreeModel()
+
+    def run():
+        model.reload()
+        pending = [QModelIndex()]
+        while pending:
+            index = pending.pop()
+            if model.canFetchMore(index):
+                model.fetchMore(index)
+            pending.extend(model.index(row, 0, index) for row in range(model.rowCount(index)))
+
+    return _summary(_timeit(run, repeat))
+
+
+def bench_delete_deep(notebook, repeat, chain_depth):
+    """Suppression d'une chaîne de `chain_depth` niveaux (et de ses feuilles)."""
+    def setup():
+        return (generate_chain(chain_depth)[0],)
+
+    return _summary(_timeit(database.delete_node, repeat, setup))
+
+
+def bench_cycle_check(notebook, repeat, chain_depth, ops=200):
+    """Refus de déplacer le haut d'une chaîne profonde sous son dernier nœud."""
+    chain = generate_chain(chain_depth, leaves=0)
+    top, bottom = chain[0], chain[-1]
+
+    def run():
+        for _ in range(ops):
+            try:
+                database.update_node_parent(top, bottom)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("cycle non détecté")
+
+    result = _summary(_timeit(run, repeat), ops)
+    database.delete_node(top)
+    return result
+
+
+def bench_move_subtree(notebook, repeat, ops=50):
+    """Déplacement aller-retour d'un sous-arbre de premier niveau."""
+    roots = notebook.levels[0]
+    node_id, other = roots[0], roots[1]
+
+    def run():
+        for _ in range(ops):
+            database.update_node_parent(node_id, other)
+            database.update_node_parent(node_id, None)
+
+    return _summary(_timeit(run, repeat), ops * 2)
+
+
+def bench_reorder(notebook, repeat, ops=200):
+    """Déplacement d'un nœud entre deux frères (une seule ligne modifiée)."""
+    rng = random.Random(3)
+    parent = notebook.parents[-1]
+    siblings = [row[0] for row in database.get_children(parent)]
+
+    def run():
+        for _ in range(ops):
+            node_id, before_id = rng.sample(siblings, 2)
+            database.move_node(node_id, parent, before_id)
+
+    return _summary(_timeit(run, repeat), ops)
+
+
+def bench_markdown(size, repeat):
+    text = synthetic_note(size)
+    return _summary(_timeit(lambda: markdown_to_html(text), repeat))
+
+
+def bench_markdown_keystroke(size, repeat, keystrokes=20):
+    """Rendu incrémental après l'insertion d'un caractère au milieu du texte."""
+    text = synthetic_note(size)
+    position = text.index("Paragraph", len(text) // 2) + 10
+    renderer = IncrementalRenderer()
+    renderer.render(text)
+
+    def run():
+        nonlocal text
+        for _ in range(keystrokes):
+            text = text[:position] + "x" + text[position:]
+            renderer.render(text)
+
+    return _summary(_timeit(run, repeat), keystrokes)
+
+
+def run(depth=4, fanout=6, note_size=2000, chain_depth=200, repeat=5,
+        markdown_sizes=(10000, 100000), large_note_size=5000000):
+    # NodeTreeModel a besoin d'une application Qt (plateforme offscreen)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    path = use_temp_database()
+
+    start = time.perf_counter()
+    notebook = generate_notebook(depth, fanout, note_size)
+    generation = time.perf_counter() - start
+
+    results = {
+        "create_node": bench_create_node(notebook, repeat),
+        "get_children": bench_get_children(notebook, repeat),
+        "get_node_cold": bench_get_node(notebook, repeat, warm=False),
+        "get_node_warm": bench_get_node(notebook, repeat, warm=True),
+        "load_tree_skeleton": bench_load_skeleton(notebook, repeat),
+        "load_tree_model": bench_load_model(notebook, repeat),
+        "delete_node_deep": bench_delete_deep(notebook, repeat, chain_depth),
+        "cycle_check": bench_cycle_check(notebook, repeat, chain_depth),
+        "move_subtree": bench_move_subtree(notebook, repeat),
+        "reorder_siblings": bench_reorder(notebook, repeat),
+        "large_note_first_chunk": bench_large_note(large_note_size, repeat, full=False),
+        "large_note_stream": bench_large_note(large_note_size, repeat, full=True),
+    }
+    for size in markdown_sizes:
+        results[f"markdown_full_{size}"] = bench_markdown(size, repeat)
+        results[f"markdown_keystroke_{size}"] = bench_markdown_keystroke(size, repeat)
+
+    database.close_connections()
+    return {
+        "format": FORMAT_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "database": path,
+        },
+        "params": {
+            "depth": depth,
+            "fanout": fanout,
+            "note_size": note_size,
+            "chain_depth": chain_depth,
+            "repeat": repeat,
+            "markdown_sizes": list(markdown_sizes),
+            "large_note_size": large_note_size,
+            "nodes": len(notebook),
+            "generation_s": generation,
+        },
+        "results": results,
+    }
+
+
+def compare(before, after, threshold=0.10):
+    """Compare les médianes ; retourne [(nom, avant, après, ratio, régression)]."""
+    rows = []
+    for name, result in after["results"].items():
+        previous = before.get("results", {}).get(name)
+        if previous is None:
+            continue
+        old, new = previous["median_ms"], result["median_ms"]
+        ratio = new / old if old else float("inf")
+        rows.append((name, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4, help="niveaux du carnet généré")
+    parser.add_argument("--fanout", type=int, default=6, help="enfants par nœud")
+    parser.add_argument("--note-size", type=int, default=2000,
+                        help="taille moyenne des notes en caractères")
+    parser.add_argument("--chain-depth", type=int, default=200,
+                        help="profondeur des sous-arbres supprimés / testés pour les cycles")
+    parser.add_argument("--repeat", type=int, default=5, help="mesures par cas")
+    parser.add_argument("--markdown-sizes", default="10000,100000",
+                        help="tailles de note Markdown, séparées par des virgules")
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    parser.add_argument("--compare", help="résultats JSON d'une exécution précédente")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="ralentissement relatif signalé comme régression")
+    args = parser.parse_args()
+
+    report = run(args.depth, args.fanout, args.note_size, args.chain_depth, args.repeat,
+                 [int(size) for size in args.markdown_sizes.split(",")])
+
+    params = report["params"]
+    print(f"{params['nodes']} nodes generated in {params['generation_s']:.2f}s")
+    print(f"{'benchmark':<28}{'median ms':>12}{'min ms':>12}")
+    for name, result in report["results"].items():
+        print(f"{name:<28}{result['median_ms']:>12.3f}{result['min_ms']:>12.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            before = json.load(f)
+        rows = compare(before, report, args.threshold)
+        print()
+        changed = [key for key in ("depth", "fanout", "note_size", "chain_depth")
+                   if before.get("params", {}).get(key) != params[key]]
+        if changed:
+            print(f"warning: parameters differ from {args.compare}: {', '.join(changed)}")
+        print(f"{'benchmark':<28}{'before ms':>12}{'after ms':>12}{'ratio':>8}")
+        for name, old, new, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<28}{old:>12.3f}{new:>12.3f}{ratio:>7.2f}x{flag}")
+        if any(regressed for *_, regressed in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Stockage adressé par contenu des textes de notes.
+
+Chaque texte est identifié par son empreinte SHA-256 et stocké compressé
+une seule fois dans la table `blobs`, quel que soit le nombre de notes qui
+le partagent. La compression utilise zstandard s'il est installé, zlib
+sinon ; le codec est enregistré avec chaque blob pour pouvoir relire une
+base écrite avec l'un ou l'autre.
+
+Les connexions de l'application enregistrent decompress() sous le nom
+nn_inflate (voir database._connect) pour la vue nodes_text, qui donne le
+texte des notes à l'index plein texte. Les triggers de la table nodes ne
+l'utilisent pas : tout client SQLite peut y écrire.
+
+Usage : python -m blobs [--vacuum]
+
+Applique les migrations à la base de l'application puis affiche la place
+gagnée par la compression et la déduplication. --vacuum réécrit ensuite
+le fichier pour rendre la place libérée au système.
+"""
+import codecs
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # dépendance optionnelle
+    zstandard = None
+
+# Codecs connus ; "raw" garde le texte UTF-8 tel quel quand la compression
+# n'apporte rien (notes très courtes)
+RAW = "raw"
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+DEFAULT_CODEC = ZSTD if zstandard is not None else ZLIB
+
+def blob_hash(text):
+    """Empreinte hexadécimale (SHA-256) d'un texte, clé de la table `blobs`."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def compress(text, codec=None):
+    """Retourne (codec, données) pour un texte."""
+    raw = text.encode("utf-8")
+    codec = codec or DEFAULT_CODEC
+    if codec == ZSTD:
+        data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    elif codec == ZLIB:
+        data = zlib.compress(raw, ZLIB_LEVEL)
+    else:
+        return RAW, raw
+    if len(data) >= len(raw):
+        return RAW, raw
+    return codec, data
+
+def decompress(codec, data):
+    """Inverse de compress() ; None reste None (note sans contenu)."""
+    if data is None:
+        return None
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Le module zstandard est requis pour lire cette note")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == ZLIB:
+        raw = zlib.decompress(data)
+    elif codec == RAW:
+        raw = data
+    else:
+        raise ValueError(f"Codec inconnu : {codec}")
+    return bytes(raw).decode("utf-8")
+
+def iter_decompress(codec, chunks):
+    """Comme decompress(), mais au fil de l'eau.
+
+    `chunks` itère sur les données compressées par morceaux ; le texte est
+    produit morceau par morceau, sans jamais tenir le blob décompressé en
+    entier en mémoire.
+    """
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Le module zstandard est requis pour lire cette note")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    elif codec == ZLIB:
+        decompressor = zlib.decompressobj()
+    elif codec == RAW:
+        decompressor = None
+    else:
+        raise ValueError(f"Codec inconnu : {codec}")
+    # Un caractère UTF-8 peut être coupé entre deux morceaux
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for data in chunks:
+        raw = data if decompressor is None else decompressor.decompress(data)
+        text = decoder.decode(raw)
+        if text:
+            yield text
+    tail = decoder.decode(b"" if decompressor is None else decompressor.flush(), final=True)
+    if tail:
+        yield tail
+
+def main():
+    import argparse
+    import os
+
+    import database
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vacuum", action="store_true",
+                        help="réécrire le fichier pour libérer la place gagnée")
+    args = parser.parse_args()
+
+    size_before = os.path.getsize(database.DB_PATH) if os.path.exists(database.DB_PATH) else 0
+    database.init_db()
+    if args.vacuum:
+        database.vacuum()
+    size_after = os.path.getsize(database.DB_PATH)
+
+    report = database.storage_report()
+    print(f"notes with content : {report['nodes']}")
+    print(f"unique bodies      : {report['blobs']}")
+    print(f"text size          : {report['logical_bytes'] / 1e6:.1f} MB")
+    print(f"after dedup        : {report['unique_bytes'] / 1e6:.1f} MB")
+    print(f"stored (compressed): {report['stored_bytes'] / 1e6:.1f} MB")
+    print(f"space saved        : {report['saved_bytes'] / 1e6:.1f} MB "
+          f"({report['saved_ratio']:.0%})")
+    print(f"database file      : {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
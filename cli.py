@@ -0,0 +1,317 @@
+"""Export et import de l'arbre de notes en ligne de commande.
+
+Usage :
+    python cli.py export-jsonl notes.jsonl
+    python cli.py export-md notes/
+    python cli.py import-jsonl notes.jsonl [--parent ID]
+    python cli.py import-md notes/ [--parent ID]
+    python cli.py export-html site/ [--workers N]
+
+Options globales : --db FICHIER ou --notebook NOM (voir notebooks.py).
+
+Les nœuds sont traités un par un par des générateurs : la mémoire utilisée
+ne dépend que de la profondeur de l'arbre, pas du nombre de notes. Les
+imports sont groupés en transactions de --batch-size nœuds.
+
+Format JSONL : un objet par ligne {"id", "parent_id", "title", "content",
+"collapsed"}, en pré-ordre (un parent avant ses enfants), tel que produit
+par export-jsonl.
+
+Format Markdown : une note devient `<titre>.md` ; ses enfants sont dans le
+dossier `<titre>/` voisin. Le titre exact, l'état replié et la position
+parmi les frères sont gardés dans un en-tête :
+
+    ---
+    title: "Titre"
+    collapsed: 0
+    order: 3
+    ---
+
+À l'import, les notes d'un dossier suivent leur `order` ; celles qui n'en
+ont pas (fichiers écrits à la main) viennent ensuite, par nom.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import database
+import notebooks
+import site_export
+
+# Nœuds insérés par transaction lors d'un import
+BATCH_SIZE = 10000
+
+# Caractères interdits dans un nom de fichier (Windows compris)
+_UNSAFE_CHARS_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+MAX_NAME_LENGTH = 80
+
+FRONT_MATTER = "---\n"
+
+# -- Export --
+
+def export_jsonl(path, parent_id=None):
+    """Écrit le sous-arbre en JSONL ; retourne le nombre de nœuds."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for node_id, parent, title, content, collapsed, _ in database.iter_tree(parent_id):
+            record = {
+                "id": node_id,
+                "parent_id": parent,
+                "title": title,
+                "content": content,
+                "collapsed": collapsed,
+            }
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+def safe_name(title):
+    """Nom de fichier lisible tiré d'un titre."""
+    name = _UNSAFE_CHARS_RE.sub("_", title).strip(" .")
+    return name[:MAX_NAME_LENGTH] or "untitled"
+
+def _unique_name(names, title):
+    """Nom libre parmi `names` pour la note et son dossier d'enfants."""
+    name = safe_name(title)
+    candidate, n = name, 1
+    # Insensible à la casse, pour les systèmes de fichiers qui le sont ; le
+    # dossier "a.md" d'une note ne doit pas écraser le fichier d'une note "a"
+    while candidate.lower() in names or candidate.lower() + ".md" in names:
+        n += 1
+        candidate = f"{name} ({n})"
+    names.add(candidate.lower())
+    names.add(candidate.lower() + ".md")
+    return candidate
+
+def export_markdown(directory, parent_id=None):
+    """Écrit le sous-arbre en fichiers Markdown ; retourne le nombre de nœuds."""
+    os.makedirs(directory, exist_ok=True)
+    # Par niveau du chemin courant : [dossier, noms pris, dernière note,
+    # notes écrites]
+    levels = [[directory, set(), None, 0]]
+    count = 0
+    for _, _, title, content, collapsed, depth in database.iter_tree(parent_id):
+        del levels[depth + 1:]
+        level = levels[depth]
+        if level[0] is None:
+            # Premier enfant : le dossier n'est créé que s'il y en a
+            parent_level = levels[depth - 1]
+            level[0] = os.path.join(parent_level[0], parent_level[2])
+            os.makedirs(level[0], exist_ok=True)
+        level[2] = _unique_name(level[1], title)
+        with open(os.path.join(level[0], level[2] + ".md"), "w", encoding="utf-8") as f:
+            f.write(FRONT_MATTER)
+            f.write(f"title: {json.dumps(title, ensure_ascii=False)}\n")
+            f.write(f"collapsed: {int(collapsed or 0)}\n")
+            f.write(f"order: {level[3]}\n")
+            f.write(FRONT_MATTER)
+            f.write(content or "")
+        level[3] += 1
+        levels.append([None, set(), None, 0])
+        count += 1
+    return count
+
+# -- Import --
+
+def _insert_batched(records, parent_id=None, batch_size=BATCH_SIZE):
+    """Crée les nœuds décrits par `records`, par transactions de batch_size.
+
+    `records` produit des tuples (parent, title, content, collapsed) où
+    parent est l'index (dans l'ordre de production) du nœud parent, ou
+    None pour un enfant de parent_id. Seuls les ids des ancêtres du nœud
+    courant sont gardés : les parents doivent précéder leurs enfants et
+    un nœud doit suivre immédiatement le sous-arbre de son frère précédent
+    (pré-ordre). Retourne le nombre de nœuds créés.
+    """
+    # Pile des (index, nouvel id) du chemin courant
+    ancestors = []
+    count = 0
+    records = iter(records)
+    while True:
+        with database.bulk_insert():
+            for parent, title, content, collapsed in records:
+                while ancestors and ancestors[-1][0] != parent:
+                    ancestors.pop()
+                if parent is None:
+                    new_parent = parent_id
+                elif ancestors:
+                    new_parent = ancestors[-1][1]
+                else:
+                    raise ValueError(f"Parent inconnu pour le nœud {count} : "
+                                     "l'entrée doit être en pré-ordre")
+                node_id = database.create_node(title, new_parent, content, collapsed)
+                ancestors.append((count, node_id))
+                count += 1
+                if count % batch_size == 0:
+                    break
+            else:
+                return count
+
+def _jsonl_records(path):
+    """Convertit les ids du fichier en index d'ordre pour _insert_batched.
+
+    Un nœud dont le parent ne précède pas dans le fichier (sous-arbre
+    exporté avec --root) est importé à la racine de l'import.
+    """
+    # (id d'origine, index) des nœuds du chemin courant
+    ancestors = []
+    index = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            parent = record.get("parent_id")
+            while ancestors and ancestors[-1][0] != parent:
+                ancestors.pop()
+            parent_index = ancestors[-1][1] if ancestors else None
+            ancestors.append((record.get("id"), index))
+            index += 1
+            yield (parent_index, record["title"], record.get("content"),
+                   record.get("collapsed") or 0)
+
+def import_jsonl(path, parent_id=None, batch_size=BATCH_SIZE):
+    return _insert_batched(_jsonl_records(path), parent_id, batch_size)
+
+def _read_note(path):
+    """Retourne (title, content, collapsed) d'un fichier exporté (ou non)."""
+    title = os.path.splitext(os.path.basename(path))[0]
+    collapsed = 0
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.startswith(FRONT_MATTER):
+        end = text.find("\n" + FRONT_MATTER, len(FRONT_MATTER) - 1)
+        if end != -1:
+            for line in text[len(FRONT_MATTER):end].splitlines():
+                key, _, value = line.partition(":")
+                value = value.strip()
+                if key == "title":
+                    title = json.loads(value) if value.startswith('"') else value
+                elif key == "collapsed":
+                    collapsed = int(value or 0)
+            text = text[end + 1 + len(FRONT_MATTER):]
+    return title, text, collapsed
+
+def _markdown_records(directory):
+    """Parcourt un dossier exporté en pré-ordre (voir _insert_batched)."""
+    index = 0
+    # Pile de (index du parent, entrées restantes du dossier)
+    stack = [(None, _dir_entries(directory))]
+    while stack:
+        parent, entries = stack[-1]
+        entry = next(entries, None)
+        if entry is None:
+            stack.pop()
+            continue
+        note, folder, name = entry
+        if note is not None:
+            title, content, collapsed = _read_note(note)
+        else:
+            # Dossier sans note associée
+            title, content, collapsed = name, "", 0
+        yield parent, title, content, collapsed
+        if folder is not None:
+            stack.append((index, _dir_entries(folder)))
+        index += 1
+
+def _read_order(path):
+    """Champ `order` de l'en-tête d'une note (None s'il n'y en a pas)."""
+    with open(path, encoding="utf-8") as f:
+        if f.readline() != FRONT_MATTER:
+            return None
+        for line in f:
+            if line == FRONT_MATTER:
+                break
+            key, _, value = line.partition(":")
+            if key == "order":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+    return None
+
+def _dir_entries(directory):
+    """(fichier .md ou None, dossier ou None, nom) pour chaque note d'un
+    dossier, dans l'ordre de l'export (voir `order`)."""
+    with os.scandir(directory) as it:
+        files = {}
+        folders = {}
+        for entry in it:
+            if entry.is_dir():
+                folders[entry.name] = entry.path
+            elif entry.name.endswith(".md"):
+                files[entry.name[:-3]] = entry.path
+    orders = {name: _read_order(path) for name, path in files.items()}
+
+    def position(name):
+        order = orders.get(name)
+        return (order is None, order or 0, name)
+
+    for name in sorted(files.keys() | folders.keys(), key=position):
+        yield files.get(name), folders.get(name), name
+
+def import_markdown(directory, parent_id=None, batch_size=BATCH_SIZE):
+    return _insert_batched(_markdown_records(directory), parent_id, batch_size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="base à utiliser (par défaut celle de l'application)")
+    parser.add_argument("--notebook", help="carnet à utiliser (par défaut le carnet par défaut)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("export-jsonl", "exporter en JSONL"),
+                            ("export-md", "exporter en dossier Markdown")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("path")
+        command.add_argument("--root", type=int, help="n'exporter que le sous-arbre de ce nœud")
+
+    command = commands.add_parser("export-html", help="exporter en site HTML statique")
+    command.add_argument("path")
+    command.add_argument("--root", type=int, help="n'exporter que le sous-arbre de ce nœud")
+    command.add_argument("--workers", type=int, help="processus de rendu (par défaut : un par cœur)")
+
+    for name, help_text in (("import-jsonl", "importer un fichier JSONL"),
+                            ("import-md", "importer un dossier Markdown")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("path")
+        command.add_argument("--parent", type=int, help="nœud sous lequel importer")
+        command.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                             help="nœuds par transaction")
+
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+    elif args.notebook:
+        database.DB_PATH = notebooks.notebook_path(args.notebook)
+        os.makedirs(os.path.dirname(database.DB_PATH), exist_ok=True)
+    database.init_db()
+
+    if args.command == "export-html":
+        stats = site_export.export_site(args.path, args.root, args.workers)
+        seconds = stats["seconds"]
+        rate = stats["rendered"] / seconds if seconds else 0
+        print(f"{stats['notes']} notes: {stats['rendered']} rendered, "
+              f"{stats['skipped']} unchanged, {stats['removed']} removed "
+              f"in {seconds:.1f}s ({rate:.0f} pages/s, "
+              f"{stats['bytes'] / 1e6 / seconds if seconds else 0:.1f} MB/s)", file=sys.stderr)
+        return
+
+    start = time.perf_counter()
+    if args.command == "export-jsonl":
+        count = export_jsonl(args.path, args.root)
+    elif args.command == "export-md":
+        count = export_markdown(args.path, args.root)
+    elif args.command == "import-jsonl":
+        count = import_jsonl(args.path, args.parent, args.batch_size)
+    else:
+        count = import_markdown(args.path, args.parent, args.batch_size)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0
+    print(f"{count} nodes in {elapsed:.1f}s ({rate:.0f} nodes/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
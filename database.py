@@ -1,139 +1,1525 @@
 import sqlite3
 import os
+import re
+import threading
+import atexit
+import time
+from contextlib import contextmanager
+
+import blobs
+import instrumentation
+import links
+import ranks
+import revisions
+from models import NodeCache
 
 # Assurer que le dossier data existe
 data_dir = os.path.join(os.path.dirname(__file__), "data")
 os.makedirs(data_dir, exist_ok=True)
 DB_PATH = os.path.join(data_dir, "notes.db")
 
-def get_connection():
-    """Retourne une connexion SQLite."""
-    conn = sqlite3.connect(DB_PATH)
+# Réglages appliqués à chaque connexion ouverte
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",       # 64 Mo de cache de pages
+    "PRAGMA mmap_size=268435456",     # 256 Mo de lecture en mmap
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Nombre de requêtes préparées gardées en cache par connexion
+STATEMENT_CACHE_SIZE = 256
+
+# Garde-fou contre une base corrompue contenant un cycle de parents
+MAX_DEPTH = 10000
+
+# Taille des morceaux de blob compressé lus par iter_content()
+CONTENT_CHUNK_BYTES = 64 * 1024
+
+def _connect(path):
+    """Ouvre une connexion configurée (WAL, pragmas, cache de requêtes)."""
+    conn = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        # Connexions chronométrées si l'instrumentation est active
+        factory=instrumentation.connection_factory(),
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # Décompression des textes de notes, utilisée par la vue nodes_text
+    conn.create_function("nn_inflate", 2, blobs.decompress, deterministic=True)
     return conn
 
+class ConnectionManager:
+    """Une connexion d'écriture unique et une connexion de lecture par thread.
+
+    Les connexions restent ouvertes pendant toute la vie de l'application,
+    ce qui permet à sqlite3 de réutiliser ses requêtes préparées. Les
+    écritures sont sérialisées par un verrou ; en mode WAL les lecteurs ne
+    sont jamais bloqués par l'écrivain.
+
+    `nodes` est le cache des nœuds lus dans cette base ; il est vidé si une
+    transaction est annulée.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connections_opened = 0
+        self.nodes = NodeCache()
+        # Dernière clé de rang par parent pendant un bulk_insert() (sinon None)
+        self.last_ranks = None
+        # Plus grand id existant au début d'un bulk_insert() en cours : les
+        # nœuds d'id supérieur ne sont indexés qu'à la fin du bloc
+        self.bulk_first_id = None
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._writer_owner = None
+        self._depth = 0
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        # PRAGMA data_version vu lors du dernier check_external_changes()
+        self._data_version = None
+
+    def _open(self):
+        conn = _connect(self.path)
+        self.connections_opened += 1
+        return conn
+
+    def reader(self):
+        """Retourne la connexion de lecture du thread courant.
+
+        Si le thread courant a une transaction d'écriture en cours, on
+        retourne la connexion d'écriture pour qu'il voie ses propres
+        modifications non encore validées.
+        """
+        if self._writer_owner == threading.get_ident():
+            return self._writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Transaction d'écriture ; les appels imbriqués partagent la même.
+
+        La validation (ou l'annulation en cas d'exception) n'a lieu qu'à la
+        sortie du bloc le plus externe.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            self._depth += 1
+            self._writer_owner = threading.get_ident()
+            try:
+                yield conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._writer_owner = None
+                    conn.rollback()
+                    # Le cache a pu recevoir des écritures annulées
+                    self.nodes.clear()
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._writer_owner = None
+                    conn.commit()
+
+    def check_external_changes(self):
+        """Vide le cache de nœuds si un autre processus a modifié la base.
+
+        PRAGMA data_version sur la connexion d'écriture ne change qu'avec
+        les validations des autres connexions ; dans ce processus, toutes
+        les écritures passent par elle. Si une écriture est en cours, la
+        vérification est remise au prochain appel. Retourne True si le
+        cache a été vidé.
+        """
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._writer is None:
+                self._writer = self._open()
+            version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+            changed = version != self._data_version
+            self._data_version = version
+        finally:
+            self._write_lock.release()
+        if changed:
+            self.nodes.clear()
+        return changed
+
+    def execute_outside_transaction(self, sql):
+        """Exécute une commande qui refuse les transactions (VACUUM…) sur la
+        connexion d'écriture, en excluant les autres écrivains."""
+        with self._write_lock:
+            if self._depth:
+                raise RuntimeError(f"{sql} impossible pendant une transaction")
+            if self._writer is None:
+                self._writer = self._open()
+            self._writer.execute(sql)
+
+    def close(self):
+        """Ferme toutes les connexions ouvertes par ce gestionnaire."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+        self._local = threading.local()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_manager():
+    """Retourne le gestionnaire de connexions associé à DB_PATH."""
+    global _manager
+    manager = _manager
+    if manager is None or manager.path != DB_PATH:
+        with _manager_lock:
+            if _manager is not None and _manager.path != DB_PATH:
+                _manager.close()
+                _manager = None
+            if _manager is None:
+                _manager = ConnectionManager(DB_PATH)
+            manager = _manager
+    return manager
+
+def close_connections():
+    """Ferme les connexions longue durée (appelé à la fermeture)."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
+
+atexit.register(close_connections)
+
+@contextmanager
+def batch():
+    """Regroupe plusieurs écritures dans une seule transaction.
+
+    Les fonctions de ce module appelées dans le bloc partagent la même
+    transaction, validée une seule fois à la sortie (annulée en cas
+    d'exception) :
+
+        with database.batch():
+            for node_id in ids:
+                database.update_node(node_id, collapsed=1)
+    """
+    with get_manager().writer() as conn:
+        yield conn
+
+@contextmanager
+def bulk_insert():
+    """Comme batch(), pour créer beaucoup de nœuds d'un coup.
+
+    Les nœuds créés dans le bloc sont ajoutés à l'index plein texte par une
+    seule requête à la fin plutôt que par `fts_queue`, ligne par ligne. Le
+    trigger n'est retiré qu'à l'intérieur de la transaction : les autres
+    connexions ne le voient jamais manquer. La dernière clé de rang de
+    chaque parent est gardée en mémoire pour ne pas la relire à chaque
+    ajout. Les nœuds créés dans le bloc peuvent y être modifiés ou
+    supprimés : seul leur état final est indexé.
+
+    Appelé dans une transaction déjà ouverte (batch() ou un autre
+    bulk_insert()), il se comporte comme batch() : les nœuds sont indexés
+    par la transaction externe, une seule fois.
+    """
+    manager = get_manager()
+    with manager.writer() as conn:
+        if manager._depth > 1:
+            yield conn
+            return
+        # Sans BEGIN explicite, sqlite3 validerait le DROP aussitôt
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        # AUTOINCREMENT : les nouveaux ids dépassent tous les ids existants
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM nodes").fetchone()[0]
+        conn.execute("DROP TRIGGER IF EXISTS fts_queue_insert")
+        manager.last_ranks = {}
+        manager.bulk_first_id = first_id
+        try:
+            yield conn
+        finally:
+            manager.last_ranks = None
+            manager.bulk_first_id = None
+        # Modifications des nouveaux nœuds encore en file : déjà couvertes
+        # par l'indexation ci-dessous
+        conn.execute("DELETE FROM fts_queue WHERE node_id > ?", (first_id,))
+        conn.execute("""
+            INSERT INTO nodes_fts(rowid, title, content)
+            SELECT id, title, content FROM nodes_text WHERE id > ?
+        """, (first_id,))
+        conn.execute(_FTS_QUEUE_INSERT_TRIGGER)
+
+def _fetchone(sql, params=()):
+    cursor = get_manager().reader().execute(sql, params)
+    row = cursor.fetchone()
+    # Libère la requête pour ne pas garder une transaction de lecture ouverte
+    cursor.close()
+    return row
+
+def _fetchall(sql, params=()):
+    cursor = get_manager().reader().execute(sql, params)
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def get_connection():
+    """Retourne une nouvelle connexion SQLite configurée.
+
+    L'appelant est responsable de la fermer. Les fonctions de ce module
+    utilisent plutôt les connexions longue durée de get_manager().
+    """
+    return _connect(DB_PATH)
+
 def init_db():
-    """Crée la table si elle n'existe pas encore."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS nodes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            parent_id INTEGER,
-            title TEXT NOT NULL,
-            content TEXT,
-            collapsed INTEGER DEFAULT 0,
-            FOREIGN KEY(parent_id) REFERENCES nodes(id)
-        );
-    """)
-    
-    # Add settings table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        );
+    """Crée la table si elle n'existe pas encore, puis applique les migrations."""
+    manager = get_manager()
+    with manager.writer() as conn:
+        new = conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+    if new:
+        # Base neuve : auto_vacuum=INCREMENTAL (voir maintenance.py), qui
+        # n'est pris en compte qu'au VACUUM puisque le passage en WAL a déjà
+        # créé le fichier ; le VACUUM d'une base vide est immédiat. Une base
+        # existante change de mode pendant la maintenance.
+        vacuum()
+    with manager.writer() as conn:
+        # Transaction explicite : sqlite3 n'en ouvre pas pour les CREATE
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                parent_id INTEGER,
+                title TEXT NOT NULL,
+                content TEXT,
+                collapsed INTEGER DEFAULT 0,
+                FOREIGN KEY(parent_id) REFERENCES nodes(id)
+            );
+        """)
+
+        # L'index de lecture des enfants d'un nœud, (parent_id, rank), est
+        # créé par _migrate_ranks
+
+        # Add settings table
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+
+        _migrate(conn)
+
+def _migrate_fts(conn):
+    """Index plein texte sur le titre et le contenu, tenu à jour par triggers."""
+    statements = (
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(
+            title, content,
+            content='nodes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_insert AFTER INSERT ON nodes BEGIN
+            INSERT INTO nodes_fts(rowid, title, content)
+            VALUES (new.id, new.title, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_delete AFTER DELETE ON nodes BEGIN
+            INSERT INTO nodes_fts(nodes_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_update AFTER UPDATE OF title, content ON nodes BEGIN
+            INSERT INTO nodes_fts(nodes_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO nodes_fts(rowid, title, content)
+            VALUES (new.id, new.title, new.content);
+        END
+        """,
+    )
+    # executescript() validerait la transaction en cours : requête par requête
+    for statement in statements:
+        conn.execute(statement)
+    # Indexer les notes déjà présentes
+    conn.execute("INSERT INTO nodes_fts(nodes_fts) VALUES ('rebuild')")
+
+def _migrate_node_paths(conn):
+    """Table de fermeture : une ligne (ancêtre, descendant, profondeur) par paire.
+
+    Elle rend la détection de cycle, la suppression et le comptage d'un
+    sous-arbre réalisables en une seule requête. Les triggers la tiennent à
+    jour à l'insertion, à la suppression et au changement de parent.
+    """
+    statements = (
+        """
+        CREATE TABLE IF NOT EXISTS node_paths (
+            ancestor INTEGER NOT NULL,
+            descendant INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor, descendant)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_node_paths_descendant ON node_paths(descendant)",
+        """
+        CREATE TRIGGER IF NOT EXISTS node_paths_insert AFTER INSERT ON nodes BEGIN
+            INSERT INTO node_paths(ancestor, descendant, depth)
+            SELECT ancestor, new.id, depth + 1 FROM node_paths
+            WHERE descendant = new.parent_id
+            UNION ALL
+            SELECT new.id, new.id, 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS node_paths_delete AFTER DELETE ON nodes BEGIN
+            DELETE FROM node_paths WHERE descendant = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS node_paths_move AFTER UPDATE OF parent_id ON nodes
+        WHEN old.parent_id IS NOT new.parent_id BEGIN
+            DELETE FROM node_paths
+            WHERE descendant IN (SELECT descendant FROM node_paths WHERE ancestor = new.id)
+              AND ancestor NOT IN (SELECT descendant FROM node_paths WHERE ancestor = new.id);
+            INSERT INTO node_paths(ancestor, descendant, depth)
+            SELECT above.ancestor, below.descendant, above.depth + below.depth + 1
+            FROM node_paths above, node_paths below
+            WHERE above.descendant = new.parent_id AND below.ancestor = new.id;
+        END
+        """,
+    )
+    for statement in statements:
+        conn.execute(statement)
+    # Remplir la table pour les nœuds existants
+    conn.execute("""
+        WITH RECURSIVE paths(ancestor, descendant, depth) AS (
+            SELECT id, id, 0 FROM nodes
+            UNION ALL
+            SELECT p.ancestor, n.id, p.depth + 1
+            FROM paths p JOIN nodes n ON n.parent_id = p.descendant
+            WHERE p.depth < ?
+        )
+        INSERT OR IGNORE INTO node_paths(ancestor, descendant, depth)
+        SELECT ancestor, descendant, depth FROM paths
+    """, (MAX_DEPTH,))
+
+def _migrate_blobs(conn):
+    """Déplace le texte des notes dans une table de blobs compressés.
+
+    `nodes.content` est remplacé par `nodes.content_hash`, clé de la table
+    `blobs` ; une note identique à une autre ne coûte donc plus qu'une
+    empreinte. La vue `nodes_text` redonne le texte décompressé et sert de
+    contenu externe à l'index plein texte.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
     """)
-    conn.commit()
-    conn.close()
+    conn.execute("ALTER TABLE nodes ADD COLUMN content_hash TEXT")
+
+    # Les triggers et l'index de l'ancien schéma lisent nodes.content
+    for trigger in ("nodes_fts_insert", "nodes_fts_delete", "nodes_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS nodes_fts")
+
+    # Par lots, pour ne pas charger toute la base en mémoire
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, content FROM nodes WHERE id > ? ORDER BY id LIMIT 500",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        for node_id, content in rows:
+            if content is not None:
+                conn.execute(
+                    "UPDATE nodes SET content_hash = ? WHERE id = ?",
+                    (_store_blob(conn, content), node_id),
+                )
+        last_id = rows[-1][0]
+
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute("ALTER TABLE nodes DROP COLUMN content")
+    else:
+        conn.execute("UPDATE nodes SET content = NULL")
+
+    statements = (
+        "CREATE INDEX IF NOT EXISTS idx_nodes_content_hash ON nodes(content_hash)",
+        """
+        CREATE VIEW IF NOT EXISTS nodes_text AS
+        SELECT n.id, n.parent_id, n.title, nn_inflate(b.codec, b.data) AS content,
+               n.collapsed
+        FROM nodes n LEFT JOIN blobs b ON b.hash = n.content_hash
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(
+            title, content,
+            content='nodes_text', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        # Triggers remplacés par ceux de _migrate_fts_queue
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_insert AFTER INSERT ON nodes BEGIN
+            INSERT INTO nodes_fts(rowid, title, content)
+            SELECT new.id, new.title,
+                   (SELECT nn_inflate(codec, data) FROM blobs WHERE hash = new.content_hash);
+        END
+        """,
+        # Retirer l'ancien texte de l'index avant de libérer son blob s'il
+        # n'est plus référencé : les deux étapes restent dans le même
+        # trigger pour garantir cet ordre
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_delete AFTER DELETE ON nodes BEGIN
+            INSERT INTO nodes_fts(nodes_fts, rowid, title, content)
+            SELECT 'delete', old.id, old.title,
+                   (SELECT nn_inflate(codec, data) FROM blobs WHERE hash = old.content_hash);
+            DELETE FROM blobs WHERE hash = old.content_hash
+              AND NOT EXISTS (SELECT 1 FROM nodes WHERE content_hash = old.content_hash);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_update AFTER UPDATE OF title, content_hash ON nodes
+        WHEN old.title IS NOT new.title OR old.content_hash IS NOT new.content_hash BEGIN
+            INSERT INTO nodes_fts(nodes_fts, rowid, title, content)
+            SELECT 'delete', old.id, old.title,
+                   (SELECT nn_inflate(codec, data) FROM blobs WHERE hash = old.content_hash);
+            INSERT INTO nodes_fts(rowid, title, content)
+            SELECT new.id, new.title,
+                   (SELECT nn_inflate(codec, data) FROM blobs WHERE hash = new.content_hash);
+            DELETE FROM blobs WHERE hash = old.content_hash
+              AND old.content_hash IS NOT new.content_hash
+              AND NOT EXISTS (SELECT 1 FROM nodes WHERE content_hash = old.content_hash);
+        END
+        """,
+    )
+    for statement in statements:
+        conn.execute(statement)
+    conn.execute("INSERT INTO nodes_fts(nodes_fts) VALUES ('rebuild')")
+
+def _migrate_revisions(conn):
+    """Historique des notes : instantanés complets et deltas compressés.
+
+    `snapshot` vaut 1 pour un texte complet, 0 pour un delta par rapport à
+    la révision précédente du même nœud (voir revisions.py) ; `hash` est
+    l'empreinte du texte obtenu.
+    """
+    statements = (
+        """
+        CREATE TABLE IF NOT EXISTS revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            snapshot INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_revisions_node ON revisions(node_id, id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS revisions_delete AFTER DELETE ON nodes BEGIN
+            DELETE FROM revisions WHERE node_id = old.id;
+        END
+        """,
+    )
+    for statement in statements:
+        conn.execute(statement)
+
+def _migrate_ranks(conn):
+    """Ordre des frères : colonne `rank` (clé de ranks.py), indexée avec le parent.
+
+    Les nœuds existants sont numérotés dans l'ordre de leurs ids, l'ordre
+    dans lequel ils s'affichaient jusque-là.
+    """
+    conn.execute("ALTER TABLE nodes ADD COLUMN rank TEXT")
+    updates = []
+    previous_parent = object()
+    for node_id, parent_id in conn.execute(
+        "SELECT id, parent_id FROM nodes ORDER BY parent_id, id"
+    ).fetchall():
+        if parent_id != previous_parent:
+            previous_parent = parent_id
+            key = None
+        key = ranks.key_between(key, None)
+        updates.append((key, node_id))
+    conn.executemany("UPDATE nodes SET rank = ? WHERE id = ?", updates)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_parent_rank ON nodes(parent_id, rank)")
+    # Remplacé par le nouvel index, qui sert aussi les recherches par parent seul
+    conn.execute("DROP INDEX IF EXISTS idx_nodes_parent")
+
+def _migrate_links(conn):
+    """Liens entre notes ([[Titre]], [[#id]]) : une ligne (source, cible) par lien.
+
+    La cible est une clé de links.py ; l'index sur la cible donne les
+    rétroliens d'une note sans lire aucun texte. L'index sur le titre sert
+    à suivre un lien par titre.
+    """
+    statements = (
+        """
+        CREATE TABLE IF NOT EXISTS links (
+            source_id INTEGER NOT NULL,
+            target TEXT NOT NULL COLLATE NOCASE,
+            PRIMARY KEY (source_id, target)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_links_target ON links(target, source_id)",
+        "CREATE INDEX IF NOT EXISTS idx_nodes_title ON nodes(title COLLATE NOCASE)",
+        """
+        CREATE TRIGGER IF NOT EXISTS links_delete AFTER DELETE ON nodes BEGIN
+            DELETE FROM links WHERE source_id = old.id;
+        END
+        """,
+    )
+    for statement in statements:
+        conn.execute(statement)
+    # Liens des notes existantes, par lots
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, content FROM nodes_text WHERE id > ? ORDER BY id LIMIT 500",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            break
+        for node_id, content in rows:
+            _update_links(conn, node_id, content)
+        last_id = rows[-1][0]
+
+# Le trigger d'insertion est retiré par bulk_insert() le temps d'un import
+_FTS_QUEUE_INSERT_TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS fts_queue_insert AFTER INSERT ON nodes BEGIN
+        INSERT INTO fts_queue (node_id, indexed) VALUES (new.id, 0);
+    END
+"""
+
+def _migrate_fts_queue(conn):
+    """L'index plein texte est tenu à jour en Python, plus par les triggers.
+
+    Les triggers de _migrate_blobs appelaient nn_inflate, que seule
+    l'application enregistre : tout autre client SQLite (shell sqlite3,
+    script, outil de sauvegarde) échouait sur chaque écriture de `nodes`.
+    Les triggers se contentent désormais de noter les nœuds modifiés dans
+    `fts_queue`, avec le titre et le blob encore indexés ; _sync_fts()
+    met l'index à jour dans la même transaction, puis libère les blobs qui
+    ne servent plus. Les écritures d'un autre client sont indexées à la
+    prochaine écriture de l'application (ou passe de maintenance).
+    """
+    statements = (
+        "DROP TRIGGER IF EXISTS nodes_fts_insert",
+        "DROP TRIGGER IF EXISTS nodes_fts_update",
+        "DROP TRIGGER IF EXISTS nodes_fts_delete",
+        """
+        CREATE TABLE IF NOT EXISTS fts_queue (
+            seq INTEGER PRIMARY KEY,
+            node_id INTEGER NOT NULL,
+            indexed INTEGER NOT NULL,
+            old_title TEXT,
+            old_hash TEXT
+        )
+        """,
+        _FTS_QUEUE_INSERT_TRIGGER,
+        """
+        CREATE TRIGGER IF NOT EXISTS fts_queue_update AFTER UPDATE OF title, content_hash ON nodes
+        WHEN old.title IS NOT new.title OR old.content_hash IS NOT new.content_hash BEGIN
+            INSERT INTO fts_queue (node_id, indexed, old_title, old_hash)
+            VALUES (old.id, 1, old.title, old.content_hash);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS fts_queue_delete AFTER DELETE ON nodes BEGIN
+            INSERT INTO fts_queue (node_id, indexed, old_title, old_hash)
+            VALUES (old.id, 1, old.title, old.content_hash);
+        END
+        """,
+    )
+    for statement in statements:
+        conn.execute(statement)
+
+# Migrations appliquées dans l'ordre ; PRAGMA user_version retient la dernière
+_MIGRATIONS = [
+    _migrate_fts,
+    _migrate_node_paths,
+    _migrate_blobs,
+    _migrate_revisions,
+    _migrate_ranks,
+    _migrate_links,
+    _migrate_fts_queue,
+]
+
+def _migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(_MIGRATIONS, start=1):
+        if version < target:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+
+def _store_blob(conn, content):
+    """Enregistre un texte dans `blobs` s'il n'y est pas déjà ; retourne sa clé."""
+    if content is None:
+        return None
+    key = blobs.blob_hash(content)
+    exists = conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (key,)).fetchone()
+    if not exists:
+        codec, data = blobs.compress(content)
+        conn.execute(
+            "INSERT INTO blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)",
+            (key, codec, len(content.encode("utf-8")), data),
+        )
+    return key
+
+def _sync_fts(conn):
+    """Reporte dans l'index plein texte les changements notés dans `fts_queue`.
+
+    Pour chaque nœud, la première entrée en file donne ce que l'index
+    contient encore (rien pour un nœud créé depuis) : il en est retiré,
+    puis l'état actuel du nœud est indexé s'il existe toujours. Les blobs
+    remplacés ou supprimés sont libérés ensuite, s'ils ne servent plus.
+
+    Pendant un bulk_insert(), les nœuds créés dans le bloc ne sont pas
+    encore dans l'index : ils sont laissés à l'indexation de fin de bloc.
+    """
+    rows = conn.execute(
+        "SELECT seq, node_id, indexed, old_title, old_hash FROM fts_queue ORDER BY seq"
+    ).fetchall()
+    if not rows:
+        return
+    first_id = get_manager().bulk_first_id
+    indexed = {}
+    released = set()
+    for _, node_id, was_indexed, title, key in rows:
+        indexed.setdefault(node_id, (was_indexed, title, key))
+        if key is not None:
+            released.add(key)
+    for node_id, (was_indexed, title, key) in indexed.items():
+        if was_indexed and (first_id is None or node_id <= first_id):
+            conn.execute(
+                "INSERT INTO nodes_fts (nodes_fts, rowid, title, content) VALUES ('delete', ?, ?, ?)",
+                (node_id, title, _blob_text(conn, key)),
+            )
+    last_seq = rows[-1][0]
+    conn.execute("""
+        INSERT INTO nodes_fts (rowid, title, content)
+        SELECT id, title, content FROM nodes_text
+        WHERE id IN (SELECT node_id FROM fts_queue WHERE seq <= ?)
+          AND (? IS NULL OR id <= ?)
+    """, (last_seq, first_id, first_id))
+    conn.execute("DELETE FROM fts_queue WHERE seq <= ?", (last_seq,))
+    conn.executemany(
+        "DELETE FROM blobs WHERE hash = :key AND NOT EXISTS (SELECT 1 FROM nodes WHERE content_hash = :key)",
+        [{"key": key} for key in released],
+    )
+
+def sync_search_index():
+    """Indexe les écritures d'autres clients SQLite encore en file (celles
+    de l'application le sont dans leur propre transaction)."""
+    with get_manager().writer() as conn:
+        _sync_fts(conn)
+
+def _blob_text(conn, key):
+    """Texte d'un blob (None s'il n'existe pas)."""
+    if key is None:
+        return None
+    row = conn.execute("SELECT codec, data FROM blobs WHERE hash = ?", (key,)).fetchone()
+    return blobs.decompress(*row) if row else None
+
+def _update_links(conn, node_id, content, new=False):
+    """Met la table `links` à jour pour le nouveau texte d'une note.
+
+    Seules les différences avec les liens déjà enregistrés sont écrites.
+    """
+    keys = links.link_keys(content)
+    old_keys = set() if new else {row[0] for row in conn.execute(
+        "SELECT target FROM links WHERE source_id = ?", (node_id,)
+    )}
+    if keys == old_keys:
+        return
+    conn.executemany("DELETE FROM links WHERE source_id = ? AND target = ?",
+                     [(node_id, key) for key in old_keys - keys])
+    conn.executemany("INSERT OR IGNORE INTO links (source_id, target) VALUES (?, ?)",
+                     [(node_id, key) for key in keys - old_keys])
+
+def _last_rank(conn, parent_id, exclude_id=None):
+    """Plus grande clé de rang parmi les enfants de parent_id (None s'il n'y en a pas)."""
+    sql = """
+        SELECT rank FROM nodes WHERE parent_id {} AND id IS NOT ?
+        ORDER BY rank DESC LIMIT 1
+    """
+    if parent_id is None:
+        row = conn.execute(sql.format("IS NULL"), (exclude_id,)).fetchone()
+    else:
+        row = conn.execute(sql.format("= ?"), (parent_id, exclude_id)).fetchone()
+    return row[0] if row else None
 
 def create_node(title, parent_id=None, content="", collapsed=0):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO nodes (title, parent_id, content, collapsed)
-        VALUES (?, ?, ?, ?)
-    """, (title, parent_id, content, collapsed))
-    conn.commit()
-    node_id = cursor.lastrowid
-    conn.close()
-    return node_id
+    """Crée un nœud, placé après ses frères ; retourne son id."""
+    manager = get_manager()
+    with manager.writer() as conn:
+        last_ranks = manager.last_ranks
+        if last_ranks is not None and parent_id in last_ranks:
+            last = last_ranks[parent_id]
+        else:
+            last = _last_rank(conn, parent_id)
+        rank = ranks.key_between(last, None)
+        if len(rank) > ranks.MAX_RANK_LENGTH:
+            rank = ranks.key_between(_rebalance_children(conn, parent_id), None)
+        cursor = conn.execute("""
+            INSERT INTO nodes (title, parent_id, content_hash, collapsed, rank)
+            VALUES (?, ?, ?, ?, ?)
+        """, (title, parent_id, _store_blob(conn, content), collapsed, rank))
+        if last_ranks is not None:
+            last_ranks[parent_id] = rank
+        _update_links(conn, cursor.lastrowid, content, new=True)
+        _sync_fts(conn)
+        return cursor.lastrowid
 
 def get_node(node_id):
+    """Retourne le models.Node complet (texte compris), ou None.
+
+    Le nœud vient du cache quand il y est, texte compris ; c'est avec
+    get_content() le seul endroit où le texte d'une note est décompressé.
+    Tant que son texte reste en cache, le même objet est retourné pour un
+    même id : il ne doit pas être modifié par l'appelant.
+    """
+    cache = get_manager().nodes
+    node = cache.get(node_id, with_content=True)
+    if node is not None:
+        return node
+    generation = cache.generation
+    row = _fetchone(
+        "SELECT id, parent_id, title, content, collapsed FROM nodes_text WHERE id = ?",
+        (node_id,),
+    )
+    if row is None:
+        return None
+    node_id, parent_id, title, content, collapsed = row
+    return cache.put(generation, node_id, parent_id, title, collapsed, content, with_content=True)
+
+def get_content(node_id):
+    """Texte d'une seule note, lu à la demande."""
+    node = get_node(node_id)
+    return node.content if node is not None else None
+
+def get_content_size(node_id):
+    """Taille en octets (UTF-8) du texte d'une note, sans le décompresser.
+
+    Retourne None si le nœud n'existe pas, 0 s'il n'a pas de texte.
+    """
+    row = _fetchone("""
+        SELECT COALESCE(b.size, 0) FROM nodes n
+        LEFT JOIN blobs b ON b.hash = n.content_hash WHERE n.id = ?
+    """, (node_id,))
+    return row[0] if row else None
+
+def iter_content(node_id, chunk_size=CONTENT_CHUNK_BYTES):
+    """Texte d'une note par morceaux, pour les très grosses notes.
+
+    Le blob est lu par tranches de `chunk_size` octets (lecture
+    incrémentale de SQLite) et décompressé au fil de l'eau ; ni le texte
+    ni le blob ne sont chargés d'un bloc, et rien n'est mis en cache. Une
+    connexion dédiée est ouverte pour la durée de la lecture, pour ne pas
+    figer l'instantané de lecture du thread appelant : l'appelant qui
+    abandonne la lecture doit fermer le générateur (close()).
+    """
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM nodes WHERE id = ?", (node_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    try:
+        row = conn.execute("""
+            SELECT b.rowid, b.codec FROM nodes n
+            JOIN blobs b ON b.hash = n.content_hash WHERE n.id = ?
+        """, (node_id,)).fetchone()
+        if row is None:
+            return
+        rowid, codec = row
+        if hasattr(conn, "blobopen"):
+            with conn.blobopen("blobs", "data", rowid, readonly=True) as blob:
+                yield from blobs.iter_decompress(
+                    codec, iter(lambda: blob.read(chunk_size), b""))
+        else:
+            # Python < 3.11 : pas de lecture incrémentale des blobs
+            data = conn.execute("SELECT data FROM blobs WHERE rowid = ?", (rowid,)).fetchone()[0]
+            yield from blobs.iter_decompress(
+                codec, (data[i:i + chunk_size] for i in range(0, len(data), chunk_size)))
+    finally:
+        conn.close()
+
+def _node_info(node_id):
+    """Node du cache, sans forcément son texte ; lu en base s'il manque."""
+    cache = get_manager().nodes
+    node = cache.get(node_id)
+    if node is None:
+        generation = cache.generation
+        row = _fetchone(
+            "SELECT id, parent_id, title, collapsed FROM nodes WHERE id = ?", (node_id,)
+        )
+        if row is None:
+            return None
+        node = cache.put(generation, *row)
+    return node
+
+def get_title(node_id):
+    node = _node_info(node_id)
+    return node.title if node is not None else None
+
+def get_node_version(node_id):
+    """(parent_id, title, collapsed, content_hash) lus en base, sans le cache
+    ni le texte ; None si le nœud n'existe pas. Sert à détecter un
+    changement à moindre coût (ETag du serveur HTTP)."""
+    return _fetchone(
+        "SELECT parent_id, title, collapsed, content_hash FROM nodes WHERE id = ?", (node_id,)
+    )
+
+def check_external_changes():
+    """Voir ConnectionManager.check_external_changes()."""
+    return get_manager().check_external_changes()
+
+def cache_stats():
+    """Compteurs du cache de nœuds (succès, échecs, taille)."""
+    return get_manager().nodes.stats()
 
 def get_children(parent_id=None):
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Retourne (id, parent_id, title, collapsed) pour chaque enfant direct.
+
+    Le texte des notes n'est pas lu : voir get_node() / get_content().
+    """
+    if parent_id is None:
+        return _fetchall(
+            "SELECT id, parent_id, title, collapsed FROM nodes "
+            "WHERE parent_id IS NULL ORDER BY rank, id"
+        )
+    return _fetchall(
+        "SELECT id, parent_id, title, collapsed FROM nodes "
+        "WHERE parent_id = ? ORDER BY rank, id",
+        (parent_id,),
+    )
+
+def load_tree_skeleton():
+    """Charge la structure de tout l'arbre en une seule requête.
+
+    Seules les colonnes affichées dans l'arbre sont lues (pas `content`).
+    Retourne un dict parent_id -> liste de (id, title, collapsed) dans
+    l'ordre des frères, la racine étant indexée par None.
+    """
+    children = {}
+    rows = _fetchall("SELECT id, parent_id, title, collapsed FROM nodes ORDER BY rank, id")
+    for node_id, parent_id, title, collapsed in rows:
+        children.setdefault(parent_id, []).append((node_id, title, collapsed))
+    return children
+
+def get_child_skeleton(parent_id=None):
+    """Retourne (id, title, collapsed, has_children) pour chaque enfant direct.
+
+    Utilisé par le modèle de l'arbre pour ne charger que les nœuds dépliés.
+    """
+    sql = """
+        SELECT n.id, n.title, n.collapsed,
+               EXISTS(SELECT 1 FROM nodes c WHERE c.parent_id = n.id)
+        FROM nodes n
+        WHERE n.parent_id {}
+        ORDER BY n.rank, n.id
+    """
+    cache = get_manager().nodes
+    generation = cache.generation
     if parent_id is None:
-        cursor.execute("SELECT * FROM nodes WHERE parent_id IS NULL")
+        rows = _fetchall(sql.format("IS NULL"))
     else:
-        cursor.execute("SELECT * FROM nodes WHERE parent_id = ?", (parent_id,))
-    rows = cursor.fetchall()
-    conn.close()
+        rows = _fetchall(sql.format("= ?"), (parent_id,))
+    # Les nœuds affichés dans l'arbre : titre et parent sans requête ensuite
+    for node_id, title, collapsed, _ in rows:
+        cache.put(generation, node_id, parent_id, title, collapsed)
     return rows
 
+def iter_tree(parent_id=None, content=True):
+    """Parcourt les descendants de parent_id en pré-ordre, sans charger
+    l'arbre en mémoire (une requête ouverte par niveau de profondeur).
+
+    Génère des tuples (id, parent_id, title, content, collapsed, depth),
+    depth valant 0 pour les enfants directs de parent_id. Un parent est
+    toujours produit avant ses enfants, les frères dans leur ordre. Avec
+    content=False, le texte est remplacé par son empreinte (content_hash),
+    sans rien décompresser.
+    """
+    conn = get_manager().reader()
+    if content:
+        sql = """
+            SELECT t.id, t.parent_id, t.title, t.content, t.collapsed
+            FROM nodes n JOIN nodes_text t ON t.id = n.id
+            WHERE n.parent_id {} ORDER BY n.rank, n.id
+        """
+    else:
+        sql = """
+            SELECT id, parent_id, title, content_hash, collapsed
+            FROM nodes WHERE parent_id {} ORDER BY rank, id
+        """
+    if parent_id is None:
+        stack = [conn.execute(sql.format("IS NULL"))]
+    else:
+        stack = [conn.execute(sql.format("= ?"), (parent_id,))]
+    try:
+        while stack:
+            row = stack[-1].fetchone()
+            if row is None:
+                stack.pop().close()
+                continue
+            yield row + (len(stack) - 1,)
+            stack.append(conn.execute(sql.format("= ?"), (row[0],)))
+    finally:
+        for cursor in stack:
+            cursor.close()
+
+# Longueur minimale du dernier mot pour le chercher comme préfixe ; en deçà
+# le préfixe correspond à trop de termes pour rester rapide
+MIN_PREFIX_LENGTH = 3
+
+def _fts_query(text):
+    """Transforme une saisie libre en requête FTS5 sûre (préfixe sur le dernier mot)."""
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    query = " ".join(f'"{term}"' for term in terms)
+    if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        query += "*"
+    return query
+
+_SEARCH_SQL = """
+    SELECT n.id, n.title,
+           snippet(nodes_fts, 1, ?, ?, '…', 12),
+           bm25(nodes_fts, 10.0, 1.0) AS score
+    FROM nodes_fts
+    JOIN nodes n ON n.id = nodes_fts.rowid
+    WHERE nodes_fts MATCH ?
+    ORDER BY score
+    LIMIT ?
+"""
+
+def search(query, limit=50, markers=("<b>", "</b>")):
+    """Recherche plein texte dans les titres et contenus.
+
+    Retourne une liste de (id, title, snippet) triée par pertinence (BM25,
+    le titre pesant plus que le contenu). `markers` encadre les termes
+    trouvés dans l'extrait.
+    """
+    fts_query = _fts_query(query)
+    if fts_query is None:
+        return []
+    rows = _fetchall(_SEARCH_SQL, (markers[0], markers[1], fts_query, limit))
+    return [row[:3] for row in rows]
+
+def search_file(path, query, limit=50, markers=("<b>", "</b>")):
+    """Comme search(), dans une autre base (voir notebooks.search_all).
+
+    Passe par une connexion ouverte pour l'occasion : utilisable depuis
+    n'importe quel thread. Retourne des (id, title, snippet, score), le
+    score BM25 (plus petit = plus pertinent) permettant de fusionner les
+    résultats de plusieurs bases.
+    """
+    fts_query = _fts_query(query)
+    if fts_query is None:
+        return []
+    conn = _connect(path)
+    try:
+        return conn.execute(_SEARCH_SQL, (markers[0], markers[1], fts_query, limit)).fetchall()
+    finally:
+        conn.close()
+
+def get_backlinks(node_id):
+    """Notes qui pointent vers node_id ([[#id]] ou [[son titre]]).
+
+    Retourne des tuples (id, title) triés par titre.
+    """
+    title = get_title(node_id)
+    if title is None:
+        return []
+    return _fetchall("""
+        SELECT n.id, n.title FROM links l JOIN nodes n ON n.id = l.source_id
+        WHERE l.target IN (?, ?) AND l.source_id != ?
+        GROUP BY n.id ORDER BY n.title COLLATE NOCASE, n.id
+    """, (f"#{node_id}", links.title_key(title), node_id))
+
+def resolve_link(target):
+    """Id de la note désignée par un lien (texte entre [[ ]]), ou None.
+
+    Entre plusieurs notes de même titre, la plus ancienne l'emporte.
+    """
+    key = links.link_key(target)
+    if key is None:
+        return None
+    node_id = links.node_id_of(key)
+    if node_id is not None:
+        row = _fetchone("SELECT id FROM nodes WHERE id = ?", (node_id,))
+    else:
+        row = _fetchone(
+            "SELECT id FROM nodes WHERE title = ? COLLATE NOCASE ORDER BY id LIMIT 1",
+            (target.strip(),),
+        )
+    return row[0] if row else None
+
+def get_ancestors(node_id):
+    """Ids des ancêtres d'un nœud, de la racine jusqu'au nœud lui-même."""
+    rows = _fetchall(
+        "SELECT ancestor FROM node_paths WHERE descendant = ? ORDER BY depth DESC",
+        (node_id,),
+    )
+    return [row[0] for row in rows]
+
+def is_descendant(node_id, ancestor_id):
+    """Vrai si node_id est ancestor_id ou se trouve dans son sous-arbre."""
+    row = _fetchone(
+        "SELECT 1 FROM node_paths WHERE ancestor = ? AND descendant = ?",
+        (ancestor_id, node_id),
+    )
+    return row is not None
+
+def count_subtree(node_id):
+    """Nombre de nœuds du sous-arbre, le nœud lui-même compris."""
+    return _fetchone(
+        "SELECT COUNT(*) FROM node_paths WHERE ancestor = ?", (node_id,)
+    )[0]
+
+def _insert_revision(conn, node_id, text, key, base=None, deltas=0):
+    """Ajoute une révision : delta par rapport à `base` si possible, sinon
+    instantané (pas de base, MAX_DELTAS atteint ou delta trop gros)."""
+    delta = None
+    if base is not None and deltas < revisions.MAX_DELTAS:
+        delta = revisions.make_delta(base, text)
+    codec, data = blobs.compress(text if delta is None else delta)
+    conn.execute("""
+        INSERT INTO revisions (node_id, created_at, snapshot, hash, size, codec, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (node_id, time.time(), int(delta is None), key,
+          len(text.encode("utf-8")), codec, data))
+
+def _record_revision(conn, node_id, content, key):
+    """Historise le nouveau contenu d'un nœud avant sa mise à jour."""
+    row = conn.execute("SELECT content_hash FROM nodes WHERE id = ?", (node_id,)).fetchone()
+    if row is None or row[0] == key:
+        return
+    old_key = row[0]
+    latest = conn.execute(
+        "SELECT id, hash FROM revisions WHERE node_id = ? ORDER BY id DESC LIMIT 1",
+        (node_id,),
+    ).fetchone()
+    old_text = None
+    if old_key is not None:
+        old_text = blobs.decompress(*conn.execute(
+            "SELECT codec, data FROM blobs WHERE hash = ?", (old_key,)
+        ).fetchone())
+    if latest is None:
+        # Premier enregistrement : garder d'abord la version d'avant
+        if old_text is not None:
+            _insert_revision(conn, node_id, old_text, old_key)
+        base, deltas = old_text, 0
+    else:
+        base = old_text if latest[1] == old_key else _revision_text(conn, latest[0])
+        deltas = conn.execute("""
+            SELECT COUNT(*) FROM revisions
+            WHERE node_id = ? AND snapshot = 0 AND id > (
+                SELECT MAX(id) FROM revisions WHERE node_id = ? AND snapshot = 1
+            )
+        """, (node_id, node_id)).fetchone()[0]
+    _insert_revision(conn, node_id, content, key, base, deltas)
+
+def _revision_text(conn, revision_id):
+    """Reconstruit le texte d'une révision : dernier instantané + deltas."""
+    rows = conn.execute("""
+        SELECT snapshot, codec, data FROM revisions
+        WHERE node_id = (SELECT node_id FROM revisions WHERE id = :id)
+          AND id <= :id
+          AND id >= (
+              SELECT MAX(id) FROM revisions
+              WHERE node_id = (SELECT node_id FROM revisions WHERE id = :id)
+                AND id <= :id AND snapshot = 1
+          )
+        ORDER BY id
+    """, {"id": revision_id}).fetchall()
+    text = None
+    for snapshot, codec, data in rows:
+        payload = blobs.decompress(codec, data)
+        text = payload if snapshot else revisions.apply_delta(text, payload)
+    return text
+
+def list_revisions(node_id):
+    """Révisions d'un nœud, de la plus récente à la plus ancienne.
+
+    Retourne des tuples (id, created_at, size, snapshot) ; le texte se lit
+    avec get_revision().
+    """
+    return _fetchall("""
+        SELECT id, created_at, size, snapshot FROM revisions
+        WHERE node_id = ? ORDER BY id DESC
+    """, (node_id,))
+
+def get_revision(revision_id):
+    """Texte d'une révision (None si elle n'existe pas)."""
+    return _revision_text(get_manager().reader(), revision_id)
+
 def update_node(node_id, title=None, content=None, collapsed=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     fields = []
     values = []
-    
+
     if title is not None:
         fields.append("title = ?")
         values.append(title)
-    if content is not None:
-        fields.append("content = ?")
-        values.append(content)
     if collapsed is not None:
         fields.append("collapsed = ?")
         values.append(collapsed)
-        
-    if not fields:
+
+    if not fields and content is None:
         return
-        
-    values.append(node_id)
-    
-    sql = f"UPDATE nodes SET {', '.join(fields)} WHERE id = ?"
-    cursor.execute(sql, tuple(values))
-    conn.commit()
-    conn.close()
+
+    with get_manager().writer() as conn:
+        # Nœud disparu (supprimé entre-temps) : ni blob, ni révision, ni liens
+        if conn.execute("SELECT 1 FROM nodes WHERE id = ?", (node_id,)).fetchone() is None:
+            return
+        if content is not None:
+            key = _store_blob(conn, content)
+            _record_revision(conn, node_id, content, key)
+            _update_links(conn, node_id, content)
+            fields.append("content_hash = ?")
+            values.append(key)
+        values.append(node_id)
+        sql = f"UPDATE nodes SET {', '.join(fields)} WHERE id = ?"
+        conn.execute(sql, tuple(values))
+        _sync_fts(conn)
+        changes = {"title": title, "content": content, "collapsed": collapsed}
+        get_manager().nodes.update(
+            node_id, **{field: value for field, value in changes.items() if value is not None}
+        )
 
 def delete_node(node_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Récupérer les enfants
-    cursor.execute("SELECT id FROM nodes WHERE parent_id = ?", (node_id,))
-    child_ids = cursor.fetchall()
-    for (child_id,) in child_ids:
-        delete_node(child_id)  # récursion
-    
-    cursor.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
-    conn.commit()
-    conn.close()
+    """Supprime un nœud et tout son sous-arbre."""
+    manager = get_manager()
+    with manager.writer() as conn:
+        node_ids = [row[0] for row in conn.execute(
+            "SELECT descendant FROM node_paths WHERE ancestor = ?", (node_id,)
+        )]
+        conn.execute("""
+            DELETE FROM nodes
+            WHERE id IN (SELECT descendant FROM node_paths WHERE ancestor = ?)
+        """, (node_id,))
+        _sync_fts(conn)
+        manager.nodes.discard(node_ids)
 
 def update_node_parent(node_id, new_parent_id):
-    """Met à jour le parent d'un nœud."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE nodes 
-        SET parent_id = ? 
-        WHERE id = ?
-    """, (new_parent_id, node_id))
-    conn.commit()
-    conn.close()
+    """Met à jour le parent d'un nœud (et déplace son sous-arbre), en
+    dernière position parmi ses nouveaux frères.
+
+    Lève ValueError si le nouveau parent est le nœud lui-même ou l'un de
+    ses descendants.
+    """
+    move_node(node_id, new_parent_id)
+
+def move_node(node_id, new_parent_id, before_id=None):
+    """Place un nœud sous new_parent_id, juste avant son enfant before_id
+    (en dernier si before_id vaut None).
+
+    Seule la ligne du nœud est modifiée : sa nouvelle clé de rang est prise
+    entre celles de ses voisins. Si elle devient trop longue, les frères
+    sont renumérotés (_rebalance_children). Lève ValueError en cas de cycle
+    ou si before_id n'est pas un enfant de new_parent_id.
+    """
+    with get_manager().writer() as conn:
+        if new_parent_id is not None:
+            cycle = conn.execute(
+                "SELECT 1 FROM node_paths WHERE ancestor = ? AND descendant = ?",
+                (node_id, new_parent_id),
+            ).fetchone()
+            if cycle:
+                raise ValueError("Impossible de déplacer un nœud sous un de ses descendants")
+        rank = _rank_before(conn, node_id, new_parent_id, before_id)
+        if len(rank) > ranks.MAX_RANK_LENGTH:
+            _rebalance_children(conn, new_parent_id)
+            rank = _rank_before(conn, node_id, new_parent_id, before_id)
+        conn.execute("""
+            UPDATE nodes
+            SET parent_id = ?, rank = ?
+            WHERE id = ?
+        """, (new_parent_id, rank, node_id))
+        manager = get_manager()
+        manager.nodes.update(node_id, parent_id=new_parent_id)
+        if manager.last_ranks:
+            manager.last_ranks.clear()
+
+def _rank_before(conn, node_id, parent_id, before_id):
+    """Clé de rang pour placer node_id juste avant before_id (ou en dernier)."""
+    if before_id is None:
+        return ranks.key_between(_last_rank(conn, parent_id, node_id), None)
+    row = conn.execute(
+        "SELECT rank FROM nodes WHERE id = ? AND parent_id IS ?", (before_id, parent_id)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Le nœud {before_id} n'est pas un enfant de {parent_id}")
+    after = row[0]
+    sql = """
+        SELECT rank FROM nodes WHERE parent_id {} AND rank < ? AND id != ?
+        ORDER BY rank DESC LIMIT 1
+    """
+    if parent_id is None:
+        previous = conn.execute(sql.format("IS NULL"), (after, node_id)).fetchone()
+    else:
+        previous = conn.execute(sql.format("= ?"), (parent_id, after, node_id)).fetchone()
+    return ranks.key_between(previous[0] if previous else None, after)
+
+def _rebalance_children(conn, parent_id):
+    """Renumérote les enfants de parent_id avec des clés courtes, sans
+    changer leur ordre, quand une clé devient trop longue (move_node,
+    create_node) ; retourne la dernière clé (None s'il n'y a pas d'enfant)."""
+    sql = "SELECT id FROM nodes WHERE parent_id {} ORDER BY rank, id"
+    if parent_id is None:
+        rows = conn.execute(sql.format("IS NULL")).fetchall()
+    else:
+        rows = conn.execute(sql.format("= ?"), (parent_id,)).fetchall()
+    keys = ranks.sequence(len(rows))
+    conn.executemany(
+        "UPDATE nodes SET rank = ? WHERE id = ?",
+        [(key, row[0]) for key, row in zip(keys, rows)],
+    )
+    if keys and get_manager().last_ranks is not None:
+        get_manager().last_ranks[parent_id] = keys[-1]
+    return keys[-1] if keys else None
+
+def storage_report():
+    """Place occupée par le texte des notes, avant et après déduplication
+    et compression (en octets)."""
+    nodes, logical = _fetchone("""
+        SELECT COUNT(*), COALESCE(SUM(b.size), 0)
+        FROM nodes n JOIN blobs b ON b.hash = n.content_hash
+    """)
+    count, unique, stored = _fetchone(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length(data)), 0) FROM blobs"
+    )
+    return {
+        "nodes": nodes,
+        "blobs": count,
+        "logical_bytes": logical,
+        "unique_bytes": unique,
+        "stored_bytes": stored,
+        "saved_bytes": logical - stored,
+        "saved_ratio": (logical - stored) / logical if logical else 0.0,
+    }
+
+def vacuum():
+    """Réécrit le fichier de la base pour rendre au système la place libre,
+    en la faisant passer en auto_vacuum=INCREMENTAL.
+
+    La pragma n'est exécutée que sur la connexion d'écriture : elle
+    demande le verrou d'écriture, une connexion de lecture ouverte pendant
+    une transaction resterait bloquée.
+    """
+    manager = get_manager()
+    manager.execute_outside_transaction("PRAGMA auto_vacuum=INCREMENTAL")
+    manager.execute_outside_transaction("VACUUM")
+    # En mode WAL, le fichier principal ne rétrécit qu'au checkpoint
+    manager.execute_outside_transaction("PRAGMA wal_checkpoint(TRUNCATE)")
+
+# -- Maintenance (voir maintenance.py) --
+
+# Lignes lues par ANALYZE dans chaque index : des statistiques approchées
+# suffisent à l'optimiseur et le coût reste borné
+ANALYSIS_LIMIT = 400
+
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+def page_stats():
+    """Pages du fichier de la base : taille, nombre, pages libres, mode
+    auto_vacuum et taille du fichier (hors journal WAL, en octets)."""
+    conn = get_manager().reader()
+    stats = {
+        name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+        for name in ("page_size", "page_count", "freelist_count", "auto_vacuum")
+    }
+    stats["auto_vacuum"] = _AUTO_VACUUM_MODES.get(stats["auto_vacuum"], stats["auto_vacuum"])
+    stats["file_bytes"] = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+    return stats
+
+def incremental_vacuum(pages):
+    """Rend au système jusqu'à `pages` pages libres (bases en
+    auto_vacuum=INCREMENTAL) ; retourne le nombre de pages libérées."""
+    with get_manager().writer() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not before:
+            return 0
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        # sqlite3 n'exécute qu'une étape de la pragma, et chaque étape
+        # libère une page
+        for _ in range(min(pages, before)):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+def merge_search_index(pages):
+    """Une étape de fusion des segments de l'index plein texte (FTS5
+    'merge'), d'au plus `pages` pages ; un nombre négatif fusionne aussi
+    les niveaux peu remplis, jusqu'à un seul segment. Retourne faux quand
+    il n'y a plus rien à fusionner."""
+    with get_manager().writer() as conn:
+        before = conn.total_changes
+        conn.execute("INSERT INTO nodes_fts(nodes_fts, rank) VALUES ('merge', ?)", (pages,))
+        return conn.total_changes - before > 1
+
+def checkpoint():
+    """Recopie le journal WAL dans la base sans attendre les lecteurs ; le
+    fichier rétrécit des pages rendues par incremental_vacuum()."""
+    get_manager().execute_outside_transaction("PRAGMA wal_checkpoint(PASSIVE)")
+
+def list_tables():
+    """Tables ordinaires de la base (ni virtuelles ni internes à SQLite)."""
+    return [row[0] for row in _fetchall("""
+        SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+          AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'
+        ORDER BY name
+    """)]
+
+def has_statistics():
+    """Vrai si ANALYZE a déjà été exécuté sur cette base."""
+    return _fetchone("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'") is not None
+
+def analyze(table=None):
+    """Statistiques de l'optimiseur (ANALYZE échantillonné) pour une table,
+    ou pour toute la base."""
+    with get_manager().writer() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute(f'ANALYZE "{table}"' if table else "ANALYZE")
+
+def optimize():
+    """PRAGMA optimize : ne réanalyse que les tables dont les statistiques
+    sont périmées."""
+    with get_manager().writer() as conn:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+
+def integrity_check(table=None):
+    """Problèmes trouvés par PRAGMA quick_check, pour une table et ses
+    index ou pour toute la base ; liste vide si tout va bien.
+
+    Avant SQLite 3.33, quick_check ne sait vérifier que toute la base.
+    """
+    if table is not None and sqlite3.sqlite_version_info < (3, 33, 0):
+        table = None
+    sql = f'PRAGMA quick_check("{table}")' if table else "PRAGMA quick_check"
+    return [row[0] for row in _fetchall(sql) if row[0] != "ok"]
+
+# Orphelins : par table, requête qui parcourt une page de clés (après ?, au
+# plus ?) en disant si chacune est orpheline, et requête qui répare une clé.
+# Les nœuds orphelins (parent disparu) sont invisibles dans l'arbre ; les
+# autres lignes dépendent d'un nœud (ou, pour les blobs, d'une note) disparu
+ORPHAN_TABLES = ("nodes", "node_paths", "revisions", "links", "blobs")
+
+_ORPHAN_SCANS = {
+    "nodes": """
+        SELECT id, parent_id IS NOT NULL
+                   AND NOT EXISTS (SELECT 1 FROM nodes p WHERE p.id = n.parent_id)
+        FROM nodes n WHERE id > ? ORDER BY id LIMIT ?
+    """,
+    "node_paths": """
+        SELECT descendant, NOT EXISTS (SELECT 1 FROM nodes WHERE id = p.descendant)
+        FROM (SELECT DISTINCT descendant FROM node_paths
+              WHERE descendant > ? ORDER BY descendant LIMIT ?) p
+    """,
+    "revisions": """
+        SELECT node_id, NOT EXISTS (SELECT 1 FROM nodes WHERE id = r.node_id)
+        FROM (SELECT DISTINCT node_id FROM revisions
+              WHERE node_id > ? ORDER BY node_id LIMIT ?) r
+    """,
+    "links": """
+        SELECT source_id, NOT EXISTS (SELECT 1 FROM nodes WHERE id = l.source_id)
+        FROM (SELECT DISTINCT source_id FROM links
+              WHERE source_id > ? ORDER BY source_id LIMIT ?) l
+    """,
+    "blobs": """
+        SELECT hash, NOT EXISTS (SELECT 1 FROM nodes WHERE content_hash = b.hash)
+                 AND NOT EXISTS (SELECT 1 FROM fts_queue WHERE old_hash = b.hash)
+        FROM blobs b WHERE hash > ? ORDER BY hash LIMIT ?
+    """,
+}
+
+_ORPHAN_DELETES = {
+    "node_paths": """
+        DELETE FROM node_paths WHERE descendant = :key
+          AND NOT EXISTS (SELECT 1 FROM nodes WHERE id = :key)
+    """,
+    "revisions": """
+        DELETE FROM revisions WHERE node_id = :key
+          AND NOT EXISTS (SELECT 1 FROM nodes WHERE id = :key)
+    """,
+    "links": """
+        DELETE FROM links WHERE source_id = :key
+          AND NOT EXISTS (SELECT 1 FROM nodes WHERE id = :key)
+    """,
+    "blobs": """
+        DELETE FROM blobs WHERE hash = :key
+          AND NOT EXISTS (SELECT 1 FROM nodes WHERE content_hash = :key)
+          -- Ancien texte d'une écriture pas encore indexée : _sync_fts en a
+          -- besoin pour le retirer de l'index
+          AND NOT EXISTS (SELECT 1 FROM fts_queue WHERE old_hash = :key)
+    """,
+}
+
+def find_orphans(table, after=None, limit=500):
+    """Cherche les orphelins d'une table parmi les `limit` clés qui suivent
+    `after` (None : depuis le début).
+
+    Retourne (clés orphelines, dernière clé examinée) ; la dernière clé
+    vaut None quand la table a été parcourue jusqu'au bout.
+    """
+    if after is None:
+        after = "" if table == "blobs" else 0
+    rows = _fetchall(_ORPHAN_SCANS[table], (after, limit))
+    last = rows[-1][0] if len(rows) == limit else None
+    return [key for key, orphan in rows if orphan], last
+
+def repair_orphans(table, keys):
+    """Répare des orphelins trouvés par find_orphans(), s'ils le sont encore.
+
+    Les nœuds sont rattachés à la racine, avec leur sous-arbre ; les autres
+    lignes sont supprimées. Retourne les clés réparées (nœuds) ou le
+    nombre de lignes supprimées.
+    """
+    with get_manager().writer() as conn:
+        if table != "nodes":
+            cursor = conn.executemany(_ORPHAN_DELETES[table], [{"key": key} for key in keys])
+            return cursor.rowcount
+        repaired = []
+        for node_id in keys:
+            orphan = conn.execute("""
+                SELECT 1 FROM nodes n
+                WHERE n.id = ? AND n.parent_id IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM nodes p WHERE p.id = n.parent_id)
+            """, (node_id,)).fetchone()
+            if orphan:
+                move_node(node_id, None)
+                repaired.append(node_id)
+        return repaired
 
 def get_setting(key, default=None):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-    row = cursor.fetchone()
-    conn.close()
+    row = _fetchone("SELECT value FROM settings WHERE key = ?", (key,))
     return row[0] if row else default
 
 def set_setting(key, value):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT OR REPLACE INTO settings (key, value)
-        VALUES (?, ?)
-    """, (key, value))
-    conn.commit()
-    conn.close() 
\ No newline at end of file
+    with get_manager().writer() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO settings (key, value)
+            VALUES (?, ?)
+        """, (key, value))
@@ -0,0 +1,88 @@
+import time
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QListWidget, QListWidgetItem, QPlainTextEdit,
+    QPushButton, QSplitter
+)
+from PyQt5.QtCore import Qt, pyqtSignal
+
+import database
+
+
+class HistoryPanel(QWidget):
+    """Liste des révisions de la note courante, avec aperçu et restauration.
+
+    La liste n'est relue que lorsque le panneau est visible.
+    """
+
+    # Texte de la révision à remettre dans l'éditeur
+    restoreRequested = pyqtSignal(str)
+
+    def __init__(self, translator, parent=None):
+        super().__init__(parent)
+        self.translator = translator
+        self.node_id = None
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        splitter = QSplitter(Qt.Vertical)
+
+        self.revision_list = QListWidget()
+        self.revision_list.currentItemChanged.connect(self.on_revision_selected)
+        splitter.addWidget(self.revision_list)
+
+        self.viewer = QPlainTextEdit()
+        self.viewer.setReadOnly(True)
+        splitter.addWidget(self.viewer)
+        layout.addWidget(splitter)
+
+        self.btn_restore = QPushButton(self.translator.get_text('restore'))
+        self.btn_restore.setEnabled(False)
+        self.btn_restore.clicked.connect(self.restore)
+        layout.addWidget(self.btn_restore)
+
+    def set_node(self, node_id):
+        self.node_id = node_id
+        self.refresh()
+
+    def refresh(self):
+        """Relit la liste des révisions en gardant la sélection."""
+        if not self.isVisible():
+            return
+        current = self.revision_list.currentItem()
+        selected = current.data(Qt.UserRole) if current is not None else None
+
+        self.revision_list.blockSignals(True)
+        self.revision_list.clear()
+        if self.node_id is not None:
+            for revision_id, created_at, size, snapshot in database.list_revisions(self.node_id):
+                label = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created_at))}  ({size} B)"
+                if snapshot:
+                    label += f"  · {self.translator.get_text('snapshot')}"
+                item = QListWidgetItem(label)
+                item.setData(Qt.UserRole, revision_id)
+                self.revision_list.addItem(item)
+                if revision_id == selected:
+                    self.revision_list.setCurrentItem(item)
+        self.revision_list.blockSignals(False)
+        self.on_revision_selected(self.revision_list.currentItem())
+
+    def on_revision_selected(self, item, previous=None):
+        if item is None:
+            self.viewer.clear()
+            self.btn_restore.setEnabled(False)
+            return
+        self.viewer.setPlainText(database.get_revision(item.data(Qt.UserRole)) or "")
+        self.btn_restore.setEnabled(True)
+
+    def restore(self):
+        if self.revision_list.currentItem() is not None:
+            self.restoreRequested.emit(self.viewer.toPlainText())
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def update_texts(self):
+        self.btn_restore.setText(self.translator.get_text('restore'))
+        self.refresh()
@@ -0,0 +1,369 @@
+"""Mesures de performance à la demande : requêtes SQL, fonctions de la base
+et gestionnaires de l'interface.
+
+Désactivée par défaut, elle ne coûte alors rien : les connexions sont des
+sqlite3.Connection ordinaires et les fonctions de `database` ne sont pas
+enveloppées. enable() (python main.py --instrument) doit être appelé avant
+l'ouverture des connexions :
+
+- chaque requête SQL est chronométrée, lecture des lignes comprise, avec
+  le nombre de lignes retournées (connexions ouvertes par
+  connection_factory()) ;
+- chaque fonction publique de `database` est chronométrée ;
+- les méthodes décorées par @timed (gestionnaires de MainWindow) aussi.
+
+Les mesures sont agrégées par nom (nombre d'appels, temps total et
+maximal, histogramme des durées) et les derniers événements sont gardés
+pour un export au format Chrome trace (chrome://tracing, Perfetto).
+"""
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Bornes supérieures (ms) des classes de l'histogramme ; la dernière classe
+# reçoit tout ce qui dépasse
+HISTOGRAM_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Événements gardés pour l'export Chrome trace (les plus anciens sont oubliés)
+MAX_EVENTS = 50000
+
+# Fonctions de `database` qui ne sont pas des accès à la base
+_NOT_TIMED = ("get_manager", "get_connection")
+
+_recorder = None
+_originals = {}
+
+class Stat:
+    """Mesures agrégées d'une requête ou d'une fonction."""
+
+    __slots__ = ("count", "total", "max", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, duration, rows=None):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        if rows is not None:
+            self.rows += rows
+        ms = duration * 1000
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        """Borne supérieure (ms) de la classe qui contient ce centile."""
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else self.max * 1000
+        return 0.0
+
+class Recorder:
+    """Collecte les mesures ; utilisable depuis n'importe quel thread."""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.stats = {}
+        self.counters = {}
+        self.events = deque(maxlen=max_events)
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def record(self, category, name, start, duration, rows=None):
+        thread = threading.current_thread()
+        with self._lock:
+            stat = self.stats.get((category, name))
+            if stat is None:
+                stat = self.stats[(category, name)] = Stat()
+            stat.add(duration, rows)
+            self._threads[thread.ident] = thread.name
+            self.events.append((category, name, thread.ident, start, duration, rows))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            # Les connexions encore ouvertes comptent comme ouvertes après
+            # la remise à zéro, pour que ouvertes - fermées reste juste
+            still_open = (self.counters.get("connections_opened", 0)
+                          - self.counters.get("connections_closed", 0))
+            self.counters.clear()
+            if still_open:
+                self.counters["connections_opened"] = still_open
+            self.events.clear()
+            self._threads.clear()
+            self.started = time.perf_counter()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Une ligne par mesure (dicts), les plus coûteuses d'abord."""
+        with self._lock:
+            rows = [
+                {
+                    "category": category,
+                    "name": name,
+                    "count": stat.count,
+                    "total_ms": stat.total * 1000,
+                    "mean_ms": stat.total * 1000 / stat.count,
+                    "max_ms": stat.max * 1000,
+                    "p50_ms": stat.percentile(0.5),
+                    "p95_ms": stat.percentile(0.95),
+                    "rows": stat.rows,
+                    "histogram": list(stat.buckets),
+                }
+                for (category, name), stat in self.stats.items()
+            ]
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return rows
+
+    def to_dict(self, extra=None):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "started_at": self.started_at,
+            "duration_s": time.perf_counter() - self.started,
+            "histogram_bounds_ms": list(HISTOGRAM_BOUNDS_MS),
+            "counters": counters,
+            "stats": self.snapshot(),
+            **(extra or {}),
+        }
+
+    def chrome_trace(self):
+        """Événements au format Chrome trace (« Trace Event Format »)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        trace = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        for category, name, tid, start, duration, rows in events:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self.started) * 1e6,
+                "dur": duration * 1e6,
+            }
+            if rows is not None:
+                event["args"] = {"rows": rows}
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+def recorder():
+    """Le Recorder actif, ou None si l'instrumentation est désactivée."""
+    return _recorder
+
+def is_enabled():
+    return _recorder is not None
+
+def enable():
+    """Active les mesures ; retourne le Recorder.
+
+    Les fonctions publiques de `database` sont remplacées par des versions
+    chronométrées ; seules les connexions ouvertes après cet appel
+    mesurent leurs requêtes.
+    """
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder()
+        import database
+        _instrument_module(database, "db", _NOT_TIMED)
+    return _recorder
+
+def disable():
+    """Désactive les mesures et rend à `database` ses fonctions d'origine."""
+    global _recorder
+    _recorder = None
+    for (module, name), func in _originals.items():
+        setattr(module, name, func)
+    _originals.clear()
+
+def _instrument_module(module, category, exclude=()):
+    for name, func in list(vars(module).items()):
+        if (name.startswith("_") or name in exclude or not inspect.isfunction(func)
+                or func.__module__ != module.__name__):
+            continue
+        # Générateurs et gestionnaires de contexte : leur durée n'est pas
+        # celle de l'appel ; leurs requêtes restent mesurées
+        if inspect.isgeneratorfunction(inspect.unwrap(func)):
+            continue
+        _originals[(module, name)] = func
+        setattr(module, name, _timed_function(func, category, name))
+
+def _timed_function(func, category, name):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = _recorder
+        if recorder is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            rows = len(result) if isinstance(result, list) else None
+            recorder.record(category, name, start, time.perf_counter() - start, rows)
+    return wrapper
+
+def timed(category, name=None):
+    """Décorateur : chronomètre la fonction quand l'instrumentation est active.
+
+    Désactivée, le surcoût se limite à un appel et un test par invocation.
+    """
+    def decorate(func):
+        return _timed_function(func, category, name or func.__qualname__)
+    return decorate
+
+# -- Requêtes SQL --
+
+_normalized = {}
+
+def _query_name(sql):
+    """Requête sur une ligne, pour regrouper les mesures."""
+    name = _normalized.get(sql)
+    if name is None:
+        name = _normalized[sql] = " ".join(sql.split())
+    return name
+
+class TracedCursor(sqlite3.Cursor):
+    """Curseur qui chronomètre ses requêtes, lecture des lignes comprise.
+
+    La mesure est enregistrée quand le curseur a fini : toutes les lignes
+    lues, requête suivante, fermeture ou destruction du curseur.
+    """
+
+    _query = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._query = [sql, start, time.perf_counter() - start, 0]
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._query = [sql, start, time.perf_counter() - start, 0]
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _fetched(self, start, rows, done):
+        query = self._query
+        if query is not None:
+            query[2] += time.perf_counter() - start
+            query[3] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        query = self._query
+        if query is None:
+            return
+        self._query = None
+        recorder = _recorder
+        if recorder is not None:
+            sql, start, duration, rows = query
+            recorder.record("sql", _query_name(sql), start, duration, rows)
+
+class TracedConnection(sqlite3.Connection):
+    """Connexion dont les requêtes passent par TracedCursor."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        recorder = _recorder
+        if recorder is not None:
+            recorder.count("connections_opened")
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        recorder = _recorder
+        if recorder is not None:
+            recorder.count("connections_closed")
+        super().close()
+
+def connection_factory():
+    """Classe à passer à sqlite3.connect(factory=...)."""
+    return TracedConnection if _recorder is not None else sqlite3.Connection
+
+# -- Export --
+
+def export_json(path, extra=None):
+    """Écrit les mesures agrégées (et `extra`) dans un fichier JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_recorder.to_dict(extra), f, indent=2)
+
+def export_chrome_trace(path):
+    """Écrit les derniers événements au format Chrome trace."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_recorder.chrome_trace(), f)
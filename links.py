@@ -0,0 +1,54 @@
+"""Liens entre notes : [[Titre de la note]] ou [[#id]].
+
+Un lien par titre désigne la note de ce titre, sans tenir compte de la
+casse ASCII (comme COLLATE NOCASE dans SQLite) ; un lien par id désigne
+une note précise, même renommée. Les liens écrits dans du code (blocs
+délimités par ``` ou ~~~, `code` en ligne) ne comptent pas.
+
+database range les liens de chaque note dans la table `links`, sous forme
+de clés : "#42" pour [[#42]], le titre en minuscules sinon.
+"""
+import re
+
+LINK_RE = re.compile(r"\[\[([^\[\]\n]+)\]\]")
+
+# Blocs de code délimités et code en ligne, retirés avant la recherche
+_FENCED_CODE_RE = re.compile(r"^[ \t]*(```|~~~).*?(?:^[ \t]*\1[ \t]*$|\Z)", re.MULTILINE | re.DOTALL)
+_INLINE_CODE_RE = re.compile(r"(`+)[^`].*?\1", re.DOTALL)
+
+_ID_RE = re.compile(r"#(\d+)")
+
+# Minuscules ASCII seulement, comme COLLATE NOCASE
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+# Schéma des URL de l'aperçu : note:<cible>
+SCHEME = "note"
+
+def link_key(target):
+    """Clé d'une cible de lien ; None si elle est vide."""
+    target = target.strip()
+    if not target:
+        return None
+    match = _ID_RE.fullmatch(target)
+    if match is not None:
+        return f"#{int(match.group(1))}"
+    return target.translate(_ASCII_LOWER)
+
+def title_key(title):
+    """Clé sous laquelle les liens par titre désignent une note."""
+    return (title or "").strip().translate(_ASCII_LOWER)
+
+def node_id_of(key):
+    """Id désigné par une clé "#42", None pour un lien par titre."""
+    match = _ID_RE.fullmatch(key)
+    return int(match.group(1)) if match is not None else None
+
+def link_keys(text):
+    """Ensemble des clés des liens d'un texte."""
+    if not text or "[[" not in text:
+        return set()
+    if "`" in text or "~~~" in text:
+        text = _INLINE_CODE_RE.sub("", _FENCED_CODE_RE.sub("", text))
+    keys = {link_key(match.group(1)) for match in LINK_RE.finditer(text)}
+    keys.discard(None)
+    return keys
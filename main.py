@@ -1,17 +1,75 @@
+import argparse
 import sys
-from PyQt5.QtWidgets import QApplication
-import database
-from ui_main import MainWindow
+import time
+
+# Début du chronométrage : avant les imports lourds (PyQt, interface)
+_START = time.perf_counter()
+
+class StartupProfile:
+    """Durée de chaque phase du démarrage, affichée avec --profile-startup."""
+    
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+        self._last = _START
+    
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last, now - _START))
+        self._last = now
+    
+    def report(self):
+        if not self.enabled:
+            return
+        print(f"{'phase':<18}{'ms':>9}{'total ms':>11}", file=sys.stderr)
+        for phase, duration, total in self.phases:
+            print(f"{phase:<18}{duration * 1000:>9.1f}{total * 1000:>11.1f}", file=sys.stderr)
 
 def main():
-    # Initialiser la base de données
-    database.init_db()
+    parser = argparse.ArgumentParser(description="NoteNodes")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="afficher la durée de chaque phase du démarrage")
+    parser.add_argument("--instrument", action="store_true",
+                        help="mesurer requêtes et gestionnaires (panneau Affichage → Performances)")
+    args, qt_args = parser.parse_known_args()
+    profile = StartupProfile(args.profile_startup)
+    
+    if args.instrument:
+        # Avant l'ouverture du carnet : ses connexions seront chronométrées
+        import instrumentation
+        instrumentation.enable()
+    
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    import notebooks
+    profile.mark("imports")
+    
+    # Ouvrir (et migrer au besoin) le dernier carnet utilisé
+    notebooks.open_last()
+    profile.mark("open notebook")
     
     # Lancer l'application Qt
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    profile.mark("QApplication")
+    
+    from ui_main import MainWindow
+    profile.mark("import ui")
+    
     window = MainWindow()
+    profile.mark("MainWindow")
+    # Premier tour de boucle : la fenêtre est affichée, puis l'arbre se
+    # charge par tranches (voir MainWindow.showEvent)
+    QTimer.singleShot(0, lambda: profile.mark("event loop"))
     window.show()
+    profile.mark("show")
+    
+    def tree_loaded():
+        window.treeLoaded.disconnect(tree_loaded)
+        profile.mark("tree loaded")
+        profile.report()
+    
+    window.treeLoaded.connect(tree_loaded)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
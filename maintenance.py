@@ -0,0 +1,335 @@
+"""Maintenance de la base en arrière-plan : place libre, statistiques de
+l'optimiseur, lignes orphelines et intégrité.
+
+Chaque tâche est un générateur qui fait une petite unité de travail par pas
+(quelques centaines de pages, un lot de clés, une table). Le
+MaintenanceScheduler fait avancer ces pas dans un thread de fond, par
+tranches de quelques dizaines de millisecondes et seulement quand
+l'utilisateur ne fait rien ; le verrou d'écriture est rendu entre deux pas,
+une écriture de l'interface n'attend donc jamais plus d'un pas.
+
+- index plein texte : les segments FTS5 sont fusionnés par étapes, ceux
+  qu'ils remplacent deviennent des pages libres ;
+- place libre : PRAGMA incremental_vacuum rend au système les pages
+  libérées par les suppressions. C'est le mode des bases neuves (voir
+  database.init_db) ; une base plus ancienne n'y passe qu'avec un VACUUM
+  complet, fait ici d'office si elle est petite, sinon par
+  python maintenance.py --vacuum ;
+- statistiques : ANALYZE échantillonné table par table la première fois,
+  PRAGMA optimize ensuite ;
+- orphelins : nœuds dont le parent n'existe plus, invisibles dans l'arbre,
+  rattachés à la racine ; chemins, révisions, liens et blobs d'une note
+  disparue, supprimés ;
+- intégrité : PRAGMA quick_check, table par table ;
+- index plein texte : les écritures d'autres clients SQLite y sont reportées.
+
+python maintenance.py exécute une passe complète sur la base et affiche le
+rapport.
+"""
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+import database
+
+# Inactivité de l'utilisateur (s) avant de commencer ou reprendre une passe
+IDLE_SECONDS = 30
+# Intervalle minimal entre deux passes complètes sur un même carnet (s)
+INTERVAL_SECONDS = 6 * 3600
+# Temps de travail par tranche, puis pause avant la tranche suivante (s)
+SLICE_SECONDS = 0.05
+PAUSE_SECONDS = 0.2
+# Fréquence à laquelle le thread vérifie s'il y a une passe à faire (s)
+POLL_SECONDS = 5
+
+# Pages de segments FTS5 fusionnées par pas
+FTS_MERGE_PAGES = 32
+# Pages rendues par pas d'incremental_vacuum
+VACUUM_PAGES = 256
+# Clés examinées par pas de recherche d'orphelins
+ORPHAN_BATCH = 500
+# Une base pas encore en auto_vacuum=INCREMENTAL y passe par un VACUUM
+# complet pendant la maintenance si elle ne dépasse pas cette taille
+AUTO_CONVERT_BYTES = 8 * 1024 * 1024
+# Problèmes d'intégrité gardés dans le rapport
+MAX_INTEGRITY_ERRORS = 20
+
+# Réglage du carnet : date (time.time()) de la dernière passe complète
+LAST_RUN_SETTING = "maintenance_last_run"
+
+def new_report():
+    """Rapport vide d'une passe, complété par les tâches."""
+    return {
+        "started_at": time.time(),
+        "duration_s": 0.0,
+        "before": database.page_stats(),
+        "after": None,
+        "search_index_merges": 0,
+        "converted": False,
+        "freed_pages": 0,
+        "reclaimed_bytes": 0,
+        "analyzed": [],
+        "optimized": False,
+        "orphan_nodes": [],
+        "orphan_rows": {},
+        "checked_tables": [],
+        "integrity_errors": [],
+    }
+
+def sync_search_index(report):
+    """Index plein texte des écritures d'autres clients, avant que leurs
+    blobs remplacés ne soient pris pour des orphelins."""
+    database.sync_search_index()
+    yield
+
+def merge_search_index(report):
+    """Fusionne les segments de l'index plein texte, un peu à chaque pas :
+    chaque écriture en ajoute un, que SQLite ne fusionne que par paliers."""
+    pages = -FTS_MERGE_PAGES
+    while database.merge_search_index(pages):
+        report["search_index_merges"] += 1
+        # Le premier pas lance la fusion de tous les segments, les
+        # suivants la poursuivent
+        pages = FTS_MERGE_PAGES
+        yield
+
+def repair_orphans(report):
+    """Orphelins de chaque table, par lots de clés."""
+    for table in database.ORPHAN_TABLES:
+        after = None
+        while True:
+            keys, after = database.find_orphans(table, after, ORPHAN_BATCH)
+            if keys:
+                repaired = database.repair_orphans(table, keys)
+                if table == "nodes":
+                    report["orphan_nodes"].extend(repaired)
+                elif repaired:
+                    rows = report["orphan_rows"]
+                    rows[table] = rows.get(table, 0) + repaired
+            yield
+            if after is None:
+                break
+
+def reclaim_space(report):
+    """Rend au système les pages libres, quelques centaines à la fois."""
+    stats = database.page_stats()
+    if stats["auto_vacuum"] != "incremental":
+        # Passage en auto_vacuum=INCREMENTAL, même sans page libre : le
+        # VACUUM complet bloque les écritures le temps de réécrire la base,
+        # seulement pour une petite base
+        if stats["file_bytes"] <= AUTO_CONVERT_BYTES:
+            database.vacuum()
+            report["converted"] = True
+            yield
+        return
+    if not stats["freelist_count"]:
+        return
+    while True:
+        freed = database.incremental_vacuum(VACUUM_PAGES)
+        report["freed_pages"] += freed
+        yield
+        if freed < VACUUM_PAGES:
+            break
+    # Le fichier ne rétrécit qu'au checkpoint
+    database.checkpoint()
+    yield
+
+def update_statistics(report):
+    """Statistiques de l'optimiseur : toutes les tables la première fois,
+    puis seulement celles qui ont beaucoup changé."""
+    if database.has_statistics():
+        database.optimize()
+        report["optimized"] = True
+        yield
+        return
+    for table in database.list_tables():
+        database.analyze(table)
+        report["analyzed"].append(table)
+        yield
+
+def check_integrity(report):
+    """PRAGMA quick_check, une table (et ses index) par pas."""
+    for table in database.list_tables():
+        errors = database.integrity_check(table)
+        report["checked_tables"].append(table)
+        room = MAX_INTEGRITY_ERRORS - len(report["integrity_errors"])
+        report["integrity_errors"].extend(f"{table}: {error}" for error in errors[:room])
+        yield
+
+# Dans l'ordre : les segments fusionnés et les orphelins supprimés libèrent
+# des pages avant le vacuum
+TASKS = (sync_search_index, merge_search_index, repair_orphans, reclaim_space,
+         update_statistics, check_integrity)
+
+def steps(report):
+    """Tous les pas d'une passe, tâche après tâche."""
+    for task in TASKS:
+        yield from task(report)
+
+def finish_report(report):
+    """Complète le rapport à la fin de la passe : taille regagnée, durée."""
+    before = report["before"]
+    after = report["after"] = database.page_stats()
+    report["reclaimed_bytes"] = max(0, before["page_count"] - after["page_count"]) * after["page_size"]
+    report["duration_s"] = time.time() - report["started_at"]
+    return report
+
+def run():
+    """Passe complète dans le thread appelant, sans tranches ; retourne le rapport."""
+    report = new_report()
+    for _ in steps(report):
+        pass
+    database.set_setting(LAST_RUN_SETTING, str(time.time()))
+    return finish_report(report)
+
+def format_bytes(size):
+    """Taille lisible pour le rapport : 512 B, 3.4 MB…"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+class MaintenanceScheduler:
+    """Passes de maintenance en arrière-plan, pendant l'inactivité.
+
+    L'interface signale l'activité de l'utilisateur par touch() : une passe
+    ne commence, et ne reprend après chaque tranche, qu'après IDLE_SECONDS
+    sans activité. Une passe est abandonnée si le carnet change ; elle a
+    lieu au plus une fois par INTERVAL_SECONDS et par carnet, sauf
+    demande explicite (run_soon).
+
+    Le thread n'accède à la base que sous _db_lock, pris pour chaque
+    tranche : suspend() l'en exclut pendant un changement de carnet.
+    """
+
+    def __init__(self, on_report=None, idle_seconds=IDLE_SECONDS, interval=INTERVAL_SECONDS):
+        # Appelé (depuis le thread de maintenance) avec le rapport de chaque passe terminée
+        self.on_report = on_report
+        self.idle_seconds = idle_seconds
+        self.interval = interval
+        self.slice_seconds = SLICE_SECONDS
+        self.last_report = None
+        self._last_activity = time.monotonic()
+        self._forced = False
+        self._wake = threading.Event()
+        self._db_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def touch(self):
+        """Activité de l'utilisateur : la maintenance attend qu'elle cesse."""
+        self._last_activity = time.monotonic()
+
+    def run_soon(self):
+        """Demande une passe à la prochaine inactivité, même si la dernière est récente."""
+        self._forced = True
+        self._wake.set()
+
+    def stop(self):
+        """Arrête le thread ; une passe en cours s'interrompt après son pas courant."""
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+
+    @contextmanager
+    def suspend(self):
+        """Attend la fin de la tranche en cours et n'en commence aucune
+        autre jusqu'à la sortie du bloc (changement de carnet, voir
+        notebooks.open_notebook) ; la passe en cours est alors abandonnée."""
+        with self._db_lock:
+            yield
+
+    def _idle_for(self):
+        return time.monotonic() - self._last_activity
+
+    def _due(self):
+        last = database.get_setting(LAST_RUN_SETTING)
+        return last is None or time.time() - float(last) >= self.interval
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+            if self._stopped or self._idle_for() < self.idle_seconds:
+                continue
+            try:
+                with self._db_lock:
+                    due = self._forced or self._due()
+                if due:
+                    self._forced = False
+                    self._run_pass()
+            except Exception:
+                traceback.print_exc()
+
+    def _run_pass(self):
+        with self._db_lock:
+            path = database.DB_PATH
+            report = new_report()
+        pending = steps(report)
+        while True:
+            # Reprendre seulement après une nouvelle période d'inactivité
+            while not self._stopped and self._idle_for() < self.idle_seconds:
+                self._wake.wait(self.idle_seconds - self._idle_for())
+                self._wake.clear()
+            with self._db_lock:
+                if self._stopped or database.DB_PATH != path:
+                    return
+                deadline = time.monotonic() + self.slice_seconds
+                finished = True
+                for _ in pending:
+                    if time.monotonic() >= deadline or self._idle_for() < self.idle_seconds:
+                        finished = False
+                        break
+                if finished:
+                    database.set_setting(LAST_RUN_SETTING, str(time.time()))
+                    self.last_report = finish_report(report)
+                    break
+            self._wake.wait(PAUSE_SECONDS)
+        if self.on_report is not None:
+            self.on_report(report)
+
+def main(argv=None):
+    import argparse
+    import os
+
+    import notebooks
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="base à utiliser (par défaut celle de l'application)")
+    parser.add_argument("--notebook", help="carnet à utiliser (par défaut le carnet par défaut)")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="VACUUM complet d'abord, qui fait passer la base en auto_vacuum=INCREMENTAL")
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+    elif args.notebook:
+        database.DB_PATH = notebooks.notebook_path(args.notebook)
+        os.makedirs(os.path.dirname(database.DB_PATH), exist_ok=True)
+    database.init_db()
+    if args.vacuum:
+        database.vacuum()
+
+    report = run()
+    before, after = report["before"], report["after"]
+    rows = ", ".join(f"{table} {count}" for table, count in report["orphan_rows"].items())
+    print(f"database file      : {format_bytes(before['file_bytes'])} -> {format_bytes(after['file_bytes'])}")
+    print(f"reclaimed          : {format_bytes(report['reclaimed_bytes'])} "
+          f"({before['freelist_count']} -> {after['freelist_count']} free pages)")
+    print(f"auto_vacuum        : {after['auto_vacuum']}"
+          + (" (converted)" if report["converted"] else ""))
+    print(f"search index       : {report['search_index_merges']} merge steps")
+    print("statistics         : "
+          + ("PRAGMA optimize" if report["optimized"] else f"ANALYZE {len(report['analyzed'])} tables"))
+    print(f"orphan notes       : {len(report['orphan_nodes'])} moved to the top level")
+    print(f"orphan rows        : {rows or 'none'}")
+    print(f"integrity          : {len(report['checked_tables'])} tables, "
+          + (f"{len(report['integrity_errors'])} problems" if report["integrity_errors"] else "ok"))
+    for error in report["integrity_errors"]:
+        print(f"  {error}")
+    print(f"duration           : {report['duration_s'] * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
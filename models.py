@@ -1,4 +1,9 @@
+import threading
+from collections import OrderedDict
+
 class Node:
+    __slots__ = ("node_id", "parent_id", "title", "content", "collapsed")
+    
     def __init__(self, node_id, parent_id, title, content, collapsed):
         self.node_id = node_id
         self.parent_id = parent_id
@@ -13,4 +18,144 @@ class Node:
         return cls(row[0], row[1], row[2], row[3], row[4])
     
     def __repr__(self):
-        return f"Node(id={self.node_id}, title={self.title})" 
\ No newline at end of file
+        return f"Node(id={self.node_id}, title={self.title})" 
+
+class NodeCache:
+    """Identity map des nœuds lus en base, avec compteurs de succès/échecs.
+    
+    Un même id donne toujours le même objet Node tant qu'il reste en cache.
+    Les métadonnées (parent, titre, état replié) sont gardées pour au plus
+    `max_nodes` nœuds ; le texte, plus lourd, a son propre budget en
+    caractères et est évincé en premier (LRU). Un Node déjà remis à un
+    appelant n'est jamais vidé de son texte : à l'éviction, le cache le
+    remplace par une copie sans texte.
+    
+    Le module database remplit le cache à la lecture et le met à jour à
+    l'écriture. Pour qu'une lecture lente ne réinsère pas une valeur
+    périmée, elle relève `generation` avant sa requête et le passe à put() :
+    toute écriture entre-temps invalide l'insertion.
+    """
+    
+    def __init__(self, max_nodes=100000, max_content_chars=32 * 1024 * 1024):
+        self.max_nodes = max_nodes
+        self.max_content_chars = max_content_chars
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._nodes = OrderedDict()
+        # id -> taille du texte chargé, dans l'ordre LRU
+        self._contents = OrderedDict()
+        self._content_chars = 0
+        self._lock = threading.Lock()
+    
+    def get(self, node_id, with_content=False):
+        """Node en cache (avec son texte si with_content), sinon None."""
+        with self._lock:
+            node = self._nodes.get(node_id)
+            if node is None or (with_content and node_id not in self._contents):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._nodes.move_to_end(node_id)
+            if with_content:
+                self._contents.move_to_end(node_id)
+            return node
+    
+    def put(self, generation, node_id, parent_id, title, collapsed, content=None,
+            with_content=False):
+        """Insère ou complète un nœud lu en base ; retourne le Node en cache.
+        
+        Si une écriture a eu lieu depuis `generation`, rien n'est inséré et
+        un Node détaché est retourné.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return Node(node_id, parent_id, title, content, collapsed)
+            node = self._nodes.get(node_id)
+            if node is None:
+                node = Node(node_id, parent_id, title, None, collapsed)
+                self._nodes[node_id] = node
+                self._evict_nodes()
+            else:
+                node.parent_id = parent_id
+                node.title = title
+                node.collapsed = bool(collapsed)
+                self._nodes.move_to_end(node_id)
+            if with_content:
+                self._set_content(node, content)
+            return node
+    
+    def update(self, node_id, **fields):
+        """Reporte une écriture sur le nœud en cache, s'il y est."""
+        with self._lock:
+            self.generation += 1
+            node = self._nodes.get(node_id)
+            if node is None:
+                return
+            for field, value in fields.items():
+                if field == "content":
+                    self._set_content(node, value)
+                elif field == "collapsed":
+                    node.collapsed = bool(value)
+                else:
+                    setattr(node, field, value)
+    
+    def discard(self, node_ids):
+        with self._lock:
+            self.generation += 1
+            for node_id in node_ids:
+                self._forget_content(node_id)
+                self._nodes.pop(node_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._nodes.clear()
+            self._contents.clear()
+            self._content_chars = 0
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "nodes": len(self._nodes),
+                "contents": len(self._contents),
+                "content_chars": self._content_chars,
+            }
+    
+    # -- Appelées sous le verrou --
+    
+    def _set_content(self, node, content):
+        self._forget_content(node.node_id)
+        node.content = content
+        size = len(content) if content else 0
+        self._contents[node.node_id] = size
+        self._content_chars += size
+        while self._content_chars > self.max_content_chars and len(self._contents) > 1:
+            self._drop_content(next(iter(self._contents)))
+    
+    def _forget_content(self, node_id):
+        """Retire le texte du budget ; retourne False s'il n'était pas chargé."""
+        size = self._contents.pop(node_id, None)
+        if size is None:
+            return False
+        self._content_chars -= size
+        return True
+    
+    def _drop_content(self, node_id):
+        """Évince le texte : le Node en cache est remplacé par une copie sans
+        texte, l'objet que d'autres ont pu recevoir garde le sien."""
+        if self._forget_content(node_id):
+            node = self._nodes.get(node_id)
+            if node is not None:
+                self._nodes[node_id] = Node(node.node_id, node.parent_id, node.title,
+                                            None, node.collapsed)
+    
+    def _evict_nodes(self):
+        while len(self._nodes) > self.max_nodes:
+            node_id = next(iter(self._nodes))
+            self._forget_content(node_id)
+            del self._nodes[node_id]
@@ -0,0 +1,166 @@
+"""Carnets : un fichier SQLite par carnet.
+
+Le carnet par défaut est la base historique `data/notes.db` ; les autres
+sont dans `data/notebooks/<nom>.db`. Un carnet n'est ouvert (connexions,
+migrations) qu'au moment où l'on bascule dessus : open_notebook() suspend
+les travaux de fond enregistrés (register_worker), ferme les connexions du
+carnet précédent, puis fait pointer database.DB_PATH sur le nouveau
+fichier.
+
+Chaque carnet garde ses propres réglages (table `settings`) ; seul le nom
+du dernier carnet ouvert est enregistré à part, dans
+`data/notebooks.json`.
+
+search_all() interroge tous les carnets en parallèle, chacun par une
+connexion ouverte pour l'occasion dans un thread du pool.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import database
+
+DEFAULT_NOTEBOOK = "notes"
+NOTEBOOKS_DIR = os.path.join(database.data_dir, "notebooks")
+STATE_PATH = os.path.join(database.data_dir, "notebooks.json")
+
+# Réglages recopiés du carnet courant dans un carnet neuf
+INHERITED_SETTINGS = ("language", "autosave", "write_interval_ms")
+
+# Threads de recherche partagés par tous les appels à search_all()
+MAX_SEARCH_THREADS = 8
+
+_NAME_RE = re.compile(r"^\w[\w .-]{0,63}$")
+
+_current = None
+_pool = None
+_pool_lock = threading.Lock()
+# Travaux de fond qui utilisent la base du carnet courant
+_workers = []
+
+def notebook_path(name):
+    if name == DEFAULT_NOTEBOOK:
+        return os.path.join(database.data_dir, "notes.db")
+    return os.path.join(NOTEBOOKS_DIR, name + ".db")
+
+def list_notebooks():
+    """Noms des carnets : le carnet par défaut, puis les autres par ordre alphabétique."""
+    names = []
+    if os.path.isdir(NOTEBOOKS_DIR):
+        names = [entry.name[:-3] for entry in os.scandir(NOTEBOOKS_DIR)
+                 if entry.name.endswith(".db") and entry.is_file()]
+    return [DEFAULT_NOTEBOOK] + sorted(name for name in names if name != DEFAULT_NOTEBOOK)
+
+def current_notebook():
+    return _current
+
+def register_worker(worker):
+    """Fait suspendre `worker` pendant chaque changement de carnet.
+
+    worker.suspend() est un gestionnaire de contexte qui termine (ou
+    écrit) le travail en cours sur la base courante et n'y accède plus
+    avant la sortie du bloc (voir WriteBehindQueue.suspend et
+    MaintenanceScheduler.suspend).
+    """
+    _workers.append(worker)
+
+def unregister_worker(worker):
+    if worker in _workers:
+        _workers.remove(worker)
+
+def open_notebook(name):
+    """Fait du carnet `name` le carnet courant (créé s'il n'existe pas)."""
+    global _current
+    path = notebook_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with ExitStack() as suspended:
+        for worker in list(_workers):
+            suspended.enter_context(worker.suspend())
+        # Plus aucun thread n'utilise les connexions du carnet qu'on quitte
+        database.close_connections()
+        database.DB_PATH = path
+        database.init_db()
+    _current = name
+    _save_state({"active": name})
+    return path
+
+def open_last():
+    """Rouvre le dernier carnet utilisé (le carnet par défaut à défaut)."""
+    name = _load_state().get("active", DEFAULT_NOTEBOOK)
+    if name not in list_notebooks():
+        name = DEFAULT_NOTEBOOK
+    return open_notebook(name)
+
+def create_notebook(name):
+    """Crée un carnet et l'ouvre ; il hérite des réglages du carnet courant.
+
+    Lève ValueError si le nom n'est pas valide ou déjà pris.
+    """
+    name = name.strip()
+    if not _NAME_RE.match(name) or name.endswith("."):
+        raise ValueError(f"Nom de carnet invalide : {name!r}")
+    if name.lower() in (existing.lower() for existing in list_notebooks()):
+        raise ValueError(f"Le carnet {name!r} existe déjà")
+    inherited = {}
+    if _current is not None:
+        for key in INHERITED_SETTINGS:
+            value = database.get_setting(key)
+            if value is not None:
+                inherited[key] = value
+    open_notebook(name)
+    with database.batch():
+        for key, value in inherited.items():
+            database.set_setting(key, value)
+    return name
+
+def _load_state():
+    try:
+        with open(STATE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(state):
+    tmp_path = STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, STATE_PATH)
+
+def _search_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(MAX_SEARCH_THREADS, thread_name_prefix="notebook-search")
+        return _pool
+
+def _search_notebook(name, path, query, limit, markers):
+    if not os.path.exists(path):
+        return []
+    try:
+        return [(name,) + row for row in database.search_file(path, query, limit, markers)]
+    except sqlite3.Error:
+        # Fichier illisible ou pas encore migré : ignoré, comme un carnet vide
+        return []
+
+def search_all(query, limit=50, markers=("<b>", "</b>")):
+    """Recherche plein texte dans tous les carnets, en parallèle.
+
+    Retourne au plus `limit` tuples (carnet, id, title, snippet), les plus
+    pertinents d'abord (score BM25 de chaque carnet). Si aucun carnet n'a
+    été ouvert (base choisie directement par database.DB_PATH), seule la
+    base courante est interrogée, sous le nom None.
+    """
+    if _current is None:
+        targets = [(None, database.DB_PATH)]
+    else:
+        targets = [(name, notebook_path(name)) for name in list_notebooks()]
+    pool = _search_pool()
+    futures = [pool.submit(_search_notebook, name, path, query, limit, markers)
+               for name, path in targets]
+    hits = [hit for future in futures for hit in future.result()]
+    hits.sort(key=lambda hit: hit[4])
+    return [hit[:4] for hit in hits[:limit]]
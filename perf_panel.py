@@ -0,0 +1,147 @@
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTreeWidget, QTreeWidgetItem,
+    QPushButton, QFileDialog, QMessageBox
+)
+from PyQt5.QtCore import Qt, QTimer
+
+import database
+import instrumentation
+
+
+class NumericItem(QTreeWidgetItem):
+    """Ligne triée sur la valeur des colonnes numériques, pas sur leur texte."""
+
+    def __lt__(self, other):
+        column = self.treeWidget().sortColumn()
+        mine, theirs = self.data(column, Qt.UserRole), other.data(column, Qt.UserRole)
+        if mine is None or theirs is None:
+            return super().__lt__(other)
+        return mine < theirs
+
+
+class PerformancePanel(QWidget):
+    """Mesures de l'instrumentation : requêtes SQL, fonctions de la base et
+    gestionnaires de l'interface, avec export JSON et Chrome trace.
+
+    Le tableau n'est relu que lorsque le panneau est visible.
+    """
+
+    REFRESH_INTERVAL_MS = 1000
+
+    # (clé de traduction, champ du snapshot, format)
+    COLUMNS = (
+        ('perf_category', 'category', None),
+        ('perf_name', 'name', None),
+        ('perf_calls', 'count', '{:d}'),
+        ('perf_total', 'total_ms', '{:.1f}'),
+        ('perf_mean', 'mean_ms', '{:.3f}'),
+        ('perf_p50', 'p50_ms', '≤ {:g}'),
+        ('perf_p95', 'p95_ms', '≤ {:g}'),
+        ('perf_max', 'max_ms', '{:.2f}'),
+        ('perf_rows', 'rows', '{:d}'),
+    )
+
+    def __init__(self, translator, parent=None):
+        super().__init__(parent)
+        self.translator = translator
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.summary = QLabel()
+        self.summary.setWordWrap(True)
+        layout.addWidget(self.summary)
+
+        self.table = QTreeWidget()
+        self.table.setRootIsDecorated(False)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(3, Qt.DescendingOrder)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.btn_reset = QPushButton()
+        self.btn_reset.clicked.connect(self.reset)
+        buttons.addWidget(self.btn_reset)
+        self.btn_export_json = QPushButton()
+        self.btn_export_json.clicked.connect(self.export_json)
+        buttons.addWidget(self.btn_export_json)
+        self.btn_export_trace = QPushButton()
+        self.btn_export_trace.clicked.connect(self.export_trace)
+        buttons.addWidget(self.btn_export_trace)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.update_texts()
+
+    def refresh(self):
+        recorder = instrumentation.recorder()
+        if recorder is None or not self.isVisible():
+            return
+        counters = recorder.to_dict()["counters"]
+        opened = counters.get('connections_opened', 0)
+        cache = database.cache_stats()
+        self.summary.setText(self.translator.get_text('perf_summary').format(
+            opened, opened - counters.get('connections_closed', 0),
+            cache['hit_ratio'], cache['hits'], cache['misses'], cache['nodes'],
+        ))
+
+        bounds = instrumentation.HISTOGRAM_BOUNDS_MS
+        labels = [f"≤ {bound:g} ms" for bound in bounds] + [f"> {bounds[-1]:g} ms"]
+        self.table.setSortingEnabled(False)
+        self.table.clear()
+        for row in recorder.snapshot():
+            item = NumericItem()
+            for column, (_, field, fmt) in enumerate(self.COLUMNS):
+                value = row[field]
+                item.setText(column, value if fmt is None else fmt.format(value))
+                if fmt is not None:
+                    item.setData(column, Qt.UserRole, value)
+                    item.setTextAlignment(column, Qt.AlignRight | Qt.AlignVCenter)
+            # Histogramme complet dans l'info-bulle de la ligne
+            item.setToolTip(1, "\n".join(
+                f"{label}: {count}" for label, count in zip(labels, row['histogram']) if count
+            ))
+            self.table.addTopLevelItem(item)
+        self.table.setSortingEnabled(True)
+
+    def reset(self):
+        recorder = instrumentation.recorder()
+        if recorder is not None:
+            recorder.reset()
+        self.refresh()
+
+    def export_json(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, self.translator.get_text('perf_export_json'), 'performance.json', 'JSON (*.json)')
+        if path:
+            self._export(instrumentation.export_json, path, {'node_cache': database.cache_stats()})
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, self.translator.get_text('perf_export_trace'), 'trace.json', 'Chrome trace (*.json)')
+        if path:
+            self._export(instrumentation.export_chrome_trace, path)
+
+    def _export(self, export, path, *args):
+        try:
+            export(path, *args)
+        except OSError as e:
+            QMessageBox.warning(self, self.translator.get_text('error'), str(e))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.timer.start()
+        self.refresh()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def update_texts(self):
+        self.table.setHeaderLabels([self.translator.get_text(key) for key, _, _ in self.COLUMNS])
+        self.btn_reset.setText(self.translator.get_text('perf_reset'))
+        self.btn_export_json.setText(self.translator.get_text('perf_export_json'))
+        self.btn_export_trace.setText(self.translator.get_text('perf_export_trace'))
+        self.refresh()
@@ -0,0 +1,60 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from utils import IncrementalRenderer, MarkdownRenderer, content_hash, RenderCache
+from workers import LatestOnlyWorker
+
+
+class PreviewRenderer(QObject):
+    """Rend l'aperçu Markdown dans un thread de fond.
+
+    Seule la dernière demande compte (voir LatestOnlyWorker). Les rendus
+    sont gardés dans un cache LRU indexé par l'empreinte du contenu, si bien
+    que revenir sur une note déjà affichée est immédiat ; au sein d'une
+    note, seuls les blocs modifiés sont re-rendus.
+
+    Le moteur de rendu (et avec lui markdown et Pygments) n'est créé qu'à la
+    première demande, dans le thread de rendu : il ne retarde pas
+    l'ouverture de la fenêtre.
+    """
+
+    # (numéro de génération, html)
+    rendered = pyqtSignal(int, str)
+
+    def __init__(self, parent=None, cache_size=128):
+        super().__init__(parent)
+        self.cache = RenderCache(cache_size)
+        # Utilisé uniquement depuis le thread de rendu
+        self._renderer = None
+        self._worker = LatestOnlyWorker(self._render, "preview-renderer", self)
+        self._worker.finished.connect(self._on_finished)
+
+    @property
+    def generation(self):
+        return self._worker.generation
+
+    def request(self, text):
+        """Demande le rendu de `text` ; retourne le numéro de génération."""
+        key = content_hash(text)
+        html = self.cache.get(key)
+        if html is None:
+            return self._worker.submit(key, text)
+        generation = self._worker.cancel()
+        self.rendered.emit(generation, html)
+        return generation
+
+    def cancel(self):
+        """Abandonne la demande en cours (son rendu ne sera pas émis)."""
+        self._worker.cancel()
+
+    def stop(self):
+        self._worker.stop()
+
+    def _on_finished(self, generation, html):
+        self.rendered.emit(generation, html)
+
+    def _render(self, key, text):
+        if self._renderer is None:
+            self._renderer = IncrementalRenderer(renderer=MarkdownRenderer(wiki_links=True))
+        html = self._renderer.render(text)
+        self.cache.put(key, html)
+        return html
@@ -0,0 +1,146 @@
+"""Clés de rang pour l'ordre des nœuds frères.
+
+Une clé est une chaîne comparée octet par octet (ordre par défaut de
+SQLite) ; on peut toujours en calculer une nouvelle entre deux clés
+existantes, si bien que placer un nœud entre deux frères ne modifie que
+sa propre ligne.
+
+Format (repris de l'indexation fractionnaire) : une partie entière de
+longueur variable, puis une partie fractionnaire facultative, en base 62.
+Le premier caractère de la partie entière donne sa longueur : 'a' à 'z'
+pour les entiers positifs (2 à 27 caractères), 'Z' à 'A' pour les
+négatifs. Ajouter un nœud en fin (ou en tête) de liste incrémente (ou
+décrémente) la partie entière : la clé ne grandit qu'en O(log n). Insérer
+entre deux clés voisines allonge la partie fractionnaire ; au-delà de
+MAX_RANK_LENGTH caractères, database renumérote les frères (rebalance).
+"""
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# Première clé attribuée dans une liste vide
+FIRST_RANK = "a0"
+
+# Partie entière la plus petite : réservée, pour pouvoir toujours insérer avant
+_SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+# Au-delà, les frères sont renumérotés
+MAX_RANK_LENGTH = 32
+
+def _integer_length(head):
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Clé de rang invalide (en-tête {head!r})")
+
+def _split(key):
+    """Retourne (partie entière, partie fractionnaire)."""
+    if not key:
+        raise ValueError("Clé de rang vide")
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Clé de rang invalide : {key!r}")
+    integer, fraction = key[:length], key[length:]
+    if key == _SMALLEST_INTEGER or fraction.endswith(DIGITS[0]):
+        raise ValueError(f"Clé de rang invalide : {key!r}")
+    return integer, fraction
+
+def _midpoint(a, b):
+    """Partie fractionnaire strictement entre a et b (b None = sans borne).
+
+    Aucune des deux ne se termine par '0', le résultat non plus.
+    """
+    if b is not None:
+        # Préfixe commun (a complété par des '0')
+        n = 0
+        while (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    # Chiffres consécutifs : on descend d'un rang
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+def _increment(integer):
+    """Entier suivant, ou None s'il n'y en a plus."""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[i]) + 1
+        if digit < len(DIGITS):
+            digits[i] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    # Retenue sur toute la longueur : l'en-tête change
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+def _decrement(integer):
+    """Entier précédent, ou None s'il n'y en a plus."""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[i]) - 1
+        if digit >= 0:
+            digits[i] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+def key_between(before, after):
+    """Clé strictement entre `before` et `after` (None = pas de borne).
+
+    Lève ValueError si before >= after ou si une clé est mal formée.
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Clés de rang dans le désordre : {before!r} >= {after!r}")
+    if before is None:
+        if after is None:
+            return FIRST_RANK
+        integer, fraction = _split(after)
+        if integer == _SMALLEST_INTEGER:
+            # Plus d'entier disponible avant : on reste dans la partie fractionnaire
+            return integer + _midpoint("", fraction)
+        if fraction:
+            return integer
+        return _decrement(integer)
+    integer, fraction = _split(before)
+    if after is None:
+        following = _increment(integer)
+        return integer + _midpoint(fraction, None) if following is None else following
+    after_integer, after_fraction = _split(after)
+    if integer == after_integer:
+        return integer + _midpoint(fraction, after_fraction)
+    following = _increment(integer)
+    if following is not None and following < after:
+        return following
+    return integer + _midpoint(fraction, None)
+
+def sequence(count):
+    """`count` clés croissantes et courtes, pour numéroter une liste entière."""
+    keys = []
+    key = FIRST_RANK
+    for _ in range(count):
+        keys.append(key)
+        key = _increment(key)
+    return keys
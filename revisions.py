@@ -0,0 +1,57 @@
+"""Deltas ligne à ligne pour l'historique des notes.
+
+Une révision est soit un instantané (texte complet), soit un delta par
+rapport à la révision précédente de la même note. Un delta est une liste
+JSON d'opérations appliquées aux lignes du texte de base :
+
+    [0, 12]       copier les lignes 0 à 11 du texte de base
+    "texte\\n"     insérer ce texte
+
+Toutes les MAX_DELTAS révisions, un instantané borne le coût de la
+reconstruction d'une version : un instantané plus au plus MAX_DELTAS
+deltas. Le stockage SQL est dans database.py.
+"""
+import json
+from difflib import SequenceMatcher
+
+# Nombre maximal de deltas entre deux instantanés
+MAX_DELTAS = 16
+
+# Au-delà de cette fraction de la taille du texte, un instantané coûte
+# moins cher qu'un delta
+MAX_DELTA_RATIO = 0.5
+
+def make_delta(base, text):
+    """Delta (chaîne JSON) qui transforme `base` en `text`.
+
+    Retourne None quand le delta ne serait pas plus petit qu'un instantané.
+    """
+    old_lines = base.splitlines(keepends=True)
+    new_lines = text.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j1 < j2:
+            # replace ou insert ; delete n'ajoute rien
+            inserted = "".join(new_lines[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += inserted
+            else:
+                ops.append(inserted)
+    delta = json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+    if len(delta) > MAX_DELTA_RATIO * len(text) + 64:
+        return None
+    return delta
+
+def apply_delta(base, delta):
+    """Applique un delta produit par make_delta() à `base`."""
+    old_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(old_lines[op[0]:op[1]])
+    return "".join(parts)
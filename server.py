@@ -0,0 +1,530 @@
+"""Serveur HTTP/JSON local sur la base de notes, sans interface graphique.
+
+Usage :
+    python server.py [--host 127.0.0.1] [--port 8765] [--readers 4]
+                     [--db FICHIER | --notebook NOM] [--token JETON]
+
+Routes (corps et réponses en JSON, sauf mention contraire) :
+
+    GET    /nodes?parent=ID        enfants directs (racines sans parent)
+    POST   /nodes                  créer {"title", "parent_id", "content", "collapsed"}
+    GET    /nodes/ID               nœud complet, texte compris
+    GET    /nodes/ID/content       texte seul (text/plain)
+    PATCH  /nodes/ID               modifier {"title", "content", "collapsed"}
+    POST   /nodes/ID/append        ajouter {"text"} à la fin du texte
+    POST   /nodes/ID/move          déplacer {"parent_id", "before_id"}
+    DELETE /nodes/ID               supprimer le nœud et son sous-arbre
+    GET    /search?q=...&limit=N   recherche plein texte
+    GET    /tree?root=ID&content=0 sous-arbre en pré-ordre, en flux
+
+Les lectures s'exécutent en parallèle dans un pool de threads dont les
+connexions SQLite sont en lecture seule (PRAGMA query_only) ; les
+écritures passent toutes par un unique thread d'écriture, dans l'ordre
+d'arrivée. Le serveur peut tourner à côté de l'application : chaque
+requête commence par vérifier si un autre processus a modifié la base
+(database.check_external_changes).
+
+GET /nodes/ID et /nodes/ID/content portent un ETag : avec If-None-Match,
+un contenu inchangé répond 304 sans être lu ni décompressé. PATCH
+accepte If-Match (412 si le nœud a changé entre-temps).
+
+/tree envoie un tableau JSON en Transfer-Encoding: chunked, produit au fil
+de database.iter_tree() : la mémoire utilisée ne dépend pas de la taille
+du sous-arbre, et le client lit les premiers nœuds avant que le dernier
+ne soit lu en base. Le sous-arbre est lu dans un seul instantané.
+
+Avec --token (ou la variable NOTENODES_TOKEN), chaque requête doit porter
+l'en-tête « Authorization: Bearer JETON ».
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import database
+import notebooks
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_READERS = 4
+
+# Taille maximale d'un corps de requête
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_HEADERS = 100
+
+# Flux /tree : taille visée des morceaux envoyés, et morceaux d'avance
+# qu'un thread de lecture peut préparer avant d'attendre le client
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_QUEUE_CHUNKS = 8
+
+SEARCH_LIMIT = 50
+
+_REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified",
+    400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 411: "Length Required",
+    412: "Precondition Failed", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or _REASONS.get(status, ""))
+        self.status = status
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Corps JSON invalide")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Un objet JSON est attendu")
+        return data
+
+    def param(self, name, type=str, default=None):
+        values = self.query.get(name)
+        if not values:
+            return default
+        try:
+            return type(values[0])
+        except ValueError:
+            raise HTTPError(400, f"Paramètre invalide : {name}")
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+async def _read_request(reader):
+    """Lit une requête ; None si le client a fermé la connexion."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Ligne de requête invalide")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n"):
+            break
+        if not line or len(headers) >= MAX_HEADERS:
+            raise HTTPError(400, "En-têtes invalides")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411)
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Content-Length invalide")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413)
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return Request(method.upper(), url.path, parse_qs(url.query), headers, body)
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    return any(tag.strip() in ("*", etag) for tag in header.split(","))
+
+def _node_etag(version):
+    return '"' + hashlib.sha1(repr(version).encode("utf-8")).hexdigest() + '"'
+
+def _content_etag(version):
+    return f'"{version[3] or "none"}"'
+
+def _node_json(node):
+    return {
+        "id": node.node_id,
+        "parent_id": node.parent_id,
+        "title": node.title,
+        "collapsed": bool(node.collapsed),
+        "content": node.content,
+    }
+
+def _optional_int(data, name):
+    value = data.get(name)
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+        raise HTTPError(400, f"{name} doit être un entier")
+    return value
+
+def _optional_str(data, name):
+    value = data.get(name)
+    if value is not None and not isinstance(value, str):
+        raise HTTPError(400, f"{name} doit être une chaîne")
+    return value
+
+class NoteServer:
+    """Serveur asyncio ; les accès à la base passent par deux pools de threads."""
+
+    def __init__(self, readers=DEFAULT_READERS, token=None):
+        self.token = token
+        self.read_pool = ThreadPoolExecutor(readers, thread_name_prefix="http-read",
+                                            initializer=self._init_reader)
+        self.write_pool = ThreadPoolExecutor(1, thread_name_prefix="http-write")
+        self.routes = [
+            ("GET", re.compile(r"/nodes"), self.list_children),
+            ("POST", re.compile(r"/nodes"), self.create_node),
+            ("GET", re.compile(r"/nodes/(\d+)"), self.get_node),
+            ("GET", re.compile(r"/nodes/(\d+)/content"), self.get_content),
+            ("PATCH", re.compile(r"/nodes/(\d+)"), self.update_node),
+            ("POST", re.compile(r"/nodes/(\d+)/append"), self.append),
+            ("POST", re.compile(r"/nodes/(\d+)/move"), self.move_node),
+            ("DELETE", re.compile(r"/nodes/(\d+)"), self.delete_node),
+            ("GET", re.compile(r"/search"), self.search),
+            ("GET", re.compile(r"/tree"), self.stream_tree),
+        ]
+
+    @staticmethod
+    def _init_reader():
+        # Les threads de lecture ne peuvent rien modifier, même par erreur
+        database.get_manager().reader().execute("PRAGMA query_only = ON")
+
+    @staticmethod
+    def _call(func, *args):
+        database.check_external_changes()
+        return func(*args)
+
+    def _read(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.read_pool, self._call, func, *args)
+
+    def _write(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.write_pool, self._call, func, *args)
+
+    def close(self):
+        self.read_pool.shutdown(wait=True, cancel_futures=True)
+        self.write_pool.shutdown(wait=True)
+
+    # -- Connexions --
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                await self._dispatch(request, writer)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request, writer):
+        try:
+            if self.token is not None:
+                expected = f"Bearer {self.token}"
+                if not hmac.compare_digest(request.headers.get("authorization", ""), expected):
+                    raise HTTPError(401)
+            handler, args = self._route(request)
+            result = await handler(request, writer, *args)
+            if result is not None:
+                status, payload, headers = result
+                await self._send_json(writer, status, payload, headers, request.keep_alive)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=request.keep_alive)
+        except ConnectionError:
+            raise
+        except ValueError as e:
+            # Refus de la base (cycle, nœud de référence invalide…)
+            await self._send_json(writer, 409, {"error": str(e)}, keep_alive=request.keep_alive)
+        except Exception as e:
+            traceback.print_exc()
+            await self._send_json(writer, 500, {"error": str(e)}, keep_alive=False)
+
+    def _route(self, request):
+        allowed = False
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            if method == request.method:
+                return handler, [int(group) for group in match.groups()]
+            allowed = True
+        raise HTTPError(405 if allowed else 404)
+
+    async def _send(self, writer, status, body=b"", headers=(), keep_alive=True,
+                    content_type="application/json; charset=utf-8"):
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+        if body or status not in (204, 304):
+            lines.append(f"Content-Type: {content_type}")
+            lines.append(f"Content-Length: {len(body)}")
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        if not keep_alive:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status, payload, headers=(), keep_alive=True):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await self._send(writer, status, body, headers, keep_alive)
+
+    # -- Lectures --
+
+    async def list_children(self, request, writer):
+        parent_id = request.param("parent", int)
+        if parent_id is not None and await self._read(database.get_node_version, parent_id) is None:
+            raise HTTPError(404)
+        rows = await self._read(database.get_children, parent_id)
+        return 200, [
+            {"id": node_id, "parent_id": parent, "title": title, "collapsed": bool(collapsed)}
+            for node_id, parent, title, collapsed in rows
+        ], ()
+
+    async def get_node(self, request, writer, node_id):
+        version = await self._read(database.get_node_version, node_id)
+        if version is None:
+            raise HTTPError(404)
+        etag = _node_etag(version)
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return 304, None, [("ETag", etag)]
+        node = await self._read(database.get_node, node_id)
+        if node is None:
+            raise HTTPError(404)
+        return 200, _node_json(node), [("ETag", etag)]
+
+    async def get_content(self, request, writer, node_id):
+        version = await self._read(database.get_node_version, node_id)
+        if version is None:
+            raise HTTPError(404)
+        etag = _content_etag(version)
+        headers = [("ETag", etag)]
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            await self._send(writer, 304, headers=headers, keep_alive=request.keep_alive)
+            return None
+        content = await self._read(database.get_content, node_id)
+        await self._send(writer, 200, (content or "").encode("utf-8"), headers,
+                         request.keep_alive, content_type="text/plain; charset=utf-8")
+        return None
+
+    async def search(self, request, writer):
+        query = request.param("q", default="")
+        limit = max(1, min(request.param("limit", int, SEARCH_LIMIT), 1000))
+        hits = await self._read(database.search, query, limit, ("**", "**"))
+        return 200, [{"id": node_id, "title": title, "snippet": snippet}
+                     for node_id, title, snippet in hits], ()
+
+    async def stream_tree(self, request, writer):
+        root = request.param("root", int)
+        with_content = request.param("content", default="1") != "0"
+        if root is not None and await self._read(database.get_node_version, root) is None:
+            raise HTTPError(404)
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(STREAM_QUEUE_CHUNKS)
+        cancelled = threading.Event()
+
+        def put(chunk):
+            # Bloque le thread de lecture tant que le client n'a pas suivi
+            asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+
+        def produce():
+            database.check_external_changes()
+            parts = [b"["]
+            size = 1
+            separator = b""
+            try:
+                for node_id, parent_id, title, content, collapsed, depth in database.iter_tree(root):
+                    if cancelled.is_set():
+                        return
+                    record = {"id": node_id, "parent_id": parent_id, "title": title,
+                              "collapsed": bool(collapsed), "depth": depth}
+                    if with_content:
+                        record["content"] = content
+                    data = separator + json.dumps(record, ensure_ascii=False).encode("utf-8")
+                    separator = b","
+                    parts.append(data)
+                    size += len(data)
+                    if size >= STREAM_CHUNK_BYTES:
+                        put(b"".join(parts))
+                        parts = []
+                        size = 0
+                parts.append(b"]")
+                put(b"".join(parts))
+            finally:
+                put(None)
+
+        await self._send_headers_chunked(writer, request.keep_alive)
+        producer = loop.run_in_executor(self.read_pool, produce)
+        complete = False
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+            try:
+                await producer
+            except Exception:
+                # Erreur de lecture en cours de flux : la réponse reste sans
+                # morceau final, le client ne la prend pas pour complète
+                traceback.print_exc()
+                return None
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            complete = True
+        finally:
+            if not complete:
+                cancelled.set()
+                # Vide la file pour que le thread de lecture puisse s'arrêter
+                while not producer.done():
+                    if await queue.get() is None:
+                        break
+                writer.close()
+        return None
+
+    async def _send_headers_chunked(self, writer, keep_alive):
+        lines = ["HTTP/1.1 200 OK", "Content-Type: application/json; charset=utf-8",
+                 "Transfer-Encoding: chunked"]
+        if not keep_alive:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    # -- Écritures --
+
+    async def create_node(self, request, writer):
+        data = request.json()
+        title = _optional_str(data, "title")
+        if not title:
+            raise HTTPError(400, "title est requis")
+        parent_id = _optional_int(data, "parent_id")
+        content = _optional_str(data, "content") or ""
+        collapsed = 1 if data.get("collapsed") else 0
+
+        def create():
+            if parent_id is not None and database.get_node_version(parent_id) is None:
+                raise HTTPError(404, "Parent introuvable")
+            return database.create_node(title, parent_id, content, collapsed)
+
+        node_id = await self._write(create)
+        return 201, {"id": node_id}, [("Location", f"/nodes/{node_id}")]
+
+    async def update_node(self, request, writer, node_id):
+        data = request.json()
+        title = _optional_str(data, "title")
+        content = _optional_str(data, "content")
+        collapsed = data.get("collapsed")
+        if collapsed is not None:
+            collapsed = 1 if collapsed else 0
+        if_match = request.headers.get("if-match")
+
+        def update():
+            with database.batch():
+                version = database.get_node_version(node_id)
+                if version is None:
+                    raise HTTPError(404)
+                if if_match is not None and not _etag_matches(if_match, _node_etag(version)):
+                    raise HTTPError(412)
+                database.update_node(node_id, title, content, collapsed)
+                return database.get_node_version(node_id)
+
+        version = await self._write(update)
+        return 200, {"id": node_id}, [("ETag", _node_etag(version))]
+
+    async def append(self, request, writer, node_id):
+        text = _optional_str(request.json(), "text")
+        if not text:
+            raise HTTPError(400, "text est requis")
+
+        def append():
+            # Lecture et écriture dans la même transaction : deux ajouts
+            # concurrents ne s'écrasent pas
+            with database.batch():
+                if database.get_node_version(node_id) is None:
+                    raise HTTPError(404)
+                content = database.get_content(node_id) or ""
+                database.update_node(node_id, content=content + text)
+                return database.get_node_version(node_id)
+
+        version = await self._write(append)
+        return 200, {"id": node_id}, [("ETag", _node_etag(version))]
+
+    async def move_node(self, request, writer, node_id):
+        data = request.json()
+        parent_id = _optional_int(data, "parent_id")
+        before_id = _optional_int(data, "before_id")
+
+        def move():
+            with database.batch():
+                for required in (node_id, parent_id):
+                    if required is not None and database.get_node_version(required) is None:
+                        raise HTTPError(404)
+                database.move_node(node_id, parent_id, before_id)
+
+        await self._write(move)
+        return 200, {"id": node_id}, ()
+
+    async def delete_node(self, request, writer, node_id):
+        def delete():
+            with database.batch():
+                if database.get_node_version(node_id) is None:
+                    raise HTTPError(404)
+                database.delete_node(node_id)
+
+        await self._write(delete)
+        await self._send(writer, 204, keep_alive=request.keep_alive)
+        return None
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, readers=DEFAULT_READERS, token=None):
+    server = NoteServer(readers, token)
+    listener = await asyncio.start_server(server.handle_connection, host, port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in listener.sockets)
+    print(f"NoteNodes API on {addresses} ({database.DB_PATH})", file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS,
+                        help="threads (et connexions) de lecture")
+    parser.add_argument("--db", help="base à utiliser (par défaut celle de l'application)")
+    parser.add_argument("--notebook", help="carnet à utiliser (par défaut le carnet par défaut)")
+    parser.add_argument("--token", default=os.environ.get("NOTENODES_TOKEN"),
+                        help="jeton exigé dans l'en-tête Authorization")
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_PATH = os.path.abspath(args.db)
+    elif args.notebook:
+        database.DB_PATH = notebooks.notebook_path(args.notebook)
+        os.makedirs(os.path.dirname(database.DB_PATH), exist_ok=True)
+    database.init_db()
+    try:
+        asyncio.run(serve(args.host, args.port, args.readers, args.token))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Export du carnet en site HTML statique.
+
+Usage : python cli.py export-html site/ [--workers N] [--root ID]
+
+Chaque note devient `<id>.html` ; `index.html` reprend l'arborescence et
+`style.css`, partagé par toutes les pages, n'est écrit qu'une fois. Le
+rendu Markdown est réparti sur un pool de processus, chacun gardant son
+propre MarkdownRenderer. Un manifeste garde l'empreinte de chaque page,
+calculée sur le titre, le parent et l'empreinte du texte déjà en base :
+une note inchangée depuis le dernier export n'est ni décompressée ni rendue
+à nouveau.
+"""
+import html
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import database
+from utils import MARKDOWN_EXTENSIONS, MarkdownRenderer, content_hash, preview_css
+
+MANIFEST = "manifest.json"
+STYLESHEET = "style.css"
+
+# Notes envoyées ensemble à un processus, pour amortir les échanges
+CHUNK_SIZE = 32
+# Lots en attente par processus ; borne la mémoire utilisée
+MAX_PENDING_PER_WORKER = 4
+
+# À changer avec le gabarit : force le rendu de toutes les pages
+TEMPLATE_VERSION = 1
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<link rel="stylesheet" href="{stylesheet}">
+</head>
+<body>
+<nav><a href="index.html">&#8592;</a></nav>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+# Instance propre à chaque processus de rendu (voir _init_worker)
+_renderer = None
+
+def page_name(node_id):
+    return f"{node_id}.html"
+
+def _page_key(title, parent_id, text_hash):
+    return content_hash(
+        f"{TEMPLATE_VERSION}\0{MARKDOWN_EXTENSIONS}\0{title}\0{parent_id}\0{text_hash or ''}"
+    )
+
+def _init_worker():
+    global _renderer
+    _renderer = MarkdownRenderer()
+
+def _write_file(path, data):
+    # Fichier temporaire puis renommage : pas de page à moitié écrite
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _render_chunk(directory, notes):
+    """Rend et écrit un lot de pages (dans un processus du pool).
+
+    Retourne [(id, empreinte, octets écrits)].
+    """
+    written = []
+    for node_id, title, content, key in notes:
+        body = _renderer.convert(content or "")
+        page = PAGE_TEMPLATE.format(
+            title=html.escape(title), stylesheet=STYLESHEET, body=body,
+        ).encode("utf-8")
+        _write_file(os.path.join(directory, page_name(node_id)), page)
+        written.append((node_id, key, len(page)))
+    return written
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f).get("pages", {})
+    except (OSError, ValueError):
+        return {}
+
+class _IndexWriter:
+    """Écrit index.html au fil du parcours en pré-ordre (listes imbriquées)."""
+
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                         f'<link rel="stylesheet" href="{STYLESHEET}">\n</head>\n<body>\n')
+        self._level = -1
+
+    def add(self, node_id, title, depth):
+        if depth > self._level:
+            self._file.write("<ul>\n")
+        else:
+            self._file.write("</li>\n")
+            self._file.write("</ul></li>\n" * (self._level - depth))
+        self._file.write(f'<li><a href="{page_name(node_id)}">{html.escape(title)}</a>')
+        self._level = depth
+
+    def close(self):
+        if self._level >= 0:
+            self._file.write("</li>\n")
+            self._file.write("</ul></li>\n" * self._level)
+            self._file.write("</ul>\n")
+        self._file.write("</body>\n</html>\n")
+        self._file.close()
+
+def export_site(directory, parent_id=None, workers=None):
+    """Exporte le sous-arbre de parent_id (tout le carnet par défaut).
+
+    Retourne un dict de statistiques : notes, rendered, skipped, removed,
+    bytes, seconds.
+    """
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    previous = _load_manifest(directory)
+    pages = {}
+    stats = {"notes": 0, "rendered": 0, "skipped": 0, "removed": 0, "bytes": 0}
+
+    _write_file(os.path.join(directory, STYLESHEET), preview_css().encode("utf-8"))
+    index = _IndexWriter(os.path.join(directory, "index.html"))
+
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+
+    def collect(future):
+        for node_id, key, size in future.result():
+            pages[str(node_id)] = key
+            stats["rendered"] += 1
+            stats["bytes"] += size
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        chunk = []
+        for node_id, parent, title, text_hash, _, depth in database.iter_tree(parent_id, content=False):
+            stats["notes"] += 1
+            index.add(node_id, title, depth)
+            key = _page_key(title, parent, text_hash)
+            if (previous.get(str(node_id)) == key
+                    and os.path.exists(os.path.join(directory, page_name(node_id)))):
+                pages[str(node_id)] = key
+                stats["skipped"] += 1
+                continue
+            # Seules les pages à rendre lisent (et décompressent) le texte
+            chunk.append((node_id, title, database.get_content(node_id), key))
+            if len(chunk) == CHUNK_SIZE:
+                pending.append(pool.submit(_render_chunk, directory, chunk))
+                chunk = []
+                if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                    collect(pending.popleft())
+        if chunk:
+            pending.append(pool.submit(_render_chunk, directory, chunk))
+        while pending:
+            collect(pending.popleft())
+    index.close()
+
+    # Pages des notes supprimées depuis le dernier export
+    for node_id in previous.keys() - pages.keys():
+        try:
+            os.remove(os.path.join(directory, page_name(node_id)))
+            stats["removed"] += 1
+        except OSError:
+            pass
+
+    manifest = {"version": TEMPLATE_VERSION, "pages": pages}
+    _write_file(os.path.join(directory, MANIFEST), json.dumps(manifest).encode("utf-8"))
+    stats["seconds"] = time.perf_counter() - start
+    return stats
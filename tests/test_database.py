@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import database
+import ranks
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Chaque test travaille sur une base neuve dans un dossier temporaire."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.previous_path = database.DB_PATH
+        database.DB_PATH = os.path.join(self.directory, "notes.db")
+        database.init_db()
+
+    def tearDown(self):
+        database.close_connections()
+        database.DB_PATH = self.previous_path
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ReaderTest(DatabaseTestCase):
+
+    def test_new_database_uses_incremental_auto_vacuum(self):
+        self.assertEqual(database.page_stats()["auto_vacuum"], "incremental")
+
+    def test_reader_opened_during_batch(self):
+        first = database.create_node("first", content="one")
+        results = []
+
+        def read():
+            # Nouvelle connexion de lecture, ouverte pendant l'écriture
+            try:
+                results.append([row[0] for row in database.get_children(None)])
+            except Exception as e:
+                results.append(e)
+
+        with database.batch():
+            database.create_node("second", content="two")
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join()
+        # Le lecteur voit l'état validé, sans attendre la fin de la transaction
+        self.assertEqual(results, [[first]])
+
+
+class TreeTest(DatabaseTestCase):
+
+    def test_count_subtree(self):
+        root = database.create_node("root")
+        child = database.create_node("child", root)
+        database.create_node("grandchild", child)
+        self.assertEqual(database.count_subtree(root), 3)
+        database.delete_node(child)
+        self.assertEqual(database.count_subtree(root), 1)
+
+    def test_move_rebalances_long_rank_keys(self):
+        first = database.create_node("first")
+        before = database.create_node("last")
+        expected = [first, before]
+        # Toujours au même endroit : la clé s'allonge à chaque insertion
+        for i in range(300):
+            node_id = database.create_node(f"note {i}")
+            database.move_node(node_id, None, before)
+            expected.insert(-1 - i, node_id)
+            before = node_id
+        self.assertEqual([row[0] for row in database.get_children(None)], expected)
+        with database.batch() as conn:
+            longest = conn.execute("SELECT MAX(LENGTH(rank)) FROM nodes").fetchone()[0]
+        self.assertLessEqual(longest, ranks.MAX_RANK_LENGTH)
+
+class BulkInsertTest(DatabaseTestCase):
+
+    def assertIndexIntact(self):
+        with database.batch() as conn:
+            conn.execute("INSERT INTO nodes_fts(nodes_fts) VALUES ('integrity-check')")
+
+    def found(self, query):
+        return [row[0] for row in database.search(query)]
+
+    def test_create_then_update(self):
+        with database.bulk_insert():
+            node_id = database.create_node("draft", content="before")
+            database.update_node(node_id, title="final", content="after")
+        self.assertIndexIntact()
+        self.assertEqual(self.found("after"), [node_id])
+        self.assertEqual(self.found("final"), [node_id])
+        self.assertEqual(self.found("before"), [])
+
+    def test_create_then_delete(self):
+        with database.bulk_insert():
+            kept = database.create_node("kept", content="shared")
+            dropped = database.create_node("dropped", content="shared")
+            database.delete_node(dropped)
+        self.assertIndexIntact()
+        self.assertEqual(self.found("shared"), [kept])
+
+    def test_existing_node_updated_in_block(self):
+        node_id = database.create_node("old", content="before")
+        with database.bulk_insert():
+            database.create_node("new", content="other")
+            database.update_node(node_id, content="after")
+        self.assertIndexIntact()
+        self.assertEqual(self.found("after"), [node_id])
+        self.assertEqual(self.found("before"), [])
+
+
+
+class OrphanTest(DatabaseTestCase):
+
+    def test_blob_queued_for_index_is_kept(self):
+        node_id = database.create_node("note", content="before")
+        # Écriture d'un autre client : en file, pas encore indexée
+        other = database.get_connection()
+        try:
+            other.execute(
+                "UPDATE nodes SET content_hash = (SELECT content_hash FROM nodes WHERE id = ?)"
+                " WHERE id = ?", (database.create_node("other", content="after"), node_id))
+            other.commit()
+        finally:
+            other.close()
+        keys, _ = database.find_orphans("blobs")
+        database.repair_orphans("blobs", keys)
+        database.sync_search_index()
+        with database.batch() as conn:
+            conn.execute("INSERT INTO nodes_fts(nodes_fts) VALUES ('integrity-check')")
+        self.assertEqual([row[0] for row in database.search("before")], [])
+
+if __name__ == "__main__":
+    unittest.main()
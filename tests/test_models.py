@@ -0,0 +1,30 @@
+import unittest
+
+from models import NodeCache
+
+
+class NodeCacheTest(unittest.TestCase):
+
+    def test_eviction_keeps_content_of_returned_node(self):
+        cache = NodeCache(max_content_chars=10)
+        first = cache.put(cache.generation, 1, None, "first", 0, "a" * 8, with_content=True)
+        # Le texte du second dépasse le budget : celui du premier est évincé
+        cache.put(cache.generation, 2, None, "second", 0, "b" * 8, with_content=True)
+        self.assertEqual(first.content, "a" * 8)
+        self.assertIsNone(cache.get(1, with_content=True))
+        # Les métadonnées restent en cache, sans le texte
+        node = cache.get(1)
+        self.assertEqual(node.title, "first")
+        self.assertIsNone(node.content)
+        self.assertEqual(cache.stats()["content_chars"], 8)
+
+    def test_update_reaches_cached_node(self):
+        cache = NodeCache()
+        node = cache.put(cache.generation, 1, None, "old", 0, "text", with_content=True)
+        cache.update(1, title="new", content="changed")
+        self.assertIs(cache.get(1, with_content=True), node)
+        self.assertEqual((node.title, node.content), ("new", "changed"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import database
+import site_export
+from tests.test_database import DatabaseTestCase
+
+
+class ExportSiteTest(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.site = tempfile.mkdtemp(dir=self.directory)
+        parent = database.create_node("parent", content="# Parent")
+        self.child = database.create_node("child", parent, content="child text")
+
+    def export(self):
+        with mock.patch.object(database, "get_content", wraps=database.get_content) as reads:
+            stats = site_export.export_site(self.site, workers=1)
+        return stats, [call.args[0] for call in reads.call_args_list]
+
+    def test_unchanged_notes_are_not_read(self):
+        stats, read = self.export()
+        self.assertEqual(stats["rendered"], 2)
+        stats, read = self.export()
+        self.assertEqual((stats["rendered"], stats["skipped"]), (0, 2))
+        self.assertEqual(read, [])
+
+    def test_changed_note_is_rendered_again(self):
+        self.export()
+        database.update_node(self.child, content="new text")
+        stats, read = self.export()
+        self.assertEqual((stats["rendered"], stats["skipped"]), (1, 1))
+        self.assertEqual(read, [self.child])
+        with open(os.path.join(self.site, site_export.page_name(self.child)), encoding="utf-8") as f:
+            self.assertIn("new text", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
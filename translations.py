@@ -8,6 +8,7 @@ TRANSLATIONS = {
         'new_node': 'New node',
         'node_title': 'Node title:',
         'delete_confirm': 'Do you really want to delete this node and all its children?',
+        'delete_confirm_count': 'Do you really want to delete this node and its {} descendants?',
         'success': 'Success',
         'note_saved': 'Note saved!',
         'confirmation': 'Confirmation',
@@ -23,6 +24,39 @@ TRANSLATIONS = {
         'standard_cancel': 'Cancel',
         'standard_ok': 'OK',
         'rename': 'Rename',
+        'search': 'Search notes…',
+        'autosave': 'Autosave',
+        'unsaved_changes': 'Unsaved changes',
+        'saving': 'Saving…',
+        'all_saved': 'All changes saved',
+        'history': 'History',
+        'restore': 'Restore',
+        'view': 'View',
+        'snapshot': 'snapshot',
+        'notebooks': 'Notebooks',
+        'new_notebook': 'New notebook…',
+        'notebook_name': 'Notebook name:',
+        'notebook_error': 'Cannot open notebook: {}',
+        'loading_note': 'Loading note…',
+        'performance': 'Performance',
+        'perf_category': 'Category',
+        'perf_name': 'Name',
+        'perf_calls': 'Calls',
+        'perf_total': 'Total (ms)',
+        'perf_mean': 'Mean (ms)',
+        'perf_p50': 'p50 (ms)',
+        'perf_p95': 'p95 (ms)',
+        'perf_max': 'Max (ms)',
+        'perf_rows': 'Rows',
+        'perf_reset': 'Reset',
+        'perf_export_json': 'Export JSON…',
+        'perf_export_trace': 'Export Chrome trace…',
+        'perf_summary': 'Connections: {} opened, {} open · Node cache: {:.0%} hits ({} hits, {} misses, {} nodes)',
+        'backlinks': 'Backlinks',
+        'no_backlinks': 'No note links here.',
+        'link_not_found': 'Note not found: {}',
+        'maintenance_done': 'Database maintenance: {} reclaimed, {} orphan notes moved to the top level',
+        'maintenance_problems': 'Database check found problems: {}',
     },
     'fr': {
         'window_title': 'NoteNodes',
@@ -33,6 +67,7 @@ TRANSLATIONS = {
         'new_node': 'Nouveau nœud',
         'node_title': 'Titre du nœud:',
         'delete_confirm': 'Voulez-vous vraiment supprimer ce nœud et tous ses enfants ?',
+        'delete_confirm_count': 'Voulez-vous vraiment supprimer ce nœud et ses {} descendants ?',
         'success': 'Succès',
         'note_saved': 'Note enregistrée !',
         'confirmation': 'Confirmation',
@@ -48,6 +83,39 @@ TRANSLATIONS = {
         'standard_cancel': 'Annuler',
         'standard_ok': 'OK',
         'rename': 'Renommer',
+        'search': 'Rechercher…',
+        'autosave': 'Sauvegarde automatique',
+        'unsaved_changes': 'Modifications non enregistrées',
+        'saving': 'Enregistrement…',
+        'all_saved': 'Toutes les modifications sont enregistrées',
+        'history': 'Historique',
+        'restore': 'Restaurer',
+        'view': 'Affichage',
+        'snapshot': 'instantané',
+        'notebooks': 'Carnets',
+        'new_notebook': 'Nouveau carnet…',
+        'notebook_name': 'Nom du carnet :',
+        'notebook_error': "Impossible d'ouvrir le carnet : {}",
+        'loading_note': 'Chargement de la note…',
+        'performance': 'Performances',
+        'perf_category': 'Catégorie',
+        'perf_name': 'Nom',
+        'perf_calls': 'Appels',
+        'perf_total': 'Total (ms)',
+        'perf_mean': 'Moyenne (ms)',
+        'perf_p50': 'p50 (ms)',
+        'perf_p95': 'p95 (ms)',
+        'perf_max': 'Max (ms)',
+        'perf_rows': 'Lignes',
+        'perf_reset': 'Réinitialiser',
+        'perf_export_json': 'Exporter en JSON…',
+        'perf_export_trace': 'Exporter une trace Chrome…',
+        'perf_summary': 'Connexions : {} ouvertes, {} actives · Cache de nœuds : {:.0%} de succès ({} succès, {} échecs, {} nœuds)',
+        'backlinks': 'Rétroliens',
+        'no_backlinks': 'Aucune note ne pointe ici.',
+        'link_not_found': 'Note introuvable : {}',
+        'maintenance_done': 'Maintenance de la base : {} récupérés, {} notes orphelines remises à la racine',
+        'maintenance_problems': 'La vérification de la base a trouvé des problèmes : {}',
     },
     'es': {
         'window_title': 'NoteNodes',
@@ -58,6 +126,7 @@ TRANSLATIONS = {
         'new_node': 'Nueva nota',
         'node_title': 'Título de la nota:',
         'delete_confirm': '¿Realmente desea eliminar esta nota y todos sus hijos?',
+        'delete_confirm_count': '¿Realmente desea eliminar esta nota y sus {} descendientes?',
         'success': 'Éxito',
         'note_saved': '¡Nota guardada!',
         'confirmation': 'Confirmación',
@@ -73,6 +142,39 @@ TRANSLATIONS = {
         'standard_cancel': 'Cancelar',
         'standard_ok': 'Aceptar',
         'rename': 'Renombrar',
+        'search': 'Buscar notas…',
+        'autosave': 'Guardado automático',
+        'unsaved_changes': 'Cambios sin guardar',
+        'saving': 'Guardando…',
+        'all_saved': 'Todos los cambios guardados',
+        'history': 'Historial',
+        'restore': 'Restaurar',
+        'view': 'Ver',
+        'snapshot': 'instantánea',
+        'notebooks': 'Cuadernos',
+        'new_notebook': 'Nuevo cuaderno…',
+        'notebook_name': 'Nombre del cuaderno:',
+        'notebook_error': 'No se puede abrir el cuaderno: {}',
+        'loading_note': 'Cargando la nota…',
+        'performance': 'Rendimiento',
+        'perf_category': 'Categoría',
+        'perf_name': 'Nombre',
+        'perf_calls': 'Llamadas',
+        'perf_total': 'Total (ms)',
+        'perf_mean': 'Media (ms)',
+        'perf_p50': 'p50 (ms)',
+        'perf_p95': 'p95 (ms)',
+        'perf_max': 'Máx. (ms)',
+        'perf_rows': 'Filas',
+        'perf_reset': 'Reiniciar',
+        'perf_export_json': 'Exportar JSON…',
+        'perf_export_trace': 'Exportar traza de Chrome…',
+        'perf_summary': 'Conexiones: {} abiertas, {} activas · Caché de nodos: {:.0%} aciertos ({} aciertos, {} fallos, {} nodos)',
+        'backlinks': 'Enlaces entrantes',
+        'no_backlinks': 'Ninguna nota enlaza aquí.',
+        'link_not_found': 'Nota no encontrada: {}',
+        'maintenance_done': 'Mantenimiento de la base: {} recuperados, {} notas huérfanas movidas a la raíz',
+        'maintenance_problems': 'La comprobación de la base encontró problemas: {}',
     },
     'ko': {
         'window_title': 'NoteNodes',
@@ -83,6 +185,7 @@ TRANSLATIONS = {
         'new_node': '새 노트',
         'node_title': '노트 제목:',
         'delete_confirm': '이 노트와 모든 하위 노트를 삭제하시겠습니까?',
+        'delete_confirm_count': '이 노트와 하위 노트 {}개를 삭제하시겠습니까?',
         'success': '성공',
         'note_saved': '노트가 저장되었습니다!',
         'confirmation': '확인',
@@ -98,11 +201,48 @@ TRANSLATIONS = {
         'standard_cancel': '취소',
         'standard_ok': '확인',
         'rename': '이름 바꾸기',
+        'search': '노트 검색…',
+        'autosave': '자동 저장',
+        'unsaved_changes': '저장되지 않은 변경 사항',
+        'saving': '저장 중…',
+        'all_saved': '모든 변경 사항이 저장됨',
+        'history': '기록',
+        'restore': '복원',
+        'view': '보기',
+        'snapshot': '스냅샷',
+        'notebooks': '노트북',
+        'new_notebook': '새 노트북…',
+        'notebook_name': '노트북 이름:',
+        'notebook_error': '노트북을 열 수 없습니다: {}',
+        'loading_note': '노트를 불러오는 중…',
+        'performance': '성능',
+        'perf_category': '분류',
+        'perf_name': '이름',
+        'perf_calls': '호출 수',
+        'perf_total': '합계 (ms)',
+        'perf_mean': '평균 (ms)',
+        'perf_p50': 'p50 (ms)',
+        'perf_p95': 'p95 (ms)',
+        'perf_max': '최대 (ms)',
+        'perf_rows': '행 수',
+        'perf_reset': '초기화',
+        'perf_export_json': 'JSON 내보내기…',
+        'perf_export_trace': 'Chrome 트레이스 내보내기…',
+        'perf_summary': '연결: {}개 열림, {}개 사용 중 · 노드 캐시: 적중률 {:.0%} (적중 {}, 실패 {}, 노드 {})',
+        'backlinks': '백링크',
+        'no_backlinks': '이 노트를 가리키는 노트가 없습니다.',
+        'link_not_found': '노트를 찾을 수 없습니다: {}',
+        'maintenance_done': '데이터베이스 정리: {} 확보, 고아 노트 {}개를 최상위로 이동',
+        'maintenance_problems': '데이터베이스 검사에서 문제를 발견했습니다: {}',
     }
 }
 
 class Translator:
     def __init__(self):
+        self.reload()
+    
+    def reload(self):
+        """Relit la langue enregistrée (réglage propre à chaque carnet)."""
         from database import get_setting
         self.current_language = get_setting('language', 'en')
     
@@ -0,0 +1,281 @@
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt, pyqtSignal
+
+import database
+
+# Rôle utilisé pour récupérer l'id d'un nœud depuis un QModelIndex
+NODE_ID_ROLE = Qt.UserRole
+
+
+class TreeNode:
+    """Nœud chargé en mémoire ; ses enfants ne sont lus qu'à l'expansion."""
+
+    __slots__ = ("node_id", "title", "collapsed", "parent", "row",
+                 "children", "has_children", "fetched")
+
+    def __init__(self, node_id, title, collapsed, parent=None, row=0, has_children=False):
+        self.node_id = node_id
+        self.title = title
+        self.collapsed = bool(collapsed)
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.has_children = has_children
+        self.fetched = False
+
+
+class NodeTreeModel(QAbstractItemModel):
+    """Modèle paresseux sur la table `nodes`.
+
+    Seuls les enfants des nœuds dépliés sont chargés (canFetchMore /
+    fetchMore) ; replier un nœud libère son sous-arbre.
+    """
+
+    # Émis quand l'utilisateur édite un titre dans la vue ; la fenêtre décide
+    # de l'accepter ou non (voir MainWindow.on_item_renamed).
+    titleEdited = pyqtSignal(QModelIndex, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._header = ""
+        self._root = TreeNode(None, "", False, has_children=True)
+        # Index id -> TreeNode des nœuds actuellement chargés
+        self._by_id = {}
+
+    # -- Accès aux nœuds --
+
+    def node_from_index(self, index):
+        if index.isValid():
+            return index.internalPointer()
+        return self._root
+
+    def index_for_node(self, node):
+        if node is None or node is self._root:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def node_id(self, index):
+        return self.node_from_index(index).node_id
+
+    def find(self, node_id):
+        """Retourne le TreeNode chargé pour cet id (None = racine ou non chargé)."""
+        if node_id is None:
+            return self._root
+        return self._by_id.get(node_id)
+
+    def index_for_id(self, node_id):
+        """QModelIndex du nœud en O(1) ; invalide s'il n'est pas chargé."""
+        return self.index_for_node(self._by_id.get(node_id))
+
+    def load_path(self, path):
+        """Charge les nœuds d'un chemin (ids de la racine au nœud) et retourne l'index du dernier."""
+        parent = self._root
+        for node_id in path:
+            if not parent.fetched:
+                self.fetchMore(self.index_for_node(parent))
+            node = self._by_id.get(node_id)
+            if node is None or node.parent is not parent:
+                return QModelIndex()
+            parent = node
+        return self.index_for_node(parent)
+
+    # -- Structure --
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self.node_from_index(parent)
+        if column != 0 or row < 0 or row >= len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_for_node(index.internalPointer().parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        return len(self.node_from_index(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self.node_from_index(parent)
+        if node.fetched:
+            return bool(node.children)
+        return node.has_children
+
+    def canFetchMore(self, parent):
+        node = self.node_from_index(parent)
+        return not node.fetched and node.has_children
+
+    def fetchMore(self, parent):
+        node = self.node_from_index(parent)
+        if node.fetched:
+            return
+        rows = database.get_child_skeleton(node.node_id)
+        node.fetched = True
+        if not rows:
+            node.has_children = False
+            return
+        self.beginInsertRows(parent, 0, len(rows) - 1)
+        node.children = [
+            TreeNode(node_id, title, collapsed, node, row, bool(has_children))
+            for row, (node_id, title, collapsed, has_children) in enumerate(rows)
+        ]
+        for child in node.children:
+            self._by_id[child.node_id] = child
+        self.endInsertRows()
+
+    def release_children(self, index):
+        """Décharge le sous-arbre d'un nœud replié pour libérer la mémoire."""
+        node = self.node_from_index(index)
+        if not node.fetched:
+            return
+        if node.children:
+            self.beginRemoveRows(index, 0, len(node.children) - 1)
+            for child in node.children:
+                self._forget(child)
+            node.children = []
+            node.fetched = False
+            self.endRemoveRows()
+        else:
+            node.fetched = False
+
+    def reload(self):
+        """Oublie tout ce qui a été chargé et repart de la racine."""
+        self.beginResetModel()
+        self._root = TreeNode(None, "", False, has_children=True)
+        self._by_id = {}
+        self.endResetModel()
+
+    # -- Mises à jour incrémentales --
+
+    def insert_node(self, parent_id, node_id, title, collapsed=False):
+        """Ajoute un nœud créé en base sans recharger l'arbre."""
+        parent = self.find(parent_id)
+        if parent is None:
+            # Parent pas chargé : le nœud sera lu à son dépliage
+            return
+        if not parent.fetched:
+            parent.has_children = True
+            parent_index = self.index_for_node(parent)
+            if parent_index.isValid():
+                self.dataChanged.emit(parent_index, parent_index)
+            return
+        row = len(parent.children)
+        self.beginInsertRows(self.index_for_node(parent), row, row)
+        node = TreeNode(node_id, title, collapsed, parent, row)
+        node.fetched = True  # nœud neuf : pas d'enfants à lire
+        parent.children.append(node)
+        parent.has_children = True
+        self._by_id[node_id] = node
+        self.endInsertRows()
+
+    def remove_node(self, node_id):
+        """Retire un nœud et son sous-arbre du modèle."""
+        node = self._by_id.get(node_id)
+        if node is None:
+            return
+        parent = node.parent
+        self.beginRemoveRows(self.index_for_node(parent), node.row, node.row)
+        self._detach(node)
+        self._forget(node)
+        self.endRemoveRows()
+        if not parent.children:
+            parent.has_children = False
+
+    # -- Données --
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return node.title
+        if role == NODE_ID_ROLE:
+            return node.node_id
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        self.titleEdited.emit(index, value)
+        return True
+
+    def set_title(self, index, title):
+        node = self.node_from_index(index)
+        node.title = title
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+
+    def set_collapsed(self, index, collapsed):
+        self.node_from_index(index).collapsed = collapsed
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return self._header
+        return None
+
+    def set_header(self, text):
+        self._header = text
+        self.headerDataChanged.emit(Qt.Horizontal, 0, 0)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return (Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+                | Qt.ItemIsDragEnabled | Qt.ItemIsDropEnabled)
+
+    # -- Drag & drop --
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def move_node(self, index, new_parent_index, row=None):
+        """Déplace un nœud déjà chargé sous un nouveau parent, avant la
+        ligne `row` de celui-ci (à la fin si row vaut None)."""
+        node = self.node_from_index(index)
+        old_parent = node.parent
+        new_parent = self.node_from_index(new_parent_index)
+
+        if new_parent.fetched:
+            # Le nouveau parent est chargé : on déplace la ligne telle quelle
+            dest_row = len(new_parent.children) if row is None else row
+            if new_parent is old_parent and dest_row in (node.row, node.row + 1):
+                return  # déjà à cette place
+            self.beginMoveRows(index.parent(), node.row, node.row,
+                               new_parent_index, dest_row)
+            if new_parent is old_parent and dest_row > node.row:
+                dest_row -= 1
+            self._detach(node)
+            node.parent = new_parent
+            new_parent.children.insert(dest_row, node)
+            for position in range(dest_row, len(new_parent.children)):
+                new_parent.children[position].row = position
+            self.endMoveRows()
+        else:
+            # Sinon il sera lu depuis la base au prochain dépliage
+            self.beginRemoveRows(index.parent(), node.row, node.row)
+            self._detach(node)
+            self._forget(node)
+            self.endRemoveRows()
+            new_parent.has_children = True
+            new_parent_index = self.index_for_node(new_parent)
+            self.dataChanged.emit(new_parent_index, new_parent_index)
+
+        if old_parent.fetched and not old_parent.children:
+            old_parent.has_children = False
+
+    def _detach(self, node):
+        siblings = node.parent.children
+        del siblings[node.row]
+        for row in range(node.row, len(siblings)):
+            siblings[row].row = row
+
+    def _forget(self, node):
+        """Retire un sous-arbre de l'index id -> TreeNode."""
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            self._by_id.pop(current.node_id, None)
+            pending.extend(current.children)
@@ -1,20 +1,79 @@
+import time
+from collections import deque
+
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QTreeWidget, QTreeWidgetItem,
-    QPushButton, QTextEdit, QTextBrowser, QInputDialog, QMessageBox, QSplitter,
-    QMenu, QSizePolicy, QComboBox, QMainWindow, QMenuBar, QAction, QShortcut
+    QWidget, QVBoxLayout, QHBoxLayout, QTreeView, QAbstractItemView,
+    QPushButton, QTextEdit, QPlainTextEdit, QTextBrowser, QInputDialog, QMessageBox, QSplitter,
+    QMenu, QSizePolicy, QComboBox, QMainWindow, QMenuBar, QAction, QShortcut,
+    QLineEdit, QListWidget, QListWidgetItem, QLabel, QDockWidget, QStackedWidget
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont, QKeySequence
+from PyQt5.QtCore import Qt, QModelIndex, QPersistentModelIndex, QPoint, QTimer, QUrl, pyqtSignal
+from PyQt5.QtGui import QDesktopServices, QFont, QKeySequence, QTextCursor
 
 import database
-from models import Node
-from utils import markdown_to_html
+import instrumentation
+import links
+import maintenance
+import notebooks
+from tree_model import NodeTreeModel
+from preview import PreviewRenderer
+from history_panel import HistoryPanel
+from backlinks_panel import BacklinksPanel
+from workers import LatestOnlyWorker
+from write_queue import WriteBehindQueue
 from translations import Translator
+from utils import content_hash, content_hasher
 
 class MainWindow(QMainWindow):
+    # Émis (depuis le thread d'écriture) après chaque vidage de la file
+    writesFlushed = pyqtSignal()
+    # Émis quand tous les nœuds dépliés de l'arbre ont été chargés
+    treeLoaded = pyqtSignal()
+    # Émis (depuis le thread de maintenance) avec le rapport d'une passe
+    maintenanceFinished = pyqtSignal(object)
+    
+    # Délai sans frappe avant de rafraîchir l'aperçu
+    PREVIEW_DELAY_MS = 200
+    # Délai sans frappe avant de lancer une recherche
+    SEARCH_DELAY_MS = 150
+    SEARCH_LIMIT = 50
+    # Intervalle par défaut entre deux vidages de la file d'écritures
+    WRITE_INTERVAL_MS = 500
+    # Délai sans frappe avant la sauvegarde automatique
+    AUTOSAVE_DELAY_MS = 1000
+    # Temps de chargement de l'arbre par tour de boucle, pour rester réactif
+    TREE_LOAD_SLICE_MS = 10
+    # Au-delà de cette taille, une note s'ouvre dans l'éditeur grandes notes
+    LARGE_NOTE_BYTES = 1024 * 1024
+    # Chargement d'une grande note : caractères insérés à la fois, et temps
+    # passé à les insérer par tour de boucle
+    LARGE_NOTE_CHUNK_CHARS = 32 * 1024
+    LARGE_NOTE_SLICE_MS = 15
+    # Aperçu d'une grande note : blocs de contexte au-dessus de la zone
+    # visible ou modifiée, et taille maximale du texte rendu
+    LARGE_PREVIEW_CONTEXT_BLOCKS = 5
+    LARGE_PREVIEW_CHARS = 20000
+    
     def __init__(self):
         super().__init__()
         self.translator = Translator()
+        # Repli/dépli, renommage et sauvegarde sont écrits en arrière-plan
+        interval = int(database.get_setting('write_interval_ms', self.WRITE_INTERVAL_MS))
+        self.writes = WriteBehindQueue(interval / 1000, on_flush=self.writesFlushed.emit)
+        # Vidée et suspendue à chaque changement de carnet
+        notebooks.register_worker(self.writes)
+        # Maintenance de la base (place libre, orphelins, intégrité) dans un
+        # thread de fond, quand l'utilisateur n'édite ni ne navigue
+        self.maintenanceFinished.connect(self.on_maintenance_finished)
+        self.maintenance = maintenance.MaintenanceScheduler(on_report=self.maintenanceFinished.emit)
+        notebooks.register_worker(self.maintenance)
+        
+        # Sauvegarde automatique : empreinte du dernier contenu enregistré par
+        # nœud, et nœuds modifiés depuis
+        self.autosave_enabled = database.get_setting('autosave', '1') == '1'
+        self.persisted_hashes = {}
+        self.dirty_nodes = set()
+        self._loading_editor = False
         self.init_ui()
         
     def init_ui(self):
@@ -44,20 +103,52 @@ class MainWindow(QMainWindow):
         self.left_layout = QVBoxLayout()
         self.left_panel.setLayout(self.left_layout)
         
-        # Arbre des nœuds avec support du drag & drop
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabel(self.translator.get_text('notes'))
+        # Sélecteur de carnet (un fichier de base par carnet)
+        self.notebook_combo = QComboBox()
+        self.notebook_combo.activated.connect(self.on_notebook_activated)
+        self.left_layout.addWidget(self.notebook_combo)
+        self.refresh_notebook_list()
+        
+        # Recherche plein texte dans tous les carnets, exécutée hors du
+        # thread graphique
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText(self.translator.get_text('search'))
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.on_search_text_changed)
+        self.left_layout.addWidget(self.search_box)
+        
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(200)
+        self.search_results.itemClicked.connect(self.on_search_result_clicked)
+        self.search_results.itemActivated.connect(self.on_search_result_clicked)
+        self.search_results.hide()
+        self.left_layout.addWidget(self.search_results)
+        
+        self.search_worker = LatestOnlyWorker(self.run_search, "search", self)
+        self.search_worker.finished.connect(self.on_search_results)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.start_search)
+        
+        # Arbre des nœuds (modèle paresseux) avec support du drag & drop
+        self.tree_model = NodeTreeModel(self)
+        self.tree_model.set_header(self.translator.get_text('notes'))
+        self.tree_model.titleEdited.connect(self.on_item_renamed)
+        self.tree_model.rowsInserted.connect(self.restore_expanded_rows)
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)
         self.tree.setDragEnabled(True)
         self.tree.setAcceptDrops(True)
-        self.tree.setDragDropMode(QTreeWidget.InternalMove)
-        self.tree.itemClicked.connect(self.on_item_click)
-        self.tree.itemExpanded.connect(self.on_item_expanded)
-        self.tree.itemCollapsed.connect(self.on_item_collapsed)
+        self.tree.setDragDropMode(QAbstractItemView.InternalMove)
+        self.tree.clicked.connect(self.on_item_click)
+        self.tree.expanded.connect(self.on_item_expanded)
+        self.tree.collapsed.connect(self.on_item_collapsed)
         self.tree.dropEvent = self.handleDropEvent
         self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree.customContextMenuRequested.connect(self.show_context_menu)
-        self.tree.setEditTriggers(QTreeWidget.EditKeyPressed | QTreeWidget.DoubleClicked)
-        self.tree.itemChanged.connect(self.on_item_renamed)
+        self.tree.setEditTriggers(QAbstractItemView.EditKeyPressed | QAbstractItemView.DoubleClicked)
         self.left_layout.addWidget(self.tree)
         
         # Boutons de gestion des nœuds
@@ -87,17 +178,50 @@ class MainWindow(QMainWindow):
         self.editor_container.setLayout(self.editor_layout)
         
         # Zone d'édition - force plain text
-        self.editor = QTextEdit()
-        self.editor.setAcceptRichText(False)
-        self.editor.textChanged.connect(self.on_text_changed)
-        self.editor.setMinimumHeight(200)
-        self.editor_layout.addWidget(self.editor)
+        self.text_editor = QTextEdit()
+        self.text_editor.setAcceptRichText(False)
+        self.text_editor.textChanged.connect(self.on_text_changed)
+        self.text_editor.setMinimumHeight(200)
+        
+        # Éditeur des grandes notes : QPlainTextEdit ne met en page que les
+        # blocs affichés. Les modifications sont suivies par plage
+        # (contentsChange), sans jamais relire tout le texte.
+        self.large_editor = QPlainTextEdit()
+        self.large_editor.setMinimumHeight(200)
+        self.large_editor.document().contentsChange.connect(self.on_large_contents_change)
+        self.large_editor.verticalScrollBar().valueChanged.connect(self.on_large_editor_scrolled)
+        
+        # self.editor est l'éditeur affiché (voir set_large_mode)
+        self.editor_stack = QStackedWidget()
+        self.editor_stack.addWidget(self.text_editor)
+        self.editor_stack.addWidget(self.large_editor)
+        self.editor = self.text_editor
+        self.editor_layout.addWidget(self.editor_stack)
+        
+        # Chargement par morceaux de la grande note ouverte
+        self.large_load = None
+        self.large_load_timer = QTimer(self)
+        self.large_load_timer.setInterval(0)
+        self.large_load_timer.timeout.connect(self.load_large_chunk)
+        # Position autour de laquelle l'aperçu d'une grande note est rendu
+        self.large_focus = 0
         
         # Bouton de sauvegarde
         self.btn_save = QPushButton(self.translator.get_text('save'))
         self.btn_save.clicked.connect(self.save_content)
         self.editor_layout.addWidget(self.btn_save)
         
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(self.AUTOSAVE_DELAY_MS)
+        self.autosave_timer.timeout.connect(self.autosave)
+        
+        # Indicateur d'enregistrement non bloquant
+        self.save_status = QLabel()
+        self.statusBar().addPermanentWidget(self.save_status)
+        self.writesFlushed.connect(self.update_save_status)
+        self.update_save_status()
+        
         # Preview container
         self.preview_container = QWidget()
         self.preview_layout = QVBoxLayout()
@@ -105,7 +229,9 @@ class MainWindow(QMainWindow):
         
         # Remplacer QLabel par QTextBrowser pour l'aperçu
         self.preview_label = QTextBrowser()
-        self.preview_label.setOpenExternalLinks(True)
+        # Liens [[note]] ouverts dans l'application, les autres dans le navigateur
+        self.preview_label.setOpenLinks(False)
+        self.preview_label.anchorClicked.connect(self.on_preview_link)
         self.preview_label.setStyleSheet("""
             QTextBrowser {
                 background-color: #f8f9fa;
@@ -117,6 +243,46 @@ class MainWindow(QMainWindow):
         self.preview_label.setMinimumHeight(200)
         self.preview_layout.addWidget(self.preview_label)
         
+        # Rendu de l'aperçu en arrière-plan, déclenché après une pause de frappe
+        self.preview = PreviewRenderer(self)
+        self.preview.rendered.connect(self.on_preview_rendered)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(self.PREVIEW_DELAY_MS)
+        self.preview_timer.timeout.connect(self.refresh_preview)
+        
+        # Historique des révisions, dans un dock masqué par défaut
+        # Le panneau n'est construit qu'à la première ouverture du dock
+        self.history_panel = None
+        self.history_dock = QDockWidget(self.translator.get_text('history'), self)
+        self.history_dock.setObjectName('history_dock')
+        self.history_dock.visibilityChanged.connect(self.on_history_visibility)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.history_dock)
+        self.history_dock.hide()
+        self.view_menu.addAction(self.history_dock.toggleViewAction())
+        
+        # Rétroliens de la note courante, construits comme l'historique
+        self.backlinks_panel = None
+        self.backlinks_dock = QDockWidget(self.translator.get_text('backlinks'), self)
+        self.backlinks_dock.setObjectName('backlinks_dock')
+        self.backlinks_dock.visibilityChanged.connect(self.on_backlinks_visibility)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.backlinks_dock)
+        self.backlinks_dock.hide()
+        self.view_menu.addAction(self.backlinks_dock.toggleViewAction())
+        
+        # Mesures de performance (python main.py --instrument), dans un dock
+        # qui n'existe que si l'instrumentation est active
+        self.perf_dock = None
+        if instrumentation.is_enabled():
+            from perf_panel import PerformancePanel
+            self.perf_panel = PerformancePanel(self.translator)
+            self.perf_dock = QDockWidget(self.translator.get_text('performance'), self)
+            self.perf_dock.setObjectName('perf_dock')
+            self.perf_dock.setWidget(self.perf_panel)
+            self.addDockWidget(Qt.BottomDockWidgetArea, self.perf_dock)
+            self.perf_dock.hide()
+            self.view_menu.addAction(self.perf_dock.toggleViewAction())
+        
         # Add containers to right splitter
         self.right_splitter.addWidget(self.editor_container)
         self.right_splitter.addWidget(self.preview_container)
@@ -136,8 +302,13 @@ class MainWindow(QMainWindow):
         # Variable pour stocker l'ID du nœud sélectionné
         self.current_node_id = None
         
-        # Charger l'arbre initial
-        self.load_tree_nodes(None, self.tree.invisibleRootItem())
+        # L'arbre est chargé après l'affichage de la fenêtre (voir showEvent),
+        # les nœuds dépliés par tranches
+        self.tree_load_started = False
+        self.pending_expansions = deque()
+        self.expand_timer = QTimer(self)
+        self.expand_timer.setInterval(0)
+        self.expand_timer.timeout.connect(self.expand_pending)
         
         # Set size policies for panels
         self.left_panel.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
@@ -147,7 +318,7 @@ class MainWindow(QMainWindow):
         self.preview_label.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
         
         # Set size policy for editor to prevent auto-expansion
-        self.editor.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
+        self.editor_stack.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
         
         # Set size policy for tree to prevent auto-expansion
         self.tree.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Preferred)
@@ -156,7 +327,7 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(800, 600)  # Set minimum size
         
         # Update text for existing widgets
-        self.tree.setHeaderLabel(self.translator.get_text('notes'))
+        self.tree_model.set_header(self.translator.get_text('notes'))
         self.btn_add.setText(self.translator.get_text('new'))
         self.btn_delete.setText(self.translator.get_text('delete'))
         self.btn_save.setText(self.translator.get_text('save'))
@@ -191,6 +362,22 @@ class MainWindow(QMainWindow):
         language_menu.addAction(french_action)
         language_menu.addAction(spanish_action)
         language_menu.addAction(korean_action)
+        
+        # Autosave toggle
+        self.autosave_action = QAction(self.translator.get_text('autosave'), self)
+        self.autosave_action.setCheckable(True)
+        self.autosave_action.setChecked(self.autosave_enabled)
+        self.autosave_action.toggled.connect(self.set_autosave)
+        settings_menu.addAction(self.autosave_action)
+        
+        # View menu (panneaux optionnels, ajoutés dans init_ui)
+        self.view_menu = menubar.addMenu(self.translator.get_text('view'))
+        
+        # Notebooks menu
+        self.notebooks_menu = menubar.addMenu(self.translator.get_text('notebooks'))
+        self.new_notebook_action = QAction(self.translator.get_text('new_notebook'), self)
+        self.new_notebook_action.triggered.connect(self.new_notebook)
+        self.notebooks_menu.addAction(self.new_notebook_action)
     
     def change_language(self):
         action = self.sender()
@@ -205,51 +392,519 @@ class MainWindow(QMainWindow):
     def update_ui_texts(self):
         """Update all UI texts after language change"""
         self.setWindowTitle(self.translator.get_text('window_title'))
-        self.tree.setHeaderLabel(self.translator.get_text('notes'))
+        self.tree_model.set_header(self.translator.get_text('notes'))
+        self.search_box.setPlaceholderText(self.translator.get_text('search'))
         self.btn_add.setText(self.translator.get_text('new'))
         self.btn_delete.setText(self.translator.get_text('delete'))
         self.btn_save.setText(self.translator.get_text('save'))
+        self.autosave_action.setText(self.translator.get_text('autosave'))
+        self.view_menu.setTitle(self.translator.get_text('view'))
+        self.notebooks_menu.setTitle(self.translator.get_text('notebooks'))
+        self.new_notebook_action.setText(self.translator.get_text('new_notebook'))
+        self.history_dock.setWindowTitle(self.translator.get_text('history'))
+        if self.history_panel is not None:
+            self.history_panel.update_texts()
+        self.backlinks_dock.setWindowTitle(self.translator.get_text('backlinks'))
+        if self.backlinks_panel is not None:
+            self.backlinks_panel.update_texts()
+        if self.perf_dock is not None:
+            self.perf_dock.setWindowTitle(self.translator.get_text('performance'))
+            self.perf_panel.update_texts()
+        self.update_save_status()
     
-    def load_tree_nodes(self, parent_id, parent_item):
-        children = database.get_children(parent_id)
-        for row in children:
-            node_id, p_id, title, content, collapsed = row
-            item = QTreeWidgetItem([title])
-            item.setData(0, Qt.UserRole, node_id)
-            self.make_item_editable(item)  # Make the new item editable
-            parent_item.addChild(item)
-            
-            if collapsed:
-                item.setExpanded(False)
-            else:
-                item.setExpanded(True)
-            
-            self.load_tree_nodes(node_id, item)
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.tree_load_started:
+            self.tree_load_started = True
+            # Au tour de boucle suivant : la fenêtre s'affiche d'abord
+            QTimer.singleShot(0, self.load_tree_nodes)
+    
+    @instrumentation.timed('ui')
+    def load_tree_nodes(self):
+        """(Re)charge l'arbre : seuls les nœuds racines sont lus, le reste à l'expansion."""
+        self.pending_expansions.clear()
+        self.tree_model.reload()
+        self.tree_model.fetchMore(QModelIndex())
+        self.expand_timer.start()
+    
+    def restore_expanded_rows(self, parent, first, last):
+        """Met en file les nœuds fraîchement chargés qui n'étaient pas repliés."""
+        for row in range(first, last + 1):
+            index = self.tree_model.index(row, 0, parent)
+            node = self.tree_model.node_from_index(index)
+            if node.has_children and not node.collapsed:
+                self.pending_expansions.append(QPersistentModelIndex(index))
+        if self.pending_expansions:
+            self.expand_timer.start()
     
-    def on_item_click(self, item, column):
-        node_id = item.data(0, Qt.UserRole)
+    def expand_pending(self):
+        """Déplie les nœuds en attente pendant au plus TREE_LOAD_SLICE_MS.
+        
+        Chaque dépliage lit les enfants du nœud, qui s'ajoutent à la file :
+        l'arbre se charge en largeur, sans bloquer l'interface.
+        """
+        deadline = time.perf_counter() + self.TREE_LOAD_SLICE_MS / 1000
+        # Mise en page différée : la vue ne se recalcule qu'une fois par
+        # tranche au lieu d'une fois par nœud déplié
+        self.tree.scheduleDelayedItemsLayout()
+        while self.pending_expansions and time.perf_counter() < deadline:
+            index = QModelIndex(self.pending_expansions.popleft())
+            # Nœud retiré ou replié par l'utilisateur entre-temps
+            if index.isValid() and not self.tree_model.node_from_index(index).collapsed:
+                self.tree_model.fetchMore(index)
+                self.tree.expand(index)
+        if not self.pending_expansions:
+            self.expand_timer.stop()
+            self.treeLoaded.emit()
+    
+    @instrumentation.timed('ui')
+    def on_item_click(self, index):
+        self.maintenance.touch()
+        self.cancel_large_load()
+        # Enregistrer (en arrière-plan) la note qu'on quitte
+        self.persist_editor()
+        node_id = self.tree_model.node_id(index)
         self.current_node_id = node_id
-        node_data = database.get_node(node_id)
-        if node_data:
-            node = Node.from_db_row(node_data)
-            self.editor.setPlainText(node.content)
-            self.update_preview(node.content)
+        # La note a pu être modifiée par un autre processus (server.py, cli.py)
+        database.check_external_changes()
+        # Les écritures encore en file sont plus récentes que la base
+        pending = self.writes.pending_fields(node_id).get('content')
+        if pending is not None:
+            large = len(pending) >= self.LARGE_NOTE_BYTES
+        else:
+            size = database.get_content_size(node_id)
+            large = size is not None and size >= self.LARGE_NOTE_BYTES
+        if large:
+            self.open_large_note(node_id, pending)
+            self.set_panels_node(node_id)
+            return
+        node = database.get_node(node_id)
+        if node:
+            # Le Node vient du cache et n'est pas modifié
+            content = node.content if pending is None else pending
+            self.set_large_mode(False)
+            self._loading_editor = True
+            self.editor.setPlainText(content)
+            self._loading_editor = False
+            self.persisted_hashes[node_id] = content_hash(content or "")
+            self.update_preview(content)
+            self.set_panels_node(node_id)
+    
+    def set_large_mode(self, large):
+        """Affiche l'éditeur grandes notes (True) ou l'éditeur habituel."""
+        editor = self.large_editor if large else self.text_editor
+        if editor is self.editor:
+            return
+        if not large:
+            # Libère le document de la grande note quittée
+            self._loading_editor = True
+            self.large_editor.clear()
+            self._loading_editor = False
+        self.editor = editor
+        self.editor_stack.setCurrentWidget(editor)
+    
+    def open_large_note(self, node_id, text=None):
+        """Ouvre une grande note par morceaux, lus directement en base.
+        
+        L'éditeur est en lecture seule (et sans historique d'annulation)
+        jusqu'à la fin du chargement, qui avance par tranches de
+        LARGE_NOTE_SLICE_MS pour garder la fenêtre réactive. `text` est le
+        contenu encore en file d'écriture, s'il y en a un.
+        """
+        self.set_large_mode(True)
+        if text is None:
+            chunks = database.iter_content(node_id)
+        else:
+            step = self.LARGE_NOTE_CHUNK_CHARS
+            chunks = (text[i:i + step] for i in range(0, len(text), step))
+        self._loading_editor = True
+        self.large_editor.clear()
+        self.large_editor.setReadOnly(True)
+        self.large_editor.document().setUndoRedoEnabled(False)
+        self.large_focus = 0
+        self.preview.cancel()
+        self.preview_label.clear()
+        self.large_load = {'node_id': node_id, 'chunks': chunks,
+                           'buffer': '', 'digest': content_hasher()}
+        self.statusBar().showMessage(self.translator.get_text('loading_note'))
+        self.load_large_chunk()
+        if self.large_load is not None:
+            self.large_load_timer.start()
+    
+    def load_large_chunk(self):
+        """Insère des morceaux de la grande note pendant une tranche de temps."""
+        load = self.large_load
+        if load is None:
+            self.large_load_timer.stop()
+            return
+        deadline = time.perf_counter() + self.LARGE_NOTE_SLICE_MS / 1000
+        cursor = QTextCursor(self.large_editor.document())
+        cursor.movePosition(QTextCursor.End)
+        self._loading_editor = True
+        while time.perf_counter() < deadline:
+            if not load['buffer']:
+                chunk = next(load['chunks'], None)
+                if chunk is None:
+                    self.finish_large_load()
+                    return
+                load['digest'].update(chunk.encode('utf-8'))
+                load['buffer'] = chunk
+            # Les morceaux décompressés peuvent être gros : on les découpe
+            piece = load['buffer'][:self.LARGE_NOTE_CHUNK_CHARS]
+            load['buffer'] = load['buffer'][self.LARGE_NOTE_CHUNK_CHARS:]
+            cursor.insertText(piece)
+        self._loading_editor = False
+    
+    def finish_large_load(self):
+        load = self.large_load
+        self.large_load = None
+        self.large_load_timer.stop()
+        self.persisted_hashes[load['node_id']] = load['digest'].hexdigest()
+        self.large_editor.document().setUndoRedoEnabled(True)
+        self.large_editor.setReadOnly(False)
+        self._loading_editor = False
+        self.statusBar().clearMessage()
+        self.refresh_preview()
+    
+    def cancel_large_load(self):
+        """Interrompt le chargement en cours (changement de note, suppression…)."""
+        load = self.large_load
+        if load is None:
+            return
+        self.large_load = None
+        self.large_load_timer.stop()
+        # Ferme la connexion de lecture du générateur
+        close = getattr(load['chunks'], 'close', None)
+        if close is not None:
+            close()
+        self.large_editor.document().setUndoRedoEnabled(True)
+        self.large_editor.setReadOnly(False)
+        self._loading_editor = False
+        self.statusBar().clearMessage()
+    
+    def on_large_contents_change(self, position, removed, added):
+        if self._loading_editor or self.editor is not self.large_editor:
+            return
+        # Changement de mise en forme seulement : le texte est inchangé
+        if not removed and not added:
+            return
+        self.large_focus = position
+        self.on_text_changed()
     
-    def on_item_expanded(self, item):
-        node_id = item.data(0, Qt.UserRole)
-        database.update_node(node_id, collapsed=0)
+    def on_large_editor_scrolled(self):
+        if self.editor is self.large_editor and self.large_load is None:
+            self.large_focus = self.large_editor.cursorForPosition(QPoint(0, 0)).position()
+            self.preview_timer.start()
     
-    def on_item_collapsed(self, item):
-        node_id = item.data(0, Qt.UserRole)
-        database.update_node(node_id, collapsed=1)
+    def large_preview_text(self):
+        """Texte des blocs autour de large_focus : l'aperçu d'une grande note
+        ne porte que sur la zone affichée ou modifiée."""
+        block = self.large_editor.document().findBlock(self.large_focus)
+        for _ in range(self.LARGE_PREVIEW_CONTEXT_BLOCKS):
+            previous = block.previous()
+            if not previous.isValid():
+                break
+            block = previous
+        lines = []
+        size = 0
+        while block.isValid() and size < self.LARGE_PREVIEW_CHARS:
+            text = block.text()
+            lines.append(text)
+            size += len(text) + 1
+            block = block.next()
+        return '\n'.join(lines)[:self.LARGE_PREVIEW_CHARS]
     
+    def on_item_expanded(self, index):
+        self.maintenance.touch()
+        node = self.tree_model.node_from_index(index)
+        if node.collapsed:
+            self.writes.update_node(node.node_id, collapsed=0)
+            self.tree_model.set_collapsed(index, False)
+    
+    def on_item_collapsed(self, index):
+        self.maintenance.touch()
+        node = self.tree_model.node_from_index(index)
+        if not node.collapsed:
+            self.writes.update_node(node.node_id, collapsed=1)
+            self.tree_model.set_collapsed(index, True)
+        # Un sous-arbre replié ne garde rien en mémoire
+        self.tree_model.release_children(index)
+    
+    @instrumentation.timed('ui')
     def update_preview(self, markdown_text):
-        html = markdown_to_html(markdown_text)
-        self.preview_label.setText(html)
+        """Demande le rendu immédiat (instantané si le contenu est en cache)."""
+        self.preview_timer.stop()
+        self.preview.request(markdown_text)
+    
+    def refresh_preview(self):
+        if self.editor is self.large_editor:
+            self.update_preview(self.large_preview_text())
+        else:
+            self.update_preview(self.editor.toPlainText())
+    
+    def on_preview_rendered(self, generation, html):
+        # Ignorer les rendus dépassés par une frappe plus récente
+        if generation == self.preview.generation:
+            self.preview_label.setText(html)
     
     def on_text_changed(self):
+        self.maintenance.touch()
+        # Debounce : le rendu n'a lieu qu'après une pause de frappe
+        self.preview_timer.start()
+        if self._loading_editor or self.current_node_id is None:
+            return
+        if self.current_node_id not in self.dirty_nodes:
+            self.dirty_nodes.add(self.current_node_id)
+            self.update_save_status()
+        if self.autosave_enabled:
+            self.autosave_timer.start()
+    
+    def on_history_visibility(self, visible):
+        if visible and self.history_panel is None:
+            self.history_panel = HistoryPanel(self.translator)
+            self.history_panel.restoreRequested.connect(self.on_restore_revision)
+            self.writesFlushed.connect(self.history_panel.refresh)
+            self.history_panel.set_node(self.current_node_id)
+            self.history_dock.setWidget(self.history_panel)
+    
+    def on_backlinks_visibility(self, visible):
+        if visible and self.backlinks_panel is None:
+            self.backlinks_panel = BacklinksPanel(self.translator)
+            self.backlinks_panel.nodeActivated.connect(self.select_node)
+            # Les liens d'une note sont enregistrés avec son texte
+            self.writesFlushed.connect(self.backlinks_panel.refresh)
+            self.backlinks_panel.set_node(self.current_node_id)
+            self.backlinks_dock.setWidget(self.backlinks_panel)
+    
+    def set_panels_node(self, node_id):
+        """Met à jour les panneaux qui suivent la note courante."""
+        if self.history_panel is not None:
+            self.history_panel.set_node(node_id)
+        if self.backlinks_panel is not None:
+            self.backlinks_panel.set_node(node_id)
+    
+    def on_preview_link(self, url):
+        self.maintenance.touch()
+        if url.scheme() != links.SCHEME:
+            QDesktopServices.openUrl(url)
+            return
+        target = QUrl.fromPercentEncoding(url.path(QUrl.FullyEncoded).encode('ascii'))
+        node_id = database.resolve_link(target)
+        if node_id is None:
+            self.statusBar().showMessage(
+                self.translator.get_text('link_not_found').format(target), 3000)
+            return
+        # Le texte en cours est enregistré par on_item_click
+        self.select_node(node_id)
+    
+    def on_restore_revision(self, text):
+        """Remet une ancienne version dans l'éditeur ; elle devient une
+        nouvelle révision une fois enregistrée."""
+        self.maintenance.touch()
+        if self.current_node_id is None:
+            return
+        self.cancel_large_load()
+        self.editor.setPlainText(text)
+        self.persist_editor()
+    
+    def set_autosave(self, enabled):
+        self.autosave_enabled = enabled
+        database.set_setting('autosave', '1' if enabled else '0')
+        if enabled and self.dirty_nodes:
+            self.autosave_timer.start()
+    
+    def autosave(self):
+        self.persist_editor()
+    
+    def persist_editor(self):
+        """Enregistre la note courante si son contenu a changé, sans bloquer.
+        
+        Le contenu n'est écrit que si son empreinte diffère de celle du
+        dernier contenu enregistré ; l'écriture passe par la file
+        d'écritures différées.
+        """
+        node_id = self.current_node_id
+        self.autosave_timer.stop()
+        if node_id is None or node_id not in self.dirty_nodes:
+            return
         content = self.editor.toPlainText()
-        self.update_preview(content)
+        digest = content_hash(content)
+        if digest != self.persisted_hashes.get(node_id):
+            self.writes.update_node(node_id, content=content)
+            self.writes.flush_async()
+            self.persisted_hashes[node_id] = digest
+        self.dirty_nodes.discard(node_id)
+        self.update_save_status()
+    
+    def on_maintenance_finished(self, report):
+        # Notes orphelines rattachées à la racine : elles apparaissent dans l'arbre
+        if report['orphan_nodes']:
+            self.load_tree_nodes()
+        if report['integrity_errors']:
+            self.statusBar().showMessage(self.translator.get_text('maintenance_problems').format(
+                '; '.join(report['integrity_errors'])))
+        elif report['reclaimed_bytes'] or report['orphan_nodes']:
+            self.statusBar().showMessage(self.translator.get_text('maintenance_done').format(
+                maintenance.format_bytes(report['reclaimed_bytes']), len(report['orphan_nodes'])), 5000)
+    
+    def update_save_status(self):
+        if self.dirty_nodes:
+            key = 'unsaved_changes'
+        elif self.writes.has_pending():
+            key = 'saving'
+        else:
+            key = 'all_saved'
+        self.save_status.setText(self.translator.get_text(key))
+    
+    def on_search_text_changed(self, text):
+        self.maintenance.touch()
+        if text.strip():
+            self.search_timer.start()
+        else:
+            self.search_timer.stop()
+            self.search_worker.cancel()
+            self.search_results.clear()
+            self.search_results.hide()
+    
+    def start_search(self):
+        self.search_worker.submit(self.search_box.text())
+    
+    def run_search(self, query):
+        """Exécuté dans le thread de recherche."""
+        return notebooks.search_all(query, limit=self.SEARCH_LIMIT, markers=('', ''))
+    
+    def on_search_results(self, generation, hits):
+        # Ignorer les résultats d'une saisie déjà dépassée
+        if generation != self.search_worker.generation:
+            return
+        self.search_results.clear()
+        current = notebooks.current_notebook()
+        for notebook, node_id, title, snippet in hits:
+            if notebook != current:
+                title = f"{title}  [{notebook}]"
+            item = QListWidgetItem(f"{title}\n{snippet}" if snippet else title)
+            item.setData(Qt.UserRole, node_id)
+            item.setData(Qt.UserRole + 1, notebook)
+            self.search_results.addItem(item)
+        self.search_results.setVisible(bool(hits))
+    
+    def on_search_result_clicked(self, item):
+        self.maintenance.touch()
+        notebook = item.data(Qt.UserRole + 1)
+        if notebook != notebooks.current_notebook() and not self.switch_notebook(notebook):
+            return
+        self.select_node(item.data(Qt.UserRole))
+    
+    def refresh_notebook_list(self):
+        self.notebook_combo.blockSignals(True)
+        self.notebook_combo.clear()
+        self.notebook_combo.addItems(notebooks.list_notebooks())
+        self.notebook_combo.setCurrentIndex(
+            self.notebook_combo.findText(notebooks.current_notebook() or ''))
+        self.notebook_combo.blockSignals(False)
+    
+    def on_notebook_activated(self, index):
+        self.switch_notebook(self.notebook_combo.itemText(index))
+    
+    def switch_notebook(self, name):
+        """Bascule sur un autre carnet ; retourne False en cas d'échec.
+        
+        Les écritures en attente vont dans le carnet qu'on quitte avant que
+        database ne pointe sur le nouveau fichier.
+        """
+        self.maintenance.touch()
+        if name == notebooks.current_notebook():
+            return True
+        self.persist_editor()
+        try:
+            self.writes.flush()
+            notebooks.open_notebook(name)
+        except Exception as e:
+            QMessageBox.warning(
+                self,
+                self.translator.get_text('error'),
+                self.translator.get_text('notebook_error').format(str(e))
+            )
+            self.refresh_notebook_list()
+            return False
+        self.reset_notebook_view()
+        return True
+    
+    def reset_notebook_view(self):
+        """Recharge l'interface sur le carnet qui vient d'être ouvert."""
+        self.cancel_large_load()
+        self.current_node_id = None
+        self.dirty_nodes.clear()
+        self.persisted_hashes.clear()
+        self.set_large_mode(False)
+        self._loading_editor = True
+        self.editor.clear()
+        self._loading_editor = False
+        self.preview.cancel()
+        self.preview_label.clear()
+        self.set_panels_node(None)
+        self.load_notebook_settings()
+        self.refresh_notebook_list()
+        self.load_tree_nodes()
+    
+    def load_notebook_settings(self):
+        """Applique les réglages du carnet courant."""
+        self.translator.reload()
+        self.autosave_enabled = database.get_setting('autosave', '1') == '1'
+        self.autosave_action.blockSignals(True)
+        self.autosave_action.setChecked(self.autosave_enabled)
+        self.autosave_action.blockSignals(False)
+        interval = int(database.get_setting('write_interval_ms', self.WRITE_INTERVAL_MS))
+        self.writes.interval = interval / 1000
+        self.update_ui_texts()
+    
+    def new_notebook(self):
+        dialog = QInputDialog(self)
+        dialog.setWindowTitle(self.translator.get_text('new_notebook'))
+        dialog.setLabelText(self.translator.get_text('notebook_name'))
+        dialog.setOkButtonText(self.translator.get_text('standard_ok'))
+        dialog.setCancelButtonText(self.translator.get_text('standard_cancel'))
+        
+        if not dialog.exec_() or not dialog.textValue().strip():
+            return
+        self.persist_editor()
+        try:
+            self.writes.flush()
+            notebooks.create_notebook(dialog.textValue())
+        except Exception as e:
+            QMessageBox.warning(
+                self,
+                self.translator.get_text('error'),
+                self.translator.get_text('notebook_error').format(str(e))
+            )
+            return
+        self.reset_notebook_view()
+    
+    def select_node(self, node_id):
+        """Sélectionne et ouvre un nœud, en chargeant au besoin ses ancêtres."""
+        index = self.tree_model.index_for_id(node_id)
+        if not index.isValid():
+            index = self.tree_model.load_path(database.get_ancestors(node_id))
+            if not index.isValid():
+                return
+        parent = index.parent()
+        while parent.isValid():
+            self.tree.expand(parent)
+            parent = parent.parent()
+        self.tree.setCurrentIndex(index)
+        self.tree.scrollTo(index)
+        self.on_item_click(index)
+    
+    def closeEvent(self, event):
+        self.preview.stop()
+        self.search_worker.stop()
+        self.cancel_large_load()
+        self.persist_editor()
+        notebooks.unregister_worker(self.maintenance)
+        self.maintenance.stop()
+        notebooks.unregister_worker(self.writes)
+        self.writes.close()
+        super().closeEvent(event)
     
     def translate_standard_buttons(self, message_box):
         """Translate standard buttons in a QMessageBox"""
@@ -264,17 +919,19 @@ class MainWindow(QMainWindow):
                 button.setText(self.translator.get_text('standard_ok'))
     
     def save_content(self):
+        self.maintenance.touch()
         if self.current_node_id is not None:
-            content = self.editor.toPlainText()
-            database.update_node(self.current_node_id, content=content)
-            msg = QMessageBox(self)
-            msg.setWindowTitle(self.translator.get_text('success'))
-            msg.setText(self.translator.get_text('note_saved'))
-            msg.setStandardButtons(QMessageBox.Ok)
-            self.translate_standard_buttons(msg)
-            msg.exec_()
+            self.persist_editor()
+            # Message non bloquant dans la barre d'état
+            self.statusBar().showMessage(self.translator.get_text('note_saved'), 2000)
     
     def add_node(self):
+        self.add_child_node(self.current_node_id)
+    
+    def add_child_node(self, parent_id):
+        """Crée une note sous parent_id (à la racine si None), sans changer
+        la note ouverte."""
+        self.maintenance.touch()
         dialog = QInputDialog(self)
         dialog.setWindowTitle(self.translator.get_text('new_node'))
         dialog.setLabelText(self.translator.get_text('node_title'))
@@ -287,38 +944,65 @@ class MainWindow(QMainWindow):
         if ok and title:
             new_id = database.create_node(
                 title, 
-                parent_id=self.current_node_id,
+                parent_id=parent_id,
                 content="",
                 collapsed=0
             )
-            self.tree.clear()
-            self.load_tree_nodes(None, self.tree.invisibleRootItem())
+            self.tree_model.insert_node(parent_id, new_id, title)
+            parent_index = self.tree_model.index_for_id(parent_id)
+            if parent_index.isValid():
+                self.tree.expand(parent_index)
     
     def delete_node(self):
-        if self.current_node_id is None:
+        self.delete_subtree(self.current_node_id)
+    
+    def delete_subtree(self, node_id):
+        """Supprime une note et ses descendants après confirmation. L'éditeur
+        n'est vidé que si la note ouverte fait partie du sous-arbre."""
+        self.maintenance.touch()
+        if node_id is None:
             return
             
         msg = QMessageBox(self)
         msg.setWindowTitle(self.translator.get_text('confirmation'))
-        msg.setText(self.translator.get_text('delete_confirm'))
+        # Nombre de descendants en une requête sur l'index d'ascendance
+        descendants = database.count_subtree(node_id) - 1
+        if descendants > 1:
+            msg.setText(self.translator.get_text('delete_confirm_count').format(descendants))
+        else:
+            msg.setText(self.translator.get_text('delete_confirm'))
         msg.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         self.translate_standard_buttons(msg)
         reply = msg.exec_()
         
         if reply == QMessageBox.Yes:
-            database.delete_node(self.current_node_id)
-            self.current_node_id = None
-            self.editor.clear()
-            self.preview_label.clear()
-            self.tree.clear()
-            self.load_tree_nodes(None, self.tree.invisibleRootItem())
+            current = self.current_node_id
+            closing = current is not None and database.is_descendant(current, node_id)
+            if closing:
+                self.cancel_large_load()
+            database.delete_node(node_id)
+            self.writes.discard([node_id] + ([current] if closing else []))
+            self.tree_model.remove_node(node_id)
+            if closing:
+                self.dirty_nodes.discard(current)
+                self.persisted_hashes.pop(current, None)
+                self.current_node_id = None
+                self.set_large_mode(False)
+                self.editor.clear()
+                self.set_panels_node(None)
+                self.preview.cancel()
+                self.preview_label.clear()
+            # Rendre la place du sous-arbre supprimé à la prochaine inactivité
+            self.maintenance.run_soon()
     
+    @instrumentation.timed('ui')
     def handleDropEvent(self, event):
+        self.maintenance.touch()
         # Récupérer l'item déplacé et sa nouvelle position
-        item = self.tree.currentItem()
-        target = self.tree.itemAt(event.pos())
+        item = self.tree.currentIndex()
+        target = self.tree.indexAt(event.pos())
         
-        if not item or not target:
+        if not item.isValid() or not target.isValid():
             event.ignore()
             return
             
@@ -326,15 +1010,28 @@ class MainWindow(QMainWindow):
         if item == target:
             event.ignore()
             return
+        
+        # Sur un nœud : il devient le parent ; au-dessus ou en dessous : le
+        # nœud prend place parmi les frères de la cible
+        position = self.tree.dropIndicatorPosition()
+        if position == QAbstractItemView.AboveItem:
+            parent_index, row = target.parent(), target.row()
+        elif position == QAbstractItemView.BelowItem:
+            parent_index, row = target.parent(), target.row() + 1
+        else:
+            parent_index, row = target, None
+        before = self.tree_model.index(row, 0, parent_index) if row is not None else QModelIndex()
             
         # Récupérer les IDs des nœuds
-        node_id = item.data(0, Qt.UserRole)
-        new_parent_id = target.data(0, Qt.UserRole)
+        node_id = self.tree_model.node_id(item)
+        new_parent_id = self.tree_model.node_id(parent_index)
+        before_id = self.tree_model.node_id(before) if before.isValid() else None
         
         # Mettre à jour la base de données
         try:
-            self.update_node_parent(node_id, new_parent_id)
-            QTreeWidget.dropEvent(self.tree, event)
+            self.move_node(node_id, new_parent_id, before_id)
+            self.tree_model.move_node(item, parent_index, row if before.isValid() else None)
+            event.accept()
         except Exception as e:
             QMessageBox.warning(
                 self, 
@@ -343,28 +1040,11 @@ class MainWindow(QMainWindow):
             )
             event.ignore()
 
-    def update_node_parent(self, node_id, new_parent_id):
-        # Vérifier qu'on ne crée pas de cycle
-        current = new_parent_id
-        while current is not None:
-            if current == node_id:
-                raise ValueError("Impossible de déplacer un nœud sous un de ses descendants")
-            node_data = database.get_node(current)
-            if node_data:
-                current = node_data[1]  # parent_id
-            else:
-                current = None
-        
-        # Mettre à jour le parent_id dans la base de données
-        conn = database.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE nodes 
-            SET parent_id = ? 
-            WHERE id = ?
-        """, (new_parent_id, node_id))
-        conn.commit()
-        conn.close()
+    def move_node(self, node_id, new_parent_id, before_id=None):
+        # La base refuse (ValueError) de créer un cycle : le test passe par
+        # l'index d'ascendance au lieu de remonter les parents un à un ;
+        # seule la clé de rang du nœud change, pas celles de ses frères
+        database.move_node(node_id, new_parent_id, before_id)
 
     def show_context_menu(self, position):
         # Create context menu
@@ -375,40 +1055,31 @@ class MainWindow(QMainWindow):
         rename_action = context_menu.addAction(self.translator.get_text('rename'))
         delete_action = context_menu.addAction(self.translator.get_text('delete'))
         
-        # Get the item at the clicked position
-        item = self.tree.itemAt(position)
-        if item:
-            self.current_node_id = item.data(0, Qt.UserRole)
-        else:
-            self.current_node_id = None
+        # Get the item at the clicked position ; la note ouverte dans
+        # l'éditeur ne change pas
+        item = self.tree.indexAt(position)
+        target_id = self.tree_model.node_id(item) if item.isValid() else None
             
         # Enable/disable actions based on whether an item is selected
-        rename_action.setEnabled(item is not None)
-        delete_action.setEnabled(item is not None)
+        rename_action.setEnabled(item.isValid())
+        delete_action.setEnabled(item.isValid())
         
         # Show the menu and get the chosen action
         action = context_menu.exec_(self.tree.viewport().mapToGlobal(position))
         
         # Handle the chosen action
         if action == new_action:
-            self.add_node()
+            self.add_child_node(target_id)
         elif action == rename_action:
-            self.tree.editItem(item, 0)
+            self.tree.edit(item)
         elif action == delete_action:
-            self.delete_node()
+            self.delete_subtree(target_id)
 
-    def on_item_renamed(self, item, column):
+    def on_item_renamed(self, index, new_title):
         """Handle item rename events"""
-        if column == 0:  # Title column
-            node_id = item.data(0, Qt.UserRole)
-            new_title = item.text(0)
-            if new_title.strip():  # Don't allow empty titles
-                database.update_node(node_id, title=new_title)
-            else:
-                # Revert to original title if empty
-                node_data = database.get_node(node_id)
-                if node_data:
-                    item.setText(0, node_data[2])  # Set back to original title
-
-    def make_item_editable(self, item):
-        item.setFlags(item.flags() | Qt.ItemIsEditable)
\ No newline at end of file
+        self.maintenance.touch()
+        node_id = self.tree_model.node_id(index)
+        if new_title.strip():  # Don't allow empty titles
+            self.writes.update_node(node_id, title=new_title)
+            self.tree_model.set_title(index, new_title)
+        # Otherwise the model keeps the original title
@@ -1,35 +1,188 @@
-import markdown
-from pygments.formatters import HtmlFormatter
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import quote
+
+import links
+
+# markdown et Pygments ne sont importés qu'au premier rendu (voir
+# _markdown()) : ils représentent près de la moitié du temps d'import de
+# l'interface et ne servent pas avant l'affichage d'une note.
+
+@lru_cache(maxsize=None)
+def highlight_css(style='default'):
+    """CSS Pygments pour la coloration du code (calculé une fois par thème)."""
+    from pygments.formatters import HtmlFormatter
+    return HtmlFormatter(style=style).get_style_defs('.codehilite')
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'codehilite']
+
+# Règles ajoutées à la feuille Pygments (aperçu et export HTML)
+BASE_CSS = """
+.codehilite {
+    background-color: #f8f8f8;
+    padding: 10px;
+    border-radius: 4px;
+    margin: 10px 0;
+}
+pre {
+    margin: 0;
+    white-space: pre-wrap;
+    font-family: monospace;
+}
+a.wikilink {
+    color: #6f42c1;
+}
+"""
+
+@lru_cache(maxsize=None)
+def preview_css():
+    """Feuille de style complète de l'aperçu (Pygments + règles de base)."""
+    return highlight_css() + BASE_CSS
+
+def _cache_lexers(get_lexer_by_name):
+    """Mémorise les lexers Pygments par (langage, options).
+    
+    codehilite instancie un lexer (et cherche sa classe parmi tous ceux de
+    Pygments) pour chaque bloc de code ; un lexer ne garde pas d'état entre
+    deux analyses et peut donc être réutilisé. Les langages inconnus sont
+    mémorisés aussi, leur recherche étant la plus coûteuse.
+    """
+    cache = {}
+    lock = threading.Lock()
+    
+    def cached_get_lexer_by_name(alias, **options):
+        try:
+            key = (alias, tuple(sorted(options.items())))
+            hash(key)
+        except TypeError:
+            # Options non hachables : pas de cache
+            return get_lexer_by_name(alias, **options)
+        with lock:
+            entry = cache.get(key)
+        if entry is None:
+            try:
+                entry = (get_lexer_by_name(alias, **options), None)
+            except Exception as e:
+                # Classe et arguments seulement : relancer la même exception
+                # allongerait sa trace (et les données qu'elle retient) à
+                # chaque rendu
+                entry = (None, (type(e), e.args))
+            with lock:
+                cache[key] = entry
+        lexer, error = entry
+        if error is not None:
+            error_class, args = error
+            raise error_class(*args)
+        return lexer
+    
+    cached_get_lexer_by_name.uncached = get_lexer_by_name
+    return cached_get_lexer_by_name
+
+_markdown_lock = threading.Lock()
+
+def _markdown():
+    """Module markdown, importé au premier appel avec le cache de lexers."""
+    with _markdown_lock:
+        import markdown
+        from markdown.extensions import codehilite
+        if not hasattr(codehilite.get_lexer_by_name, 'uncached'):
+            codehilite.get_lexer_by_name = _cache_lexers(codehilite.get_lexer_by_name)
+        return markdown
+
+def _wiki_link_extension():
+    """Extension markdown : [[cible]] devient un lien note:<cible> (voir links.py).
+
+    La cible n'est pas résolue au rendu : le HTML ne dépend que du texte et
+    reste donc cacheable ; c'est le clic qui cherche la note.
+    """
+    from xml.etree import ElementTree
+    from markdown.extensions import Extension
+    from markdown.inlinepatterns import InlineProcessor
+    from markdown.util import AtomicString
+    
+    class WikiLinkProcessor(InlineProcessor):
+        def handleMatch(self, m, data):
+            target = m.group(1).strip()
+            element = ElementTree.Element('a')
+            element.set('href', f"{links.SCHEME}:{quote(target, safe='')}")
+            element.set('class', 'wikilink')
+            element.text = AtomicString(target)
+            return element, m.start(0), m.end(0)
+    
+    class WikiLinkExtension(Extension):
+        def extendMarkdown(self, md):
+            # Après le code en ligne (190), avant les liens Markdown (160)
+            md.inlinePatterns.register(
+                WikiLinkProcessor(links.LINK_RE.pattern, md), 'wikilink', 175)
+    
+    return WikiLinkExtension()
+
+class MarkdownRenderer:
+    """Convertisseur Markdown construit une fois et réutilisé.
+    
+    markdown.markdown() reconstruit toute la chaîne d'extensions à chaque
+    appel ; ici le convertisseur et la feuille de style sont créés à la
+    construction et le convertisseur est remis à zéro entre deux documents.
+    Un verrou le protège : une instance peut servir à plusieurs threads,
+    mais un thread de rendu dédié gagne à avoir la sienne.
+    """
+    
+    def __init__(self, extensions=None, extension_configs=None, style='default',
+                 wiki_links=False):
+        self.extensions = list(MARKDOWN_EXTENSIONS if extensions is None else extensions)
+        self.style = style
+        self.css = highlight_css(style) + BASE_CSS
+        markdown = _markdown()
+        # Liens [[…]] cliquables (aperçu) ; l'export HTML les garde en texte
+        extra = [_wiki_link_extension()] if wiki_links else []
+        self._md = markdown.Markdown(
+            extensions=self.extensions + extra,
+            extension_configs=extension_configs or {},
+        )
+        self._lock = threading.Lock()
+    
+    def convert(self, text):
+        """HTML du corps du document, sans feuille de style."""
+        with self._lock:
+            return self._md.reset().convert(text)
+    
+    def render(self, text):
+        """Page HTML complète, avec la feuille de style du renderer."""
+        if not text:
+            return ""
+        return wrap_html(self.convert(text), self.css)
+
+_default_renderer = None
+_default_renderer_lock = threading.Lock()
+
+def default_renderer():
+    """Renderer partagé, créé au premier usage."""
+    global _default_renderer
+    with _default_renderer_lock:
+        if _default_renderer is None:
+            _default_renderer = MarkdownRenderer()
+        return _default_renderer
 
 def markdown_to_html(markdown_text):
     """Convertit du texte Markdown en HTML."""
     if not markdown_text:
         return ""
-    
-    # Get the CSS for code highlighting
-    css = HtmlFormatter().get_style_defs('.codehilite')
-    
-    # Convert markdown to HTML
-    html = markdown.markdown(markdown_text, 
-                           extensions=['fenced_code', 'tables', 'codehilite'])
+    return default_renderer().render(markdown_text)
+
+def wrap_html(html, css=None):
+    """Enveloppe le corps HTML avec la feuille de style de l'aperçu."""
+    if css is None:
+        css = preview_css()
     
     # Wrap the HTML with proper styling
     full_html = f"""
     <html>
     <head>
     <style>
-        {css}
-        .codehilite {{
-            background-color: #f8f8f8;
-            padding: 10px;
-            border-radius: 4px;
-            margin: 10px 0;
-        }}
-        pre {{
-            margin: 0;
-            white-space: pre-wrap;
-            font-family: monospace;
-        }}
+    {css}
     </style>
     </head>
     <body>
@@ -37,4 +190,280 @@ def markdown_to_html(markdown_text):
     </body>
     </html>
     """
-    return full_html 
\ No newline at end of file
+    return full_html
+
+def content_hash(text):
+    """Empreinte d'un contenu, utilisée comme clé de cache."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def content_hasher():
+    """Empreinte calculée par morceaux : update() avec chaque morceau encodé
+    en UTF-8, puis hexdigest() donne le même résultat que content_hash()."""
+    return hashlib.sha1()
+
+class RenderCache:
+    """Cache LRU thread-safe : empreinte du contenu -> HTML rendu."""
+    
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+            return html
+    
+    def put(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Bloc de code délimité (même règle de fermeture que l'extension fenced_code)
+_FENCE_RE = re.compile(r'^(?P<fence>~{3,}|`{3,})[^\n]*\n.*?(?<=\n)(?P=fence)[ \t]*$',
+                       re.MULTILINE | re.DOTALL)
+_FENCE_LINE_RE = re.compile(r'^(?:~{3,}|`{3,})', re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r'\n(?:[ \t]*\n)+')
+_LIST_ITEM_RE = re.compile(r'[ ]{0,3}(?:[*+-]|\d+\.)[ \t]')
+# Les définitions de liens par référence relient des blocs distants
+_REFERENCE_RE = re.compile(r'^[ ]{0,3}\[[^\]]+\]:', re.MULTILINE)
+
+def split_blocks(text):
+    """Découpe un document en blocs de premier niveau rendables séparément.
+    
+    Les blocs sont séparés par des lignes vides ; un bloc de code délimité
+    forme un bloc à lui seul même s'il contient des lignes vides. Les blocs
+    qui dépendent du précédent (suite indentée d'un élément de liste,
+    éléments d'une même liste, citations consécutives) lui sont rattachés.
+    """
+    return [text[start:end] for start, end, _ in _block_spans(text, 0, len(text))]
+
+def _block_spans(text, start, end):
+    """Blocs de text[start:end] sous forme de tuples (début, fin, type)."""
+    spans = []
+    kind = None
+    position = start
+    for match in _FENCE_RE.finditer(text, start, end):
+        kind = _paragraph_spans(text, position, match.start(), spans, kind)
+        spans.append((match.start(), match.end(), 'fence'))
+        kind = 'fence'
+        position = match.end()
+    _paragraph_spans(text, position, end, spans, kind)
+    return spans
+
+def _paragraph_spans(text, start, end, spans, prev_kind):
+    chunk_start = start
+    for separator in _BLANK_LINES_RE.finditer(text, start, end):
+        prev_kind = _add_chunk(text, chunk_start, separator.start(), spans, prev_kind)
+        chunk_start = separator.end()
+    return _add_chunk(text, chunk_start, end, spans, prev_kind)
+
+def _add_chunk(text, start, end, spans, prev_kind):
+    while start < end and text[start] == '\n':
+        start += 1
+    if start >= end:
+        return prev_kind
+    first = text[start]
+    if first in ' \t' and text[start:end].isspace():
+        return prev_kind
+    
+    if first in ' \t*+-0123456789' and _LIST_ITEM_RE.match(text, start):
+        kind = 'list'
+    elif first in ' \t':
+        kind = 'indented'
+    elif first == '>':
+        kind = 'quote'
+    else:
+        kind = 'text'
+    
+    if spans and (kind == 'indented' or (kind == prev_kind and kind in ('list', 'quote'))):
+        # Suite du bloc précédent
+        previous = spans[-1]
+        spans[-1] = (previous[0], end, previous[2])
+        return prev_kind
+    spans.append((start, end, kind))
+    return kind
+
+# Taille des tranches comparées pour trouver la zone modifiée
+_COMPARE_WINDOW = 65536
+
+def _common_prefix(a, b):
+    """Longueur du préfixe commun de a et b."""
+    limit = min(len(a), len(b))
+    low = 0
+    while low < limit:
+        high = min(low + _COMPARE_WINDOW, limit)
+        if a[low:high] != b[low:high]:
+            break
+        low = high
+    else:
+        return limit
+    # Dichotomie dans la tranche qui diffère
+    high -= 1
+    while low < high:
+        middle = (low + high) // 2
+        if a[low:middle + 1] == b[low:middle + 1]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def _common_suffix(a, b, limit):
+    """Longueur du suffixe commun de a et b, bornée par limit."""
+    len_a = len(a)
+    len_b = len(b)
+    low = 0
+    while low < limit:
+        high = min(low + _COMPARE_WINDOW, limit)
+        if a[len_a - high:len_a - low] != b[len_b - high:len_b - low]:
+            break
+        low = high
+    else:
+        return limit
+    high -= 1
+    while low < high:
+        middle = (low + high) // 2
+        if a[len_a - middle - 1:len_a - low] == b[len_b - middle - 1:len_b - low]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+class IncrementalRenderer:
+    """Rendu Markdown incrémental : seuls les blocs modifiés sont re-rendus.
+    
+    Le HTML de chaque bloc est mémorisé (LRU). D'un rendu à l'autre, seule
+    la zone du texte qui a changé est redécoupée : les blocs sont rangés de
+    part et d'autre de la dernière modification (positions depuis le début
+    avant, depuis la fin après), si bien qu'une frappe ne coûte que le rendu
+    du bloc touché, quelle que soit la taille de la note.
+    """
+    
+    def __init__(self, max_blocks=20000, renderer=None):
+        self.max_blocks = max_blocks
+        self.blocks_rendered = 0
+        self.renderer = renderer or MarkdownRenderer()
+        self._cache = OrderedDict()
+        self._text = None
+        self._whole = False
+        self._head = []
+        self._head_html = []
+        self._tail = []
+        self._tail_html = []
+    
+    def _convert(self, text):
+        return self.renderer.convert(text)
+    
+    def _render_block(self, block):
+        cache = self._cache
+        html = cache.get(block)
+        if html is None:
+            html = self._convert(block)
+            cache[block] = html
+            self.blocks_rendered += 1
+            if len(cache) > self.max_blocks:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(block)
+        return html
+    
+    def render_body(self, text):
+        """Retourne le corps HTML du document."""
+        self.blocks_rendered = 0
+        if self._text is None or not self._update(text):
+            self._rebuild(text)
+        self._text = text
+        return '\n'.join(self._head_html + self._tail_html[::-1])
+    
+    def render(self, text):
+        """Équivalent incrémental de markdown_to_html."""
+        if not text:
+            return ""
+        return wrap_html(self.render_body(text), self.renderer.css)
+    
+    def _rebuild(self, text):
+        """Découpe et rend tout le document (blocs en cache réutilisés)."""
+        self._tail = []
+        self._tail_html = []
+        if _REFERENCE_RE.search(text):
+            # Liens par référence : le document doit être rendu d'un seul tenant
+            self._whole = True
+            self._head = []
+            self._head_html = [self._convert(text)]
+            self.blocks_rendered = 1
+            return
+        self._whole = False
+        self._head = _block_spans(text, 0, len(text))
+        self._head_html = [self._render_block(text[start:end]) for start, end, _ in self._head]
+    
+    def _update(self, text):
+        """Redécoupe seulement la zone modifiée ; False si tout est à refaire."""
+        old = self._text
+        if self._whole:
+            return False
+        if old == text:
+            return True
+        
+        old_len = len(old)
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(old_len, len(text)) - prefix)
+        old_end = old_len - suffix
+        
+        # Les lignes touchées ne doivent pas ouvrir/fermer de bloc de code ni
+        # définir de lien par référence : l'effet ne serait plus local
+        line_start = old.rfind('\n', 0, prefix) + 1
+        for source, stop in ((old, old_end), (text, len(text) - suffix)):
+            line_end = source.find('\n', stop)
+            touched = source[line_start:line_end if line_end != -1 else len(source)]
+            if _FENCE_LINE_RE.search(touched) or _REFERENCE_RE.search(touched):
+                return False
+        
+        head, head_html = self._head, self._head_html
+        tail, tail_html = self._tail, self._tail_html
+        
+        # Déplacer l'écart : avant lui, les blocs qui commencent avant `prefix`
+        while head and head[-1][0] > prefix:
+            start, end, kind = head.pop()
+            tail.append((old_len - start, old_len - end, kind))
+            tail_html.append(head_html.pop())
+        while tail and old_len - tail[-1][0] <= prefix:
+            start, end, kind = tail.pop()
+            head.append((old_len - start, old_len - end, kind))
+            head_html.append(tail_html.pop())
+        
+        # Zone à redécouper : le bloc touché plus un bloc inchangé de chaque côté
+        for _ in range(2):
+            if head:
+                head.pop()
+                head_html.pop()
+        region_start = head[-1][1] if head else 0
+        while tail and old_len - tail[-1][0] <= old_end:
+            tail.pop()
+            tail_html.pop()
+        region_end_from_end = 0
+        if tail:
+            region_end_from_end = tail.pop()[1]
+            tail_html.pop()
+        
+        while True:
+            spans = _block_spans(text, region_start, len(text) - region_end_from_end)
+            if not spans:
+                if head and tail:
+                    return False
+                break
+            # Le bloc suivant ne doit pas venir prolonger le dernier bloc redécoupé
+            if tail and tail[-1][2] in ('list', 'quote') and tail[-1][2] == spans[-1][2]:
+                region_end_from_end = tail.pop()[1]
+                tail_html.pop()
+                continue
+            break
+        
+        for start, end, kind in spans:
+            head.append((start, end, kind))
+            head_html.append(self._render_block(text[start:end]))
+        return True
@@ -0,0 +1,73 @@
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class LatestOnlyWorker(QObject):
+    """Thread de fond qui ne traite que la dernière demande reçue.
+
+    Une demande en attente est remplacée par la suivante, et le résultat
+    d'une demande dépassée n'est pas émis. Chaque demande reçoit un numéro
+    de génération que le destinataire peut comparer à `generation`.
+    """
+
+    # (numéro de génération, résultat)
+    finished = pyqtSignal(int, object)
+
+    def __init__(self, func, name, parent=None):
+        super().__init__(parent)
+        self._func = func
+        self._generation = 0
+        self._pending = None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def submit(self, *args):
+        """Planifie func(*args) ; retourne le numéro de génération."""
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, args)
+            self._condition.notify()
+            return self._generation
+
+    def cancel(self):
+        """Abandonne la demande en cours ; retourne la nouvelle génération."""
+        with self._condition:
+            self._generation += 1
+            self._pending = None
+            return self._generation
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify()
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                generation, args = self._pending
+                self._pending = None
+
+            try:
+                result = self._func(*args)
+            except Exception:
+                traceback.print_exc()
+                continue
+
+            with self._condition:
+                stale = generation != self._generation
+            if not stale:
+                self.finished.emit(generation, result)
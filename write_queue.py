@@ -0,0 +1,108 @@
+import threading
+import traceback
+from contextlib import contextmanager
+
+import database
+
+
+class WriteBehindQueue:
+    """File d'écritures différées pour les événements de l'interface.
+
+    Les mises à jour d'un même nœud sont fusionnées (la dernière valeur de
+    chaque champ l'emporte) puis écrites par un thread de fond, toutes dans
+    une seule transaction, à intervalle régulier ou sur demande. Le thread
+    graphique ne fait donc plus ni commit ni fsync.
+    """
+
+    def __init__(self, interval=0.5, on_flush=None):
+        self.interval = interval
+        # Appelé (depuis le thread qui vide la file) après chaque écriture réussie
+        self.on_flush = on_flush
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Sérialise les vidages pour que les écritures gardent leur ordre
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def update_node(self, node_id, **fields):
+        """Planifie database.update_node(node_id, **fields)."""
+        with self._lock:
+            self._pending.setdefault(node_id, {}).update(fields)
+
+    def pending_fields(self, node_id):
+        """Champs pas encore écrits pour ce nœud (à superposer aux lectures)."""
+        with self._lock:
+            return dict(self._pending.get(node_id, ()))
+
+    def has_pending(self):
+        """Vrai tant qu'il reste des écritures en file ou en cours."""
+        with self._lock:
+            if self._pending:
+                return True
+        return self._flush_lock.locked()
+
+    def discard(self, node_ids):
+        """Oublie les écritures en attente de nœuds supprimés."""
+        with self._lock:
+            for node_id in node_ids:
+                self._pending.pop(node_id, None)
+
+    def flush_async(self):
+        """Demande un vidage immédiat au thread de fond."""
+        self._wake.set()
+
+    def flush(self):
+        """Écrit tout ce qui est en attente, dans le thread appelant."""
+        with self._flush_lock:
+            flushed = self._flush_pending()
+        if flushed and self.on_flush is not None:
+            self.on_flush()
+
+    @contextmanager
+    def suspend(self):
+        """Écrit ce qui est en attente, puis empêche tout vidage jusqu'à la
+        sortie du bloc (changement de carnet, voir notebooks.open_notebook)."""
+        with self._flush_lock:
+            flushed = self._flush_pending()
+            yield
+        if flushed and self.on_flush is not None:
+            self.on_flush()
+
+    def _flush_pending(self):
+        """Vidage proprement dit, sous _flush_lock ; retourne False s'il
+        n'y avait rien à écrire."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return False
+        try:
+            with database.batch():
+                for node_id, fields in pending.items():
+                    database.update_node(node_id, **fields)
+        except Exception:
+            # Remettre en file, sans écraser ce qui est arrivé entre-temps
+            with self._lock:
+                for node_id, fields in pending.items():
+                    fields.update(self._pending.get(node_id, {}))
+                    self._pending[node_id] = fields
+            raise
+        return True
+
+    def close(self):
+        """Arrête le thread de fond et écrit ce qui reste."""
+        self._stopped = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()